@@ -0,0 +1,108 @@
+"""Compara el aplanado iterativo de :func:`src.ieca.jerarquia.aplanar_arbol` con el recorrido recursivo original
+sobre las jerarquias más grandes del directorio de jerarquias en local y sobre árboles sintéticos profundos.
+
+Las jerarquias en local están guardadas ya aplanadas, por lo que su árbol se reconstruye a partir de
+**PARENTCODE**, colgando de la raíz los nodos sin padre.
+
+Uso::
+
+    python -m benchmarks.aplanar_jerarquias [--directorio sistema_informacion/BADEA/jerarquias] [--jerarquias 5]
+                                            [--repeticiones 5]
+"""
+import argparse
+import glob
+import itertools
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from src.ieca.jerarquia import aplanar_arbol
+
+PROPIEDADES = ['id', 'cod', 'label', 'des', 'parentId', 'order']
+
+
+def aplanar_recursivamente(raiz, propiedades):
+    """Recorrido original de :meth:`src.ieca.jerarquia.Jerarquia.convertir_jerarquia_a_dataframe`, usado como
+    referencia."""
+    def recorrer_arbol_recursivamente(datos_jerarquia):
+        datos_nivel_actual = [[jerarquia[propiedad] for propiedad in propiedades] for jerarquia in datos_jerarquia]
+
+        es_ultimo_nivel_rama = np.all(
+            [jerarquia['children'] == [] or jerarquia['isLastLevel'] for jerarquia in datos_jerarquia])
+        if es_ultimo_nivel_rama:
+            return datos_nivel_actual
+
+        return datos_nivel_actual + list(itertools.chain(
+            *[recorrer_arbol_recursivamente(jerarquia['children']) for jerarquia in datos_jerarquia]))
+
+    return recorrer_arbol_recursivamente([raiz])
+
+
+def reconstruir_arbol(fichero):
+    datos = pd.read_csv(fichero, sep=';', dtype=str, keep_default_na=False)
+    nodos = [{'id': fila.ID, 'cod': fila.COD, 'label': fila.NAME, 'des': fila.DESCRIPTION,
+              'parentId': fila.PARENTCODE or None, 'order': fila.ORDER, 'children': [], 'isLastLevel': False}
+             for fila in datos.itertuples()]
+    por_id = {nodo['id']: nodo for nodo in reversed(nodos)}
+    for nodo in nodos[1:]:
+        por_id.get(nodo['parentId'], nodos[0])['children'].append(nodo)
+    for nodo in nodos:
+        nodo['isLastLevel'] = not nodo['children']
+    return nodos[0]
+
+
+def arbol_sintetico(profundidad, hijos):
+    """Árbol con `hijos` hojas por nivel y una rama que desciende hasta `profundidad`."""
+    raiz = {'id': '0', 'cod': '0', 'label': '0', 'des': '0', 'parentId': None, 'order': '0', 'children': [],
+            'isLastLevel': False}
+    actual = raiz
+    for nivel in range(1, profundidad + 1):
+        grupo = [{'id': f'{nivel}.{hijo}', 'cod': f'{nivel}.{hijo}', 'label': '', 'des': '', 'parentId': actual['id'],
+                  'order': str(hijo), 'children': [], 'isLastLevel': False} for hijo in range(hijos)]
+        actual['children'] = grupo
+        actual = grupo[0]
+    return raiz
+
+
+def comparar(nombre, raiz, repeticiones):
+    try:
+        referencia = aplanar_recursivamente(raiz, PROPIEDADES)
+        tiempo_referencia = min(timeit.repeat(lambda: aplanar_recursivamente(raiz, PROPIEDADES), number=1,
+                                              repeat=repeticiones)) * 1000
+    except RecursionError:
+        referencia, tiempo_referencia = None, None
+    filas, profundidades, _ = aplanar_arbol(raiz, PROPIEDADES)
+    if referencia is not None:
+        assert filas == referencia
+    tiempo_iterativo = min(timeit.repeat(lambda: aplanar_arbol(raiz, PROPIEDADES), number=1,
+                                         repeat=repeticiones)) * 1000
+    return {'jerarquia': nombre, 'nodos': len(filas), 'profundidad': int(profundidades.max()),
+            'recursivo_ms': tiempo_referencia, 'iterativo_ms': tiempo_iterativo,
+            'aceleracion': tiempo_referencia / tiempo_iterativo if tiempo_referencia else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--directorio', default='sistema_informacion/BADEA/jerarquias')
+    parser.add_argument('--jerarquias', type=int, default=5)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    argumentos = parser.parse_args()
+
+    ficheros = {os.path.basename(fichero): fichero for fichero in
+                glob.glob(os.path.join(argumentos.directorio, '*', 'original', '*.csv'))}
+    mayores = sorted(ficheros.values(), key=os.path.getsize, reverse=True)[:argumentos.jerarquias]
+    resultados = [comparar(os.path.basename(fichero), reconstruir_arbol(fichero), argumentos.repeticiones)
+                  for fichero in mayores]
+    for profundidad in (100, 500, sys.getrecursionlimit() * 2):
+        resultados.append(comparar(f'sintetica_{profundidad}x10', arbol_sintetico(profundidad, 10),
+                                   argumentos.repeticiones))
+
+    tabla = pd.DataFrame(resultados)
+    print(tabla.to_string(index=False, float_format='%.2f', na_rep='RecursionError'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compara el tiempo de carga y el espacio en disco de las consultas almacenadas en JSON con los de su caché
+binaria de :mod:`src.ieca.cache_consultas`. La carga del JSON incluye su compactación en columnas, que la caché
+ya guarda hecha.
+
+Uso::
+
+    python -m benchmarks.cache_consultas [--directorio sistema_informacion/BADEA/consultas] [--repeticiones 5]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import timeit
+
+import pandas as pd
+
+from src.ieca.cache_consultas import cargar_cache_consulta, columnas_consulta, guardar_cache_consulta
+from src.ieca.lector_json import leer_consulta_por_bloques
+
+
+def cargar_json(fichero):
+    cabecera, bloques = leer_consulta_por_bloques(fichero, 1000)
+    return cabecera, columnas_consulta(cabecera, bloques)
+
+
+def comparar(fichero, directorio_cache, repeticiones):
+    cabecera, columnas = cargar_json(fichero)
+    fichero_cache = os.path.join(directorio_cache, os.path.basename(fichero) + '.pkl.gz')
+    guardar_cache_consulta(fichero_cache, cabecera, columnas)
+
+    cabecera_cache, columnas_cache = cargar_cache_consulta(fichero_cache)
+    assert cabecera_cache == cabecera
+    if columnas is not None:
+        pd.testing.assert_frame_equal(columnas_cache, columnas)
+
+    tiempo_json = min(timeit.repeat(lambda: cargar_json(fichero), number=1, repeat=repeticiones))
+    tiempo_cache = min(timeit.repeat(lambda: cargar_cache_consulta(fichero_cache), number=1, repeat=repeticiones))
+    return {'consulta': os.path.relpath(fichero), 'json_kb': os.path.getsize(fichero) / 1024,
+            'cache_kb': os.path.getsize(fichero_cache) / 1024, 'json_ms': tiempo_json * 1000,
+            'cache_ms': tiempo_cache * 1000, 'aceleracion': tiempo_json / tiempo_cache}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--directorio', default='sistema_informacion/BADEA/consultas')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    argumentos = parser.parse_args()
+
+    ficheros = sorted(glob.glob(os.path.join(argumentos.directorio, '*', '*.json')), key=os.path.getsize,
+                      reverse=True)
+    with tempfile.TemporaryDirectory() as directorio_cache:
+        tabla = pd.DataFrame([comparar(fichero, directorio_cache, argumentos.repeticiones) for fichero in ficheros])
+    print(tabla.to_string(index=False, float_format='%.2f'))
+    print(f"\nTotal JSON: {tabla['json_kb'].sum() / 1024:.1f} MB en {tabla['json_ms'].sum():.0f} ms, "
+          f"caché: {tabla['cache_kb'].sum() / 1024:.1f} MB en {tabla['cache_ms'].sum():.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compara la extracción por columnas de :class:`src.ieca.columnas.ConstructorColumnas` con la extracción original
+basada en ``applymap`` sobre los JSON de las consultas almacenadas en local.
+
+Uso::
+
+    python -m benchmarks.convertir_datos [--directorio sistema_informacion/BADEA/consultas] [--repeticiones 5]
+"""
+import argparse
+import glob
+import json
+import os
+import timeit
+
+import pandas as pd
+
+from src.ieca.columnas import ConstructorColumnas
+
+
+def extraer_con_applymap(datos, columnas_jerarquia, columnas_medida):
+    """Extracción original de :meth:`src.ieca.datos.Datos.convertir_datos_a_dataframe_sdmx`, usada como
+    referencia."""
+    df = pd.DataFrame(datos, columns=columnas_jerarquia + columnas_medida)
+    columnas_jerarquias_aux = [columna_jerarquia + '_aux' for columna_jerarquia in columnas_jerarquia]
+    df[columnas_jerarquias_aux] = df[columnas_jerarquia].applymap(
+        lambda x: x['cod'][-2] if len(x['cod']) > 1 else None)
+    df[columnas_jerarquia] = df[columnas_jerarquia].applymap(lambda x: x['cod'][-1])
+    df[columnas_medida] = df[columnas_medida].applymap(
+        lambda x: x['val'] if x['val'] != "" else x['format'])
+    return df
+
+
+def extraer_por_columnas(datos, columnas_jerarquia, columnas_medida):
+    constructor = ConstructorColumnas(len(columnas_jerarquia), len(columnas_medida))
+    constructor.anadir(datos)
+    return constructor.construir(columnas_jerarquia, columnas_medida)
+
+
+def comparar(fichero, repeticiones):
+    with open(fichero, 'r', encoding='utf-8') as json_file:
+        respuesta = json.load(json_file)
+    if not respuesta['data']:
+        return None
+    columnas_jerarquia = [jerarquia['alias'] for jerarquia in respuesta['hierarchies']]
+    columnas_medida = [medida['des'] for medida in respuesta['measures']]
+    argumentos = (respuesta['data'], columnas_jerarquia, columnas_medida)
+
+    referencia = extraer_con_applymap(*argumentos)
+    columnar = extraer_por_columnas(*argumentos)
+    pd.testing.assert_frame_equal(columnar.astype(object).where(columnar.notna(), None),
+                                  referencia.astype(object).where(referencia.notna(), None))
+
+    tiempo_referencia = min(timeit.repeat(lambda: extraer_con_applymap(*argumentos), number=1,
+                                          repeat=repeticiones))
+    tiempo_columnar = min(timeit.repeat(lambda: extraer_por_columnas(*argumentos), number=1, repeat=repeticiones))
+    return {'consulta': os.path.relpath(fichero), 'filas': len(referencia),
+            'applymap_ms': tiempo_referencia * 1000, 'columnar_ms': tiempo_columnar * 1000,
+            'aceleracion': tiempo_referencia / tiempo_columnar}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--directorio', default='sistema_informacion/BADEA/consultas')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    argumentos = parser.parse_args()
+
+    ficheros = sorted(glob.glob(os.path.join(argumentos.directorio, '*', '*.json')), key=os.path.getsize,
+                      reverse=True)
+    resultados = [resultado for resultado in (comparar(fichero, argumentos.repeticiones) for fichero in ficheros)
+                  if resultado]
+    tabla = pd.DataFrame(resultados)
+    print(tabla.to_string(index=False, float_format='%.2f'))
+    print(f"\nTotal applymap: {tabla['applymap_ms'].sum():.0f} ms, columnar: {tabla['columnar_ms'].sum():.0f} ms, "
+          f"aceleración: {tabla['applymap_ms'].sum() / tabla['columnar_ms'].sum():.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""Suite de benchmarks sobre las consultas de BADEA almacenadas en local, sin acceso a la API.
+
+Incluye microbenchmarks de cada etapa del procesado de una consulta (carga del JSON, conversión a cuadro de datos,
+desacoplado por medidas, mapeo de valores y escritura del .CSV) y macrobenchmarks de la ejecución completa de
+actividades representativas. Cada ejecución parte de una copia temporal de las jerarquias, los mapas y los JSON,
+de forma que no modifica el sistema de información ni reutiliza cachés de ejecuciones anteriores.
+
+Los resultados pueden guardarse en **'benchmarks/resultados/<nombre>.json'** y compararse con otros guardados
+anteriormente, terminando con error si alguna mediana empeora más que la tolerancia.
+
+Uso::
+
+    python -m benchmarks.suite [--actividades IPC,PADRON,DEFCAU] [--repeticiones 5] [--guardar nombre]
+                               [--comparar base] [--tolerancia 0.25]
+"""
+import argparse
+import copy
+import datetime
+import glob
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import pandas as pd
+import yaml
+
+from src.ieca.actividad import Actividad
+from src.ieca.cache_consultas import columnas_consulta
+from src.ieca.consulta import Consulta, normalizar_id_consulta
+from src.ieca.instrumentacion import instrumentacion
+from src.ieca.lector_json import leer_consulta_por_bloques
+from src.ieca.registro_jerarquias import registro_jerarquias
+
+ACTIVIDADES = ['IPC', 'PADRON', 'DEFCAU']
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def cargar_configuracion():
+    with open('configuracion/global.yaml', 'r', encoding='utf-8') as configuracion_global, \
+            open('configuracion/actividades.yaml', 'r', encoding='utf-8') as configuracion_actividades, \
+            open('configuracion/plantilla_actividad.yaml', 'r', encoding='utf-8') as plantilla:
+        return yaml.safe_load(configuracion_global), yaml.safe_load(configuracion_actividades), \
+            yaml.safe_load(plantilla)
+
+
+def preparar_sistema(directorio, configuracion_global, actividad):
+    """Copia en `directorio` las jerarquias, los mapas y los JSON de la actividad y devuelve la configuración
+    global que apunta a la copia."""
+    origen_json = os.path.join(configuracion_global['directorio_json'], actividad)
+    shutil.copytree(configuracion_global['directorio_jerarquias'], os.path.join(directorio, 'jerarquias'))
+    shutil.copytree(configuracion_global['directorio_mapas_dimensiones'], os.path.join(directorio, 'mapas'))
+    os.makedirs(os.path.join(directorio, 'consultas', actividad))
+    for fichero in glob.glob(os.path.join(origen_json, '*.json')):
+        shutil.copy(fichero, os.path.join(directorio, 'consultas', actividad))
+
+    configuracion = copy.deepcopy(configuracion_global)
+    configuracion.update(directorio_jerarquias=os.path.join(directorio, 'jerarquias'),
+                         directorio_mapas_dimensiones=os.path.join(directorio, 'mapas') + os.sep,
+                         directorio_json=os.path.join(directorio, 'consultas'),
+                         directorio_datos=os.path.join(directorio, 'datos'),
+                         directorio_datos_SDMX=os.path.join(directorio, 'SDMX'),
+                         directorio_logs=os.path.join(directorio, 'logs'))
+    configuracion['instrumentacion']['directorio_informes'] = os.path.join(directorio, 'informes')
+    return configuracion
+
+
+def configuracion_local(configuracion_global, configuracion_actividad, plantilla, actividad):
+    """Configuración de la actividad limitada a las consultas con JSON en local."""
+    directorio_json = os.path.join(configuracion_global['directorio_json'], actividad)
+    consultas = [consulta for consulta in configuracion_actividad['consultas']
+                 if os.path.exists(os.path.join(directorio_json, normalizar_id_consulta(consulta) + '.json'))]
+    return {**plantilla, **configuracion_actividad, 'consultas': consultas}
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """Ejecuta `funcion` `repeticiones` veces, llamando antes a `preparar` fuera de la medición."""
+    tiempos = timeit.repeat(funcion, setup=preparar or (lambda: None), number=1, repeat=repeticiones)
+    return {'mediana_ms': statistics.median(tiempos) * 1000, 'minimo_ms': min(tiempos) * 1000}
+
+
+def microbenchmarks(actividad, configuracion_global, configuracion_actividad, repeticiones):
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        configuracion = preparar_sistema(directorio, configuracion_global, actividad)
+        configuracion_actividad = {**configuracion_actividad, 'caducidad_cache_horas': None}
+        for id_consulta in dict.fromkeys(map(normalizar_id_consulta, configuracion_actividad['consultas'])):
+            fichero = os.path.join(configuracion['directorio_json'], actividad, id_consulta + '.json')
+            nombre = f'micro/{actividad}/{id_consulta}'
+
+            def cargar_json():
+                cabecera, bloques = leer_consulta_por_bloques(fichero, configuracion['tamano_bloque_observaciones'])
+                return columnas_consulta(cabecera, bloques)
+
+            columnas = cargar_json()
+            datos = Consulta(id_consulta, configuracion, configuracion_actividad, actividad).datos
+            desacoplados = datos.datos_por_observacion.copy()
+            # Desacoplar renombra y elimina las medidas de estado de los datos, que se restauran antes de cada vez
+            convertidos = datos.convertir_datos_a_dataframe_sdmx(columnas.copy())
+
+            def restaurar():
+                datos.datos_por_observacion = desacoplados.copy()
+
+            def restaurar_convertidos():
+                datos.datos = convertidos.copy(deep=True)
+
+            etapas = {
+                'cargar_json': (cargar_json, None),
+                'convertir_datos_a_dataframe_sdmx': (lambda: datos.convertir_datos_a_dataframe_sdmx(columnas.copy()),
+                                                     None),
+                'desacoplar_datos_por_medidas': (datos.desacoplar_datos_por_medidas, restaurar_convertidos),
+                'mapear_valores': (datos.mapear_valores, restaurar),
+                'guardar_datos': (lambda: datos.guardar_datos('benchmark'), restaurar)}
+            for etapa, (funcion, preparar) in etapas.items():
+                resultados.append({'benchmark': f'{nombre}/{etapa}', 'filas': len(desacoplados),
+                                   **medir(funcion, repeticiones, preparar)})
+    return resultados
+
+
+def macrobenchmark(actividad, configuracion_global, configuracion_actividad, repeticiones):
+    """Mide la ejecución completa de la actividad partiendo cada vez de una copia limpia del sistema de
+    información y sin jerarquias registradas. Junto al tiempo total se guarda la suma por etapa de la última
+    repetición según :mod:`src.ieca.instrumentacion`."""
+    estado = {}
+
+    def preparar():
+        estado['directorio'] = tempfile.mkdtemp()
+        estado['configuracion'] = preparar_sistema(estado['directorio'], configuracion_global, actividad)
+        registro_jerarquias.vaciar()
+        instrumentacion.reiniciar()
+
+    def ejecutar():
+        ejecucion = Actividad(estado['configuracion'], configuracion_actividad, {}, actividad)
+        ejecucion.generar_consultas()
+        ejecucion.ejecutar()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        preparar()
+        try:
+            tiempos.append(timeit.timeit(ejecutar, number=1))
+        finally:
+            shutil.rmtree(estado['directorio'])
+
+    etapas = {}
+    for registro in instrumentacion.reiniciar():
+        etapas[registro['etapa']] = etapas.get(registro['etapa'], 0) + registro['tiempo'] * 1000
+    return {'benchmark': f'macro/{actividad}', 'consultas': len(configuracion_actividad['consultas']),
+            'mediana_ms': statistics.median(tiempos) * 1000, 'minimo_ms': min(tiempos) * 1000, 'etapas_ms': etapas}
+
+
+def comparar_resultados(resultados, base, tolerancia):
+    """Compara la mediana de cada benchmark con la de `base`.
+
+    Returns:
+        comparacion (:class:`pandas:pandas.DataFrame`): Medianas, razón entre ambas y si es una regresión.
+    """
+    medianas_base = {resultado['benchmark']: resultado['mediana_ms'] for resultado in base['resultados']}
+    filas = [{'benchmark': resultado['benchmark'], 'base_ms': medianas_base[resultado['benchmark']],
+              'actual_ms': resultado['mediana_ms']}
+             for resultado in resultados if resultado['benchmark'] in medianas_base]
+    comparacion = pd.DataFrame(filas, columns=['benchmark', 'base_ms', 'actual_ms'])
+    comparacion['razon'] = comparacion['actual_ms'] / comparacion['base_ms']
+    comparacion['regresion'] = comparacion['razon'] > 1 + tolerancia
+    return comparacion
+
+
+def entorno():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'fecha': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'pandas': pd.__version__, 'plataforma': platform.platform()}
+
+
+def ruta_resultados(nombre):
+    return nombre if nombre.endswith('.json') else os.path.join(DIRECTORIO_RESULTADOS, nombre + '.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--actividades', default=','.join(ACTIVIDADES))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--solo', choices=['micro', 'macro'])
+    parser.add_argument('--guardar', help='Nombre o ruta .json en la que guardar los resultados')
+    parser.add_argument('--comparar', help='Nombre o ruta .json de los resultados de referencia')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Empeoramiento relativo de la mediana a partir del cual se considera una regresión')
+    argumentos = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    configuracion_global, configuracion_actividades, plantilla = cargar_configuracion()
+    resultados = []
+    for actividad in argumentos.actividades.split(','):
+        configuracion_actividad = configuracion_local(configuracion_global, configuracion_actividades[actividad],
+                                                      plantilla, actividad)
+        if argumentos.solo != 'macro':
+            resultados.extend(microbenchmarks(actividad, configuracion_global, configuracion_actividad,
+                                              argumentos.repeticiones))
+        if argumentos.solo != 'micro':
+            resultados.append(macrobenchmark(actividad, configuracion_global, configuracion_actividad,
+                                             argumentos.repeticiones))
+    logging.disable(logging.NOTSET)
+
+    tabla = pd.DataFrame(resultados)[['benchmark', 'mediana_ms', 'minimo_ms']]
+    print(tabla.to_string(index=False, float_format='%.2f'))
+
+    if argumentos.guardar:
+        os.makedirs(os.path.dirname(ruta_resultados(argumentos.guardar)), exist_ok=True)
+        with open(ruta_resultados(argumentos.guardar), 'w', encoding='utf-8') as fichero:
+            json.dump({**entorno(), 'repeticiones': argumentos.repeticiones, 'resultados': resultados}, fichero,
+                      indent=2)
+
+    if argumentos.comparar:
+        with open(ruta_resultados(argumentos.comparar), 'r', encoding='utf-8') as fichero:
+            base = json.load(fichero)
+        comparacion = comparar_resultados(resultados, base, argumentos.tolerancia)
+        print(f"\nComparación con {base['commit']} ({base['fecha']}):")
+        print(comparacion.to_string(index=False, float_format='%.2f'))
+        if comparacion['regresion'].any():
+            print(f"\nRegresiones: {list(comparacion.loc[comparacion['regresion'], 'benchmark'])}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
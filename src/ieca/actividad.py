@@ -1,10 +1,22 @@
 import os
 import sys
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
-import pandas as pd
 
-from src.ieca.consulta import Consulta
+from src.ieca.almacen_metadatos import almacen_metadatos
+from src.ieca.cache_consultas import ruta_cache_consulta
+from src.ieca.canalizacion import Canalizacion
+from src.ieca.cliente_api import cliente_api
+from src.ieca.consulta import Consulta, normalizar_id_consulta, precargar_consulta, ruta_json_consulta
+from src.ieca.formatos import EscritorTabla, comprobar_formato, esquema_union, exportar_csv
+from src.ieca.instrumentacion import instrumentacion
+from src.ieca.manifiesto import Manifiesto
+from src.ieca.registro_jerarquias import registro_jerarquias
+from src.ieca.repositorio_mapas import repositorio_mapas
+from src.ieca.sdmx import componentes_estructura, escribir_sdmx_csv, generar_estructuras
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -29,7 +41,10 @@ class Actividad:
     Attributes:
         consultas (:obj:`Diccionario` de :class:`src.consulta.Consulta`): Diccionario que contiene las consultas
          con los datos y metadatos, cuya clave serán los :attr:`src.consulta.Consulta.id_consulta`
-         correspondientes.
+         correspondientes. Los datos de cada consulta se liberan de memoria con :meth:`src.ieca.datos.Datos.liberar`
+         en cuanto se generan.
+        consultas_fallidas (:class:`Diccionario`): Excepciones de las consultas que no se han podido generar o
+         ejecutar, cuya clave serán los :attr:`src.consulta.Consulta.id_consulta` correspondientes.
     """
 
     def __init__(self, configuracion_global, configuracion_actividad, plantilla_configuracion_actividad, actividad):
@@ -38,34 +53,212 @@ class Actividad:
         self.actividad = actividad
 
         self.consultas = {}
+        self.consultas_fallidas = {}
         self.configuracion = {}
+        self.directorio_temporal = None
+        self.manifiesto = Manifiesto(self.configuracion_global, self.configuracion_actividad, self.actividad)
 
         self.logger = logging.getLogger(f'{self.__class__.__name__} [{actividad}]')
         self.logger.info('Inicializando actividad completa')
+        comprobar_formato(self.configuracion_global['formato_salida'])
+        registro_jerarquias.configurar(self.configuracion_global)
+        cliente_api.configurar(self.configuracion_global)
+        instrumentacion.configurar(self.configuracion_global, self.actividad)
+        almacen_metadatos.configurar(self.configuracion_global)
+
+    def consultas_configuradas(self):
+        """Consultas de la actividad sin repeticiones, ya que las consultas repetidas comparten fichero JSON y se
+        generan una única vez.
+
+        Returns:
+            consultas (:class:`Diccionario`): URL de cada consulta, cuya clave será su ID normalizado.
+        """
+        consultas = {}
+        for consulta in self.configuracion_actividad['consultas']:
+            consultas.setdefault(normalizar_id_consulta(consulta), consulta)
+        return consultas
+
+    def precargar_consultas(self, executor):
+        """Lanza la descarga o revalidación de todas las consultas de la actividad.
+
+        Args:
+            executor (:class:`concurrent.futures.ThreadPoolExecutor`): Hilos que realizan las peticiones.
+
+        Returns:
+            descargas (:class:`Diccionario`): Futuro de cada descarga, cuya clave será el ID de la consulta.
+        """
+        return {id_consulta: executor.submit(precargar_consulta, consulta, self.configuracion_global,
+                                             self.actividad, self.configuracion_actividad['caducidad_cache_horas'])
+                for id_consulta, consulta in self.consultas_configuradas().items()}
+
+    def ficheros_consultas(self):
+        """Ficheros locales de las consultas de la actividad: su JSON o, si no existe, su caché binaria.
+
+        Returns:
+            ficheros (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los ficheros.
+        """
+        ficheros = []
+        for id_consulta in self.consultas_configuradas():
+            directorio_json = ruta_json_consulta(id_consulta, self.configuracion_global, self.actividad)
+            if not os.path.exists(directorio_json) and \
+                    self.configuracion_global['formato_cache_consultas'] == 'pickle':
+                directorio_json = ruta_cache_consulta(directorio_json)
+            ficheros.append(directorio_json)
+        return ficheros
+
+    def mapas_utilizados(self):
+        """Mapas de dimensiones que leen o extienden las consultas generadas.
+
+        Returns:
+            mapas (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de los mapas.
+        """
+        columnas = {'INDICATOR'}
+        for consulta in self.consultas.values():
+            columnas.update(consulta.datos.muestra.columns)
+            for jerarquia in consulta.jerarquias:
+                columnas.update([jerarquia.metadatos['alias'], jerarquia.id_jerarquia.split('-')[0],
+                                 jerarquia.nombre, 'D_' + jerarquia.nombre + '_0'])
+        return sorted(columnas.intersection(self.configuracion_global['dimensiones_a_mapear']))
+
+    def sin_cambios(self):
+        """Comprueba, con el manifiesto de la última ejecución completa, si la actividad puede omitirse porque no ha
+        cambiado ninguna de sus entradas. Antes se descargan o revalidan sus consultas, de forma que una consulta
+        modificada en la API obliga a regenerar la actividad.
+
+        Returns:
+            sin_cambios (:class:`Booleano`): Verdadero si no es necesario volver a ejecutar la actividad.
+        """
+        with ThreadPoolExecutor(max_workers=self.configuracion_global['trabajadores_consultas']) as executor:
+            descargas = self.precargar_consultas(executor)
+        for id_consulta, descarga in descargas.items():
+            if descarga.exception() is not None:
+                self.logger.warning('No se ha podido precargar la consulta %s: %s', id_consulta,
+                                    descarga.exception())
+                return False
+
+        if self.manifiesto.vigente(self.ficheros_consultas()):
+            self.logger.info('Actividad sin cambios desde la última ejecución')
+            return True
+        return False
 
     def generar_consultas(self):
         """Inicializa y ejecuta las consultas a la API de BADEA dentro del diccionario :attr:`~.consultas`.
 
+        Las peticiones a la API se reparten entre tantos hilos como indique el parámetro
+        :obj:`trabajadores_consultas` de la configuración global. Las consultas se inicializan y ejecutan después
+        en el orden del fichero **'actividades.yaml'**, ya que sus acciones escriben jerarquias y mapas de
+        dimensiones que reutilizan las siguientes consultas. Una consulta que falla se registra en
+        :attr:`~.consultas_fallidas` sin detener al resto de la actividad.
+
+        Si la sección :obj:`canalizacion` de la configuración global está activa, las consultas se procesan con
+        :class:`src.ieca.canalizacion.Canalizacion`, que solapa la descarga, la transformación y el guardado de
+        los datos transformados de consultas distintas.
         """
+        consultas = self.consultas_configuradas()
+        if self.configuracion_global['canalizacion']['activa']:
+            self.generar_consultas_en_canalizacion(consultas)
+        else:
+            self.generar_consultas_en_serie(consultas)
 
-        for consulta in self.configuracion_actividad['consultas']:
-            try:
-                consulta = Consulta(consulta, self.configuracion_global, self.configuracion_actividad,
+        if self.consultas_fallidas:
+            self.logger.warning('Consultas fallidas: %s', list(self.consultas_fallidas.keys()))
+        self.logger.info('Registro de jerarquias: %s', registro_jerarquias.estadisticas())
+        self.logger.info('Cliente de la API: %s', cliente_api.estadisticas())
+        self.logger.info('Repositorio de mapas: %s', repositorio_mapas.estadisticas())
+
+    def generar_consultas_en_serie(self, consultas):
+        """Descarga las consultas en paralelo y las inicializa y ejecuta una tras otra.
+
+        Args:
+            consultas (:class:`Diccionario`): URL de cada consulta, cuya clave será su ID normalizado.
+        """
+        with ThreadPoolExecutor(max_workers=self.configuracion_global['trabajadores_consultas']) as executor:
+            descargas = self.precargar_consultas(executor)
+
+            for id_consulta, descarga in descargas.items():
+                try:
+                    descarga.result()
+                    with instrumentacion.perfilar(id_consulta):
+                        consulta = Consulta(consultas[id_consulta], self.configuracion_global,
+                                            self.configuracion_actividad, self.actividad)
+                        consulta.ejecutar()
+                        self.liberar_datos(consulta)
+                    self.consultas[consulta.id_consulta] = consulta
+                except Exception as e:
+                    self.logger.error('La consulta %s ha fallado: %s', id_consulta, e)
+                    self.consultas_fallidas[id_consulta] = e
+
+    def generar_consultas_en_canalizacion(self, consultas):
+        """Procesa las consultas con :class:`src.ieca.canalizacion.Canalizacion`: las descargas se adelantan a la
+        transformación y las acciones de guardado con las que terminan las acciones de datos se aplican en otro
+        hilo mientras se transforma la consulta siguiente.
+
+        Args:
+            consultas (:class:`Diccionario`): URL de cada consulta, cuya clave será su ID normalizado.
+        """
+        def descargar(consulta):
+            return precargar_consulta(consulta, self.configuracion_global, self.actividad,
+                                      self.configuracion_actividad['caducidad_cache_horas'])
+
+        def transformar(url_consulta):
+            with instrumentacion.perfilar(normalizar_id_consulta(url_consulta)):
+                consulta = Consulta(url_consulta, self.configuracion_global, self.configuracion_actividad,
                                     self.actividad)
+                consulta.ejecutar(diferir_persistencia=True)
+            return consulta
+
+        def persistir(consulta):
+            consulta.persistir()
+            self.liberar_datos(consulta)
 
-                self.consultas[consulta.id_consulta] = consulta
-            except Exception as e:
-                raise e
-            consulta.ejecutar()
+        canalizacion = Canalizacion(self.configuracion_global, self.actividad)
+        generadas, fallidas = canalizacion.ejecutar(
+            consultas, descargar, transformar, persistir,
+            contar_filas=lambda consulta: len(consulta.datos.datos_por_observacion))
+        self.consultas.update(generadas)
+        self.consultas_fallidas.update(fallidas)
+
+    def liberar_datos(self, consulta):
+        """Guarda los datos desacoplados de una consulta ya generada en el directorio temporal de la actividad y
+        los libera de memoria, de forma que :meth:`~.agrupar_consultas_SDMX` los recupera de uno en uno.
+
+        Args:
+            consulta (:class:`src.consulta.Consulta`): Consulta generada.
+        """
+        if self.directorio_temporal is None:
+            self.directorio_temporal = tempfile.TemporaryDirectory(prefix=f'ieca_{self.actividad}_')
+        consulta.datos.liberar(os.path.join(self.directorio_temporal.name, consulta.id_consulta + '.pkl'))
 
     def ejecutar(self):
         """Aplica las funciones configuradas en el fichero de configuración **'actividades.yaml'** bajo
         la clave **acciones_actividad_completa**.
+
+        Cada acción se mide con :data:`src.ieca.instrumentacion.instrumentacion`. Si alguna consulta ha fallado las
+        acciones no se aplican, de forma que los ficheros de la ejecución anterior no se sustituyen por los de una
+        actividad incompleta. Al terminar se escriben los mapas de dimensiones extendidos por las consultas y, si
+        ninguna consulta ha fallado, se guarda el manifiesto de la ejecución para que :meth:`~.sin_cambios` pueda
+        omitir la actividad en las siguientes ejecuciones.
         """
         self.logger.info('Ejecutando actividad')
-        for accion in self.configuracion_actividad['acciones_actividad_completa'].keys():
-            if self.configuracion_actividad['acciones_actividad_completa'][accion]:
-                getattr(self, accion)()
+        try:
+            acciones = self.configuracion_actividad['acciones_actividad_completa']
+            if self.consultas_fallidas:
+                self.logger.error('No se aplican las acciones de la actividad completa por las consultas fallidas: '
+                                  '%s', list(self.consultas_fallidas.keys()))
+                acciones = {}
+            for accion in acciones.keys():
+                if acciones[accion]:
+                    filas = sum(consulta.datos.filas for consulta in self.consultas.values())
+                    with instrumentacion.medir(accion, self.actividad, filas):
+                        getattr(self, accion)()
+        finally:
+            mapas = repositorio_mapas.guardar()
+            self.logger.info('Mapas de dimensiones guardados: %s', len(mapas))
+            if self.directorio_temporal is not None:
+                self.directorio_temporal.cleanup()
+                self.directorio_temporal = None
+        if not self.consultas_fallidas:
+            self.manifiesto.guardar(self.ficheros_consultas(), self.mapas_utilizados())
         self.logger.info('Ejecución finalizada')
 
     def agrupar_consultas_SDMX(self):
@@ -79,6 +272,14 @@ class Actividad:
             tienen dimensiones distintas, se creara una estructura común para todas las consultas y se mostrara una \
             advertencia por consola.
 
+        Los ficheros de cada grupo se escriben consulta a consulta con :class:`src.ieca.formatos.EscritorTabla`, sin
+        construir la unión del grupo en memoria. Los datos de cada consulta, liberados al generarse, se recuperan
+        de uno en uno, por lo que solo hay en memoria los de una consulta.
+
+        El fichero de configuración incluye, a partir de :data:`src.ieca.almacen_metadatos.almacen_metadatos`, el
+        nombre en inglés de los grupos con traducción conocida y el concepto y la lista de códigos con sus URN de
+        las variables definidas en **conceptos_codelist.yaml**.
+
         """
         directorio = os.path.join(self.configuracion_global['directorio_datos_SDMX'], self.actividad)
         fichero = os.path.join(directorio, 'configuracion.yaml')
@@ -97,52 +298,115 @@ class Actividad:
             else:
                 self.configuracion['grupos_consultas'][consulta.metadatos['title']]["consultas"] \
                     .append(id_consulta)
-            for columna in consulta.datos.datos_por_observacion.columns:
+            for columna in consulta.datos.muestra.columns:
                 if columna not in self.configuracion['variables']:
                     self.configuracion['variables'].append(columna)
+        for grupo, informacion_grupo in self.configuracion['grupos_consultas'].items():
+            nombre_en = almacen_metadatos.traducir(grupo)
+            if nombre_en is not None:
+                informacion_grupo['nombre_en'] = nombre_en
+        conceptos = {variable: almacen_metadatos.concepto(variable) for variable in self.configuracion['variables']}
+        self.configuracion['conceptos'] = {variable: concepto for variable, concepto in conceptos.items() if concepto}
         with open(fichero, 'w', encoding='utf-8') as fichero_actividad:
             yaml.dump(self.configuracion, fichero_actividad, allow_unicode=True, sort_keys=False)
         self.logger.info('Fichero de configuración de la actividad creado y guardado')
 
         self.logger.info('Uniendo datos por titulo')
+        formato = self.configuracion_global['formato_salida']
+        directorio_sin_extender = os.path.join(directorio, 'original')
+        directorio_extension_disjuntos = os.path.join(directorio, 'extension_disjuntos')
+        for directorio_grupos in (directorio_sin_extender, directorio_extension_disjuntos):
+            if not os.path.exists(directorio_grupos):
+                os.makedirs(directorio_grupos)
+
         for grupo, informacion_grupo in self.configuracion['grupos_consultas'].items():
 
             self.logger.info('titulo: %s', grupo)
+            datos_grupo = [self.consultas[consulta].datos for consulta in informacion_grupo['consultas']]
+            self.comprobar_dimensiones_grupo_actividad([datos.muestra.columns for datos in datos_grupo], grupo)
 
-            for consulta in informacion_grupo['consultas']:
-                self.consultas[consulta].datos.extender_con_disjuntos(self.configuracion['variables'])
-                self.consultas[consulta].datos.datos_por_observacion_extension_disjuntos.to_csv(
-                    os.path.join(directorio, consulta + '.csv', ), sep=';', index=False)
-            columnas_grupo = [self.consultas[consulta].datos.datos_por_observacion.columns for consulta in
-                              informacion_grupo['consultas']]
-            self.comprobar_dimensiones_grupo_actividad(columnas_grupo, grupo)
-            union_datos_sin_extender = pd.concat(
-                [self.consultas[consulta].datos.datos_por_observacion for consulta in
-                 informacion_grupo['consultas']])
-
-            directorio_sin_extender = os.path.join(directorio, 'original')
-            if not os.path.exists(directorio_sin_extender):
-                os.makedirs(directorio_sin_extender)
-            union_datos_sin_extender.to_csv(
-                os.path.join(directorio_sin_extender, informacion_grupo['id'] + '.csv'), sep=';',
-                index=False)
+            for datos in datos_grupo:
+                datos.extender_con_disjuntos(self.configuracion['variables'])
+            muestras = [datos.muestra for datos in datos_grupo]
+            muestras_extendidas = [muestra.assign(**datos.extension_disjuntos)
+                                   for muestra, datos in zip(muestras, datos_grupo)]
+            with EscritorTabla(os.path.join(directorio_sin_extender, informacion_grupo['id']),
+                               *esquema_union(muestras), formato) as union_datos_sin_extender, \
+                    EscritorTabla(os.path.join(directorio_extension_disjuntos, informacion_grupo['id']),
+                                  *esquema_union(muestras_extendidas), formato) as union_datos_extendidos:
+                for consulta, datos, muestra in zip(informacion_grupo['consultas'], datos_grupo, muestras_extendidas):
+                    datos_consulta = datos.recuperar()
+                    with EscritorTabla(os.path.join(directorio, consulta), *esquema_union([muestra]), formato) \
+                            as datos_extendidos:
+                        datos_extendidos.escribir(datos_consulta, datos.extension_disjuntos)
+                    union_datos_sin_extender.escribir(datos_consulta)
+                    union_datos_extendidos.escribir(datos_consulta, datos.extension_disjuntos)
+                    del datos_consulta
             self.logger.info('proceso finalizado. Datos guardados')
+        self.logger.info('Datos por titulo unidos')
 
-            directorio_extension_disjuntos = os.path.join(directorio, 'extension_disjuntos')
-            if not os.path.exists(directorio_extension_disjuntos):
-                os.makedirs(directorio_extension_disjuntos)
+    def generar_SDMX(self):
+        """Accion que genera, a partir de los datos agrupados por :meth:`~.agrupar_consultas_SDMX`, los ficheros
+        que se importan directamente en las herramientas de SDMX:
 
-            union_datos_extendidos = pd.concat(
-                [self.consultas[consulta].datos.datos_por_observacion_extension_disjuntos for consulta in
-                 informacion_grupo['consultas']])
+            - **estructuras.xml**: Mensaje SDMX-ML 2.1 con un flujo de datos por grupo de consultas, las listas de \
+            códigos propias de las dimensiones, construidas con las jerarquias de la actividad en los mismos códigos \
+            que los datos, los conceptos de **conceptos_codelist.yaml** y la estructura de datos (DSD) común de la \
+            actividad.
+            - **sdmx_csv/<grupo>.csv**: Datos de cada grupo con extensión de disjuntos en SDMX-CSV.
 
-            directorio_extension_disjuntos = os.path.join(directorio, 'extension_disjuntos')
-            if not os.path.exists(directorio_extension_disjuntos):
-                os.makedirs(directorio_extension_disjuntos)
-            union_datos_extendidos.to_csv(
-                os.path.join(directorio_extension_disjuntos, informacion_grupo['id'] + '.csv'), sep=';',
-                index=False)
-        self.logger.info('Datos por titulo unidos')
+        Tanto el XML como los datos se escriben por partes, sin construirlos completos en memoria. Si
+        :meth:`~.agrupar_consultas_SDMX` no se ha aplicado en esta ejecución, se utilizan el **configuracion.yaml** y
+        los datos agrupados de una ejecución anterior.
+        """
+        directorio = os.path.join(self.configuracion_global['directorio_datos_SDMX'], self.actividad)
+        if not self.configuracion:
+            fichero = os.path.join(directorio, 'configuracion.yaml')
+            if not os.path.exists(fichero):
+                raise FileNotFoundError(f'No existe {fichero}, generar_SDMX necesita aplicar antes la acción '
+                                        f'agrupar_consultas_SDMX')
+            with open(fichero, 'r', encoding='utf-8') as fichero_actividad:
+                self.configuracion = yaml.safe_load(fichero_actividad)
+        directorio_sdmx_csv = os.path.join(directorio, 'sdmx_csv')
+        if not os.path.exists(directorio_sdmx_csv):
+            os.makedirs(directorio_sdmx_csv)
+        agencia = self.configuracion_global['sdmx']['agencia']
+        version = self.configuracion_global['sdmx']['version']
+
+        jerarquias = {}
+        for consulta in self.consultas.values():
+            for jerarquia in consulta.jerarquias:
+                fichero = os.path.join(self.configuracion_global['directorio_jerarquias'], self.actividad,
+                                       'original', jerarquia.id_jerarquia)
+                if fichero not in jerarquias.setdefault(jerarquia.nombre, []):
+                    jerarquias[jerarquia.nombre].append(fichero)
+
+        componentes = componentes_estructura(self.configuracion['variables'], self.actividad, agencia, version)
+        self.logger.info('Generando estructuras SDMX-ML')
+        codigos = generar_estructuras(os.path.join(directorio, 'estructuras.xml'), self.configuracion, componentes,
+                                      jerarquias, self.configuracion_global, self.actividad)
+        self.logger.info('Listas de códigos generadas: %s', codigos)
+
+        self.logger.info('Generando datos SDMX-CSV')
+        for informacion_grupo in self.configuracion['grupos_consultas'].values():
+            filas = escribir_sdmx_csv(os.path.join(directorio, 'extension_disjuntos', informacion_grupo['id']),
+                                      os.path.join(directorio_sdmx_csv, informacion_grupo['id'] + '.csv'),
+                                      f"{agencia}:DF_{self.actividad}_{informacion_grupo['id']}({version})",
+                                      componentes)
+            self.logger.info('Grupo %s: %s filas', informacion_grupo['id'], filas)
+
+    def exportar_csv_SDMX(self):
+        """Accion que, si el :obj:`formato_salida` de la configuración global es columnar, exporta a .CSV separado
+        por **;** los datos agrupados de :obj:`directorio_datos_SDMX` y las listas de códigos SDMX de las jerarquias
+        de la actividad, que son los ficheros que se importan con las herramientas de SDMX.
+        """
+        if self.configuracion_global['formato_salida'] == 'csv':
+            return
+        self.logger.info('Exportando a CSV los datos y jerarquias SDMX')
+        exportadas = exportar_csv(os.path.join(self.configuracion_global['directorio_datos_SDMX'], self.actividad))
+        exportadas += exportar_csv(os.path.join(self.configuracion_global['directorio_jerarquias'], self.actividad,
+                                                'sdmx'))
+        self.logger.info('Ficheros exportados: %s', len(exportadas))
 
     def comprobar_dimensiones_grupo_actividad(self, columnas_grupo, grupo):
         """Comprueba el modelado por titulos en BADEA y muestra por pantalla advertencias sobre las dimensiones
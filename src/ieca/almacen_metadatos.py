@@ -0,0 +1,215 @@
+import logging
+import os
+import pickle
+import sys
+import threading
+
+import yaml
+
+from src.ieca.repositorio_mapas import version_fichero
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+EXTENSION_INDICE = '.indice.pkl'
+VERSION_INDICE = 1
+CargadorYAML = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+URN_ESQUEMA_CONCEPTOS = 'urn:sdmx:org.sdmx.infomodel.conceptscheme.ConceptScheme='
+URN_CONCEPTO = 'urn:sdmx:org.sdmx.infomodel.conceptscheme.Concept='
+URN_CODELIST = 'urn:sdmx:org.sdmx.infomodel.codelist.Codelist='
+# Esquemas de conceptos que aparecen en conceptos_codelist.yaml solo por su ID
+ESQUEMAS_CONCEPTOS = {'CROSS_DOMAIN_CONCEPTS': URN_ESQUEMA_CONCEPTOS + 'SDMX:CROSS_DOMAIN_CONCEPTS(2.0)'}
+
+
+def ruta_indice(fichero):
+    """Devuelve la ruta del índice compilado que acompaña a un fichero YAML.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero YAML.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta del índice.
+     """
+    return os.path.splitext(fichero)[0] + EXTENSION_INDICE
+
+
+def leer_yaml_compilado(fichero, compilar=None):
+    """Lee un fichero YAML a través de su índice compilado con :mod:`pickle`, que se regenera solo si el YAML ha
+    cambiado desde que se compiló. Si no puede escribirse el índice, se devuelve igualmente el contenido.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero YAML.
+        compilar (:class:`Función`, opcional): Transforma el contenido del YAML en la estructura que se guarda en
+            el índice.
+
+    Returns:
+        - datos: Contenido compilado del YAML, :obj:`None` si no existe.
+        - compilado (:class:`Booleano`): Verdadero si se ha tenido que leer el YAML.
+     """
+    version = version_fichero(fichero)
+    if version is None:
+        return None, False
+
+    indice = ruta_indice(fichero)
+    try:
+        with open(indice, 'rb') as origen:
+            contenido = pickle.load(origen)
+        if contenido['version'] == VERSION_INDICE and contenido['version_yaml'] == version:
+            return contenido['datos'], False
+    except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+        pass
+
+    with open(fichero, 'r', encoding='utf-8') as origen:
+        datos = yaml.load(origen, Loader=CargadorYAML)
+    if compilar is not None:
+        datos = compilar(datos)
+
+    fichero_temporal = f'{indice}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        with open(fichero_temporal, 'wb') as destino:
+            pickle.dump({'version': VERSION_INDICE, 'version_yaml': version, 'datos': datos}, destino,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fichero_temporal, indice)
+    except OSError as e:
+        logging.getLogger('Almacen metadatos').warning('No se ha podido guardar el índice %s: %s', indice, e)
+    finally:
+        if os.path.exists(fichero_temporal):
+            os.remove(fichero_temporal)
+    return datos, True
+
+
+def valor_definido(valor):
+    """Los campos sin valor de conceptos_codelist.yaml aparecen como nulos o con el texto **None**."""
+    return None if valor is None or str(valor).strip().lower() in ('none', 'null', '') else str(valor).strip()
+
+
+def urn_concepto(esquema, concepto):
+    """Construye la URN de un concepto a partir de la URN o el ID de su esquema.
+
+    Returns:
+        urn (:class:`Cadena de Texto`): URN del concepto, :obj:`None` si falta el esquema o el concepto.
+    """
+    esquema = ESQUEMAS_CONCEPTOS.get(esquema, esquema)
+    if esquema is None or concepto is None or not esquema.startswith(URN_ESQUEMA_CONCEPTOS):
+        return None
+    return f'{URN_CONCEPTO}{esquema[len(URN_ESQUEMA_CONCEPTOS):]}.{concepto}'
+
+
+def compilar_conceptos(datos):
+    """Normaliza el contenido de conceptos_codelist.yaml: limpia los nombres de las variables y los campos sin
+    valor y calcula las URN del concepto y de la lista de códigos de cada variable.
+
+    Args:
+        datos (:class:`Diccionario`): Contenido del YAML.
+
+    Returns:
+        conceptos (:class:`Diccionario`): Concepto de cada variable.
+    """
+    conceptos = {}
+    for variable, definicion in (datos or {}).items():
+        esquema = valor_definido(definicion.get('concept_scheme'))
+        concepto = valor_definido(definicion.get('concept'))
+        codelist = definicion.get('codelist') or {}
+        id_codelist = valor_definido(codelist.get('id'))
+        conceptos[str(variable).strip()] = {
+            'tipo': valor_definido(definicion.get('tipo')),
+            'descripcion': valor_definido(definicion.get('descripcion')),
+            'concepto': concepto,
+            'urn_concepto': urn_concepto(esquema, concepto),
+            'codelist': id_codelist,
+            'urn_codelist': f"{URN_CODELIST}{codelist['agency']}:{id_codelist}({codelist['version']})"
+            if id_codelist else None}
+    return conceptos
+
+
+class AlmacenMetadatos:
+    """Almacén común a todo el proceso con las traducciones del fichero :obj:`fichero` de la sección
+    :obj:`traduccion` y los conceptos y listas de códigos de :obj:`fichero_conceptos_codelist` de la configuración
+    global. Cada YAML se lee de su índice compilado con :func:`leer_yaml_compilado` la primera vez que se consulta
+    y vuelve a leerse si cambia en disco.
+
+    Attributes:
+        compilaciones (:class:`Entero`): Número de veces que se ha tenido que leer un YAML.
+    """
+
+    def __init__(self):
+        self.ficheros = {}
+        self.cargados = {}
+        self.compilaciones = 0
+        self.bloqueo = threading.Lock()
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def configurar(self, configuracion_global):
+        """Asocia el almacén a los ficheros de la configuración global.
+
+        Args:
+            configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se
+                realicen.
+        """
+        with self.bloqueo:
+            self.ficheros = {'traducciones': configuracion_global['traduccion']['fichero'],
+                             'conceptos': configuracion_global['fichero_conceptos_codelist']}
+
+    def obtener(self, nombre):
+        """Devuelve el contenido compilado de uno de los ficheros, leyéndolo si ha cambiado en disco."""
+        fichero = self.ficheros[nombre]
+        version = version_fichero(fichero)
+        with self.bloqueo:
+            cargado = self.cargados.get(nombre)
+            if cargado is None or cargado['fichero'] != fichero or cargado['version'] != version:
+                if nombre == 'conceptos':
+                    datos, compilado = leer_yaml_compilado(fichero, compilar_conceptos)
+                else:
+                    datos, compilado = leer_yaml_compilado(fichero)
+                cargado = {'fichero': fichero, 'version': version, 'datos': datos or {}, 'indices': {}}
+                self.cargados[nombre] = cargado
+                self.compilaciones += compilado
+            return cargado
+
+    def traducciones(self, origen='es', destino='en'):
+        """Traducciones conocidas de un idioma a otro.
+
+        Returns:
+            traducciones (:class:`Diccionario`): Traducción de cada texto en el idioma de origen. Es compartido y
+            debe tratarse como de solo lectura.
+        """
+        cargado = self.obtener('traducciones')
+        with self.bloqueo:
+            if (origen, destino) not in cargado['indices']:
+                cargado['indices'][(origen, destino)] = {par[origen]: par[destino] for par in cargado['datos'].values()
+                                                         if origen in par and destino in par}
+            return cargado['indices'][(origen, destino)]
+
+    def traducir(self, texto, destino='en', origen='es'):
+        """Traducción conocida de un texto.
+
+        Returns:
+            traduccion (:class:`Cadena de Texto`): La traducción, :obj:`None` si no se conoce.
+        """
+        return self.traducciones(origen, destino).get(texto)
+
+    def concepto(self, variable):
+        """Concepto y lista de códigos de una variable de la actividad.
+
+        Args:
+            variable (:class:`Cadena de Texto`): Nombre de la variable, como en **conceptos_codelist.yaml**.
+
+        Returns:
+            concepto (:class:`Diccionario`): Tipo, descripción, concepto y lista de códigos con sus URN,
+            :obj:`None` si la variable no está definida.
+        """
+        return self.obtener('conceptos')['datos'].get(variable)
+
+    def estadisticas(self):
+        """Resumen del uso del almacén.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Ficheros cargados y veces que se ha leído un YAML.
+        """
+        with self.bloqueo:
+            return {'ficheros': len(self.cargados), 'compilaciones': self.compilaciones}
+
+
+almacen_metadatos = AlmacenMetadatos()
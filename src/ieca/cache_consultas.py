@@ -0,0 +1,281 @@
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from src.ieca.cliente_api import cliente_api
+from src.ieca.columnas import construir_columnas
+from src.ieca.lector_json import leer_consulta_por_bloques
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+EXTENSION_CACHE = '.pkl.gz'
+EXTENSION_METADATOS = '.meta.json'
+VERSION_CACHE = 1
+
+INICIO_EJECUCION = time.time()
+
+
+def ruta_cache_consulta(directorio_json):
+    """Devuelve la ruta de la caché binaria que acompaña al JSON de una consulta.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta de la caché.
+     """
+    return os.path.splitext(directorio_json)[0] + EXTENSION_CACHE
+
+
+def cache_vigente(fichero_cache, directorio_json):
+    """Comprueba si existe la caché de una consulta y no es anterior a su JSON, que puede haberse vuelto a
+    descargar.
+
+    Args:
+        fichero_cache (:class:`Cadena de Texto`): Ruta de la caché.
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+    Returns:
+        vigente (:class:`Booleano`): Verdadero si puede usarse la caché.
+     """
+    if not os.path.exists(fichero_cache):
+        return False
+    return not os.path.exists(directorio_json) or os.path.getmtime(fichero_cache) >= os.path.getmtime(directorio_json)
+
+
+def columnas_consulta(cabecera, bloques):
+    """Compacta en columnas los bloques de observaciones de una consulta.
+
+    Args:
+        cabecera (:class:`Diccionario`): Claves **hierarchies** y **measures** del JSON de la consulta.
+        bloques (:class:`Iterador` de :obj:`Lista`): Bloques de observaciones, :obj:`None` si no hay datos.
+
+    Returns:
+        columnas (:class:`pandas:pandas.DataFrame`): Las observaciones por columnas, :obj:`None` si no hay datos.
+     """
+    if bloques is None:
+        return None
+    return construir_columnas([jerarquia['alias'] for jerarquia in cabecera['hierarchies']],
+                              [medida['des'] for medida in cabecera['measures']], bloques)
+
+
+def guardar_cache_consulta(fichero_cache, cabecera, columnas):
+    """Guarda la caché binaria de una consulta: la cabecera del JSON y sus observaciones ya compactadas en
+    columnas, serializadas con :mod:`pickle` y comprimidas con gzip. Se escribe primero un fichero temporal, de
+    forma que ningún lector encuentre la caché a medio escribir.
+
+    Args:
+        fichero_cache (:class:`Cadena de Texto`): Ruta de la caché.
+        cabecera (:class:`Diccionario`): Todas las claves del JSON de la consulta salvo **data**.
+        columnas (:class:`pandas:pandas.DataFrame`): Las observaciones por columnas, :obj:`None` si no hay datos.
+     """
+    fichero_temporal = f'{fichero_cache}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        pd.to_pickle({'version': VERSION_CACHE, 'cabecera': cabecera, 'columnas': columnas}, fichero_temporal,
+                     compression='gzip')
+        os.replace(fichero_temporal, fichero_cache)
+    finally:
+        if os.path.exists(fichero_temporal):
+            os.remove(fichero_temporal)
+
+
+def cargar_cache_consulta(fichero_cache):
+    """Carga la caché binaria de una consulta.
+
+    Args:
+        fichero_cache (:class:`Cadena de Texto`): Ruta de la caché.
+
+    Returns:
+        - cabecera (:class:`Diccionario`): Todas las claves del JSON de la consulta salvo **data**.
+        - columnas (:class:`pandas:pandas.DataFrame`): Las observaciones por columnas, :obj:`None` si no hay datos.
+     """
+    cache = pd.read_pickle(fichero_cache, compression='gzip')
+    if cache.get('version') != VERSION_CACHE:
+        raise ValueError(f'Versión de caché no soportada: {cache.get("version")}')
+    return cache['cabecera'], cache['columnas']
+
+
+def migrar_cache_consultas(directorio_json, tamano_bloque, borrar_json=False):
+    """Genera la caché binaria de todas las consultas almacenadas en JSON bajo el directorio
+    :obj:`directorio_json`, con un subdirectorio por actividad.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Directorio de los JSON de las consultas.
+        tamano_bloque (:class:`Entero`): Número de observaciones que se leen del JSON cada vez.
+        borrar_json (:class:`Booleano`): Borra cada JSON una vez generada su caché.
+
+    Returns:
+        migradas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de las cachés generadas.
+     """
+    logger = logging.getLogger('Cache consultas')
+    migradas = []
+    for directorio in sorted(glob.glob(os.path.join(directorio_json, '*', '*.json'))):
+        fichero_cache = ruta_cache_consulta(directorio)
+        if not cache_vigente(fichero_cache, directorio):
+            try:
+                cabecera, bloques = leer_consulta_por_bloques(directorio, tamano_bloque)
+                with contextlib.closing(bloques) if bloques is not None else contextlib.nullcontext():
+                    guardar_cache_consulta(fichero_cache, cabecera, columnas_consulta(cabecera, bloques))
+            except Exception as e:
+                logger.warning('No se ha podido migrar %s: %s', directorio, e)
+                continue
+            logger.info('Caché generada: %s', fichero_cache)
+            migradas.append(fichero_cache)
+        if borrar_json:
+            os.remove(directorio)
+    return migradas
+
+
+def ruta_metadatos_consulta(directorio_json):
+    """Devuelve la ruta del fichero de metadatos de la descarga de una consulta.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta de los metadatos.
+     """
+    return os.path.splitext(directorio_json)[0] + EXTENSION_METADATOS
+
+
+def leer_metadatos_consulta(directorio_json):
+    """Lee los metadatos de la descarga de una consulta: URL, cabeceras **ETag** y **Last-Modified** de la
+    respuesta, resumen SHA-256 del contenido y momentos de la última revalidación y de la última modificación.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+    Returns:
+        metadatos (:class:`Diccionario`): Los metadatos, vacío si no existen o no pueden leerse.
+     """
+    try:
+        with open(ruta_metadatos_consulta(directorio_json), 'r', encoding='utf-8') as fichero:
+            return json.load(fichero)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_metadatos_consulta(directorio_json, metadatos):
+    """Guarda los metadatos de la descarga de una consulta escribiendo primero un fichero temporal.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+        metadatos (:class:`Diccionario`): Metadatos de la descarga.
+     """
+    fichero = ruta_metadatos_consulta(directorio_json)
+    fichero_temporal = f'{fichero}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        with open(fichero_temporal, 'w', encoding='utf-8') as destino:
+            json.dump(metadatos, destino, indent=2)
+        os.replace(fichero_temporal, fichero)
+    finally:
+        if os.path.exists(fichero_temporal):
+            os.remove(fichero_temporal)
+
+
+def resumen_fichero(fichero):
+    """Calcula el resumen SHA-256 del contenido de un fichero.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero.
+
+    Returns:
+        resumen (:class:`Cadena de Texto`): El resumen en hexadecimal.
+     """
+    resumen = hashlib.sha256()
+    with open(fichero, 'rb') as origen:
+        for fragmento in iter(lambda: origen.read(1024 ** 2), b''):
+            resumen.update(fragmento)
+    return resumen.hexdigest()
+
+
+def consulta_en_local(directorio_json, configuracion_global):
+    """Comprueba si una consulta está disponible en local, en JSON o en la caché binaria.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+
+    Returns:
+        en_local (:class:`Booleano`): Verdadero si la consulta no necesita descargarse.
+     """
+    return os.path.exists(directorio_json) or (configuracion_global['formato_cache_consultas'] == 'pickle' and
+                                                os.path.exists(ruta_cache_consulta(directorio_json)))
+
+
+def consulta_caducada(directorio_json, configuracion_global, caducidad_horas):
+    """Comprueba si una consulta en local debe revalidarse con la API, porque su última revalidación es más
+    antigua que `caducidad_horas` o porque :obj:`refrescar_cache_consultas` está activo y no se ha revalidado
+    durante esta ejecución. Sin caducidad ni refresco las consultas en local no se revalidan nunca.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        caducidad_horas (:class:`Decimal`): Horas de validez de la consulta, :obj:`None` si no caduca.
+
+    Returns:
+        caducada (:class:`Booleano`): Verdadero si debe revalidarse.
+     """
+    metadatos = leer_metadatos_consulta(directorio_json)
+    revalidada = metadatos.get('revalidada')
+    if revalidada is None:
+        revalidada = os.path.getmtime(directorio_json) if os.path.exists(directorio_json) else 0
+    if configuracion_global['refrescar_cache_consultas'] and revalidada < INICIO_EJECUCION:
+        return True
+    return caducidad_horas is not None and time.time() - revalidada > caducidad_horas * 3600
+
+
+def descargar_consulta_api(url, directorio_json, revalidar=False):
+    """Descarga el JSON de una consulta guardando los metadatos de la descarga. Al revalidar una consulta ya
+    descargada la petición es condicional y el JSON solo se reescribe si su contenido ha cambiado, de forma que
+    su caché binaria sigue siendo válida.
+
+    Args:
+        url (:class:`Cadena de Texto`): URL de la consulta en la API.
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+        revalidar (:class:`Booleano`): Compara la respuesta con la descarga anterior.
+
+    Returns:
+        modificada (:class:`Booleano`): Verdadero si el contenido de la consulta ha cambiado.
+     """
+    metadatos = leer_metadatos_consulta(directorio_json) if revalidar else {}
+    cabeceras = {}
+    sha256_actual = None
+    if revalidar:
+        if metadatos.get('etag'):
+            cabeceras['If-None-Match'] = metadatos['etag']
+        if metadatos.get('last_modified'):
+            cabeceras['If-Modified-Since'] = metadatos['last_modified']
+        sha256_actual = metadatos.get('sha256')
+        if sha256_actual is None and os.path.exists(directorio_json):
+            sha256_actual = resumen_fichero(directorio_json)
+
+    resultado = cliente_api.descargar(url, directorio_json, cabeceras, sha256_actual)
+    ahora = time.time()
+    guardar_metadatos_consulta(directorio_json, {
+        'url': url, 'etag': resultado['etag'] or metadatos.get('etag'),
+        'last_modified': resultado['last_modified'] or metadatos.get('last_modified'),
+        'sha256': resultado['sha256'], 'revalidada': ahora,
+        'modificada': ahora if resultado['modificado'] else metadatos.get('modificada', ahora)})
+    return resultado['modificado']
+
+
+def consulta_modificada(directorio_json):
+    """Comprueba si el contenido de una consulta ha cambiado durante esta ejecución.
+
+    Args:
+        directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+    Returns:
+        modificada (:class:`Booleano`): Verdadero si se ha descargado un contenido nuevo en esta ejecución.
+     """
+    return leer_metadatos_consulta(directorio_json).get('modificada', 0) >= INICIO_EJECUCION
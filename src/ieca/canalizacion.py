@@ -0,0 +1,203 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ieca.instrumentacion import instrumentacion
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+ETAPAS = ['descarga', 'transformacion', 'persistencia']
+FIN = object()
+
+
+class Canalizacion:
+    """Ejecuta las consultas de una actividad en tres etapas que se solapan: descarga, transformación y
+    persistencia. Cada etapa se comunica con la siguiente a través de una cola acotada, de forma que mientras se
+    transforma una consulta ya se están descargando las siguientes y guardando las anteriores.
+
+    Las colas aplican contrapresión: una etapa que se adelanta espera a que la siguiente libere sitio, por lo que
+    no hay más de :obj:`cola_descargas` descargas por delante de la transformación ni más de
+    :obj:`cola_persistencia` consultas transformadas pendientes de guardar.
+
+    La transformación se realiza en el hilo que llama a :meth:`~.ejecutar` y en el orden de las consultas, ya que
+    sus acciones escriben jerarquias y mapas de dimensiones que reutilizan las siguientes. La persistencia se
+    realiza en un único hilo en el mismo orden, por lo que los resultados conservan el orden de las consultas.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+
+    Attributes:
+        estadisticas_etapas (:class:`Diccionario`): Por cada etapa, elementos procesados, filas, tiempo ocupado y
+            tiempo esperando a la etapa anterior (**espera_entrada**) o a la siguiente (**espera_salida**).
+    """
+
+    def __init__(self, configuracion_global, actividad):
+        configuracion = configuracion_global['canalizacion']
+        self.trabajadores = configuracion_global['trabajadores_consultas']
+        self.tamano_cola_descargas = configuracion['cola_descargas']
+        self.tamano_cola_persistencia = configuracion['cola_persistencia']
+        self.actividad = actividad
+
+        self.estadisticas_etapas = {etapa: {'elementos': 0, 'filas': 0, 'ocupado': 0.0, 'espera_entrada': 0.0,
+                                            'espera_salida': 0.0} for etapa in ETAPAS}
+        self.bloqueo = threading.Lock()
+        self.detener = threading.Event()
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__} [{actividad}]')
+
+    def ejecutar(self, elementos, descargar, transformar, persistir, contar_filas=None):
+        """Procesa los elementos por las tres etapas.
+
+        Args:
+            elementos (:class:`Diccionario`): Argumento de cada elemento, cuya clave será su ID.
+            descargar (:class:`Función`): Recibe el argumento del elemento; se ejecuta en
+                :obj:`trabajadores_consultas` hilos.
+            transformar (:class:`Función`): Recibe el argumento del elemento y devuelve su resultado.
+            persistir (:class:`Función`): Recibe el resultado de la transformación.
+            contar_filas (:class:`Función`, opcional): Filas de un resultado, para las estadísticas.
+
+        Returns:
+            - resultados (:class:`Diccionario`): Resultado de cada elemento completado, en el orden de `elementos`.
+            - fallidos (:class:`Diccionario`): Excepción de cada elemento que ha fallado en alguna etapa.
+        """
+        resultados, fallidos = {}, {}
+        cola_descargas = queue.Queue(maxsize=self.tamano_cola_descargas)
+        cola_persistencia = queue.Queue(maxsize=self.tamano_cola_persistencia)
+        self.detener.clear()
+        inicio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.trabajadores) as executor:
+            hilos = [threading.Thread(target=self.lanzar_descargas, name=f'descarga-{self.actividad}',
+                                      args=(elementos, descargar, executor, cola_descargas)),
+                     threading.Thread(target=self.persistir, name=f'persistencia-{self.actividad}',
+                                      args=(persistir, contar_filas, cola_persistencia, resultados, fallidos))]
+            for hilo in hilos:
+                hilo.start()
+            try:
+                self.transformar(transformar, contar_filas, cola_descargas, cola_persistencia, fallidos)
+            except BaseException:
+                self.detener.set()
+                raise
+            finally:
+                for hilo in hilos:
+                    hilo.join()
+
+        self.logger.info('Canalización completada en %.2f s: %s', time.perf_counter() - inicio,
+                         self.estadisticas())
+        return {id_elemento: resultados[id_elemento] for id_elemento in elementos if id_elemento in resultados}, \
+            fallidos
+
+    def poner(self, cola, elemento, etapa):
+        """Añade un elemento a una cola esperando mientras esté llena, salvo que se detenga la canalización.
+
+        Returns:
+            puesto (:class:`Booleano`): Falso si la canalización se ha detenido antes de poder añadirlo.
+        """
+        inicio = time.perf_counter()
+        try:
+            while not self.detener.is_set():
+                try:
+                    cola.put(elemento, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.registrar(etapa, espera_salida=time.perf_counter() - inicio)
+
+    def sacar(self, cola, etapa):
+        """Saca el siguiente elemento de una cola esperando a que la etapa anterior lo produzca."""
+        inicio = time.perf_counter()
+        elemento = cola.get()
+        self.registrar(etapa, espera_entrada=time.perf_counter() - inicio)
+        return elemento
+
+    def lanzar_descargas(self, elementos, descargar, executor, cola_descargas):
+        """Etapa de descarga: lanza las descargas en orden, sin adelantarse más de lo que admite la cola."""
+        try:
+            for id_elemento, argumento in elementos.items():
+                descarga = executor.submit(self.medir, 'descarga', id_elemento, descargar, argumento)
+                if not self.poner(cola_descargas, (id_elemento, argumento, descarga), 'descarga'):
+                    return
+        finally:
+            self.poner(cola_descargas, FIN, 'descarga')
+
+    def transformar(self, transformar, contar_filas, cola_descargas, cola_persistencia, fallidos):
+        """Etapa de transformación: espera a cada descarga y transforma los elementos en orden."""
+        try:
+            while True:
+                elemento = self.sacar(cola_descargas, 'transformacion')
+                if elemento is FIN:
+                    return
+                id_elemento, argumento, descarga = elemento
+                try:
+                    descarga.result()
+                    resultado = self.medir('transformacion', id_elemento, transformar, argumento,
+                                           contar_filas=contar_filas)
+                except Exception as e:
+                    self.logger.error('El elemento %s ha fallado: %s', id_elemento, e)
+                    with self.bloqueo:
+                        fallidos[id_elemento] = e
+                    continue
+                if not self.poner(cola_persistencia, (id_elemento, resultado), 'transformacion'):
+                    return
+        finally:
+            # La persistencia consume la cola hasta recibir el final, por lo que siempre hay sitio para él
+            cola_persistencia.put(FIN)
+
+    def persistir(self, persistir, contar_filas, cola_persistencia, resultados, fallidos):
+        """Etapa de persistencia: guarda los resultados transformados en orden."""
+        while True:
+            elemento = self.sacar(cola_persistencia, 'persistencia')
+            if elemento is FIN:
+                return
+            id_elemento, resultado = elemento
+            try:
+                self.medir('persistencia', id_elemento, persistir, resultado, filas=contar_filas(resultado)
+                           if contar_filas else 0)
+            except Exception as e:
+                self.logger.error('El elemento %s ha fallado al guardarse: %s', id_elemento, e)
+                with self.bloqueo:
+                    fallidos[id_elemento] = e
+                continue
+            with self.bloqueo:
+                resultados[id_elemento] = resultado
+
+    def medir(self, etapa, id_elemento, funcion, argumento, contar_filas=None, filas=0):
+        """Ejecuta la función de una etapa sobre un elemento, registrando su tiempo y sus filas."""
+        inicio = time.perf_counter()
+        try:
+            with instrumentacion.medir(f'canalizacion_{etapa}', id_elemento) as medicion:
+                resultado = funcion(argumento)
+                if contar_filas is not None:
+                    filas = contar_filas(resultado)
+                medicion['filas_salida'] = filas
+            return resultado
+        finally:
+            self.registrar(etapa, ocupado=time.perf_counter() - inicio, elementos=1, filas=filas)
+
+    def registrar(self, etapa, **incrementos):
+        with self.bloqueo:
+            for campo, incremento in incrementos.items():
+                self.estadisticas_etapas[etapa][campo] += incremento
+
+    def estadisticas(self):
+        """Resumen del rendimiento de cada etapa, con los tiempos redondeados y el número de filas por segundo
+        ocupado.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Estadísticas de cada etapa.
+        """
+        with self.bloqueo:
+            estadisticas = {}
+            for etapa, valores in self.estadisticas_etapas.items():
+                estadisticas[etapa] = {campo: round(valor, 3) if isinstance(valor, float) else valor
+                                       for campo, valor in valores.items()}
+                estadisticas[etapa]['filas_por_segundo'] = round(valores['filas'] / valores['ocupado']) \
+                    if valores['ocupado'] else None
+            return estadisticas
@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.ieca.instrumentacion import instrumentacion
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+
+
+class ClienteAPI:
+    """Cliente HTTP común a todo el proceso para las peticiones a la API del IECA. Reutiliza las conexiones a
+    través de una única :class:`requests.Session`, limita el tiempo de cada petición, reintenta los fallos
+    transitorios con una espera exponencial aleatoria y limita tanto las peticiones simultáneas como el ritmo de
+    peticiones, ya que la API no soporta bien la carga.
+
+    Los límites son propios de cada proceso. Para que varios procesos respeten los mismos límites, como los de
+    :class:`src.ieca.planificador.Planificador`, se crean con :func:`crear_limites_compartidos` y cada proceso los
+    recibe con :meth:`~.compartir_limites`.
+
+    Args:
+        timeout_conexion (:class:`Decimal`): Segundos máximos para establecer la conexión.
+        timeout_lectura (:class:`Decimal`): Segundos máximos de espera entre dos fragmentos de la respuesta.
+        reintentos (:class:`Entero`): Número de reintentos tras un fallo transitorio.
+        espera_base_reintento (:class:`Decimal`): Segundos de espera base entre reintentos, que se duplica en cada
+            reintento.
+        espera_maxima_reintento (:class:`Decimal`): Segundos máximos de espera entre reintentos.
+        peticiones_simultaneas (:class:`Entero`): Número máximo de peticiones en curso a la vez.
+        peticiones_por_segundo (:class:`Decimal`): Número máximo de peticiones iniciadas por segundo, 0 para no
+            limitarlo.
+
+    Attributes:
+        peticiones (:class:`Entero`): Número de peticiones realizadas, incluidos los reintentos.
+        fallos (:class:`Entero`): Número de peticiones fallidas que han provocado un reintento o un error.
+    """
+
+    def __init__(self, timeout_conexion=10, timeout_lectura=300, reintentos=3, espera_base_reintento=1,
+                 espera_maxima_reintento=30, peticiones_simultaneas=4, peticiones_por_segundo=2):
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+        self.reintentos = reintentos
+        self.espera_base_reintento = espera_base_reintento
+        self.espera_maxima_reintento = espera_maxima_reintento
+        self.peticiones_simultaneas = peticiones_simultaneas
+        self.peticiones_por_segundo = peticiones_por_segundo
+
+        self.peticiones = 0
+        self.fallos = 0
+
+        self.bloqueo = threading.Lock()
+        self.semaforo = threading.BoundedSemaphore(peticiones_simultaneas)
+        self.siguiente_peticion = 0.0
+        self.turno_compartido = None
+        self.sesion = None
+        self.pid = None
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def configurar(self, configuracion_global):
+        """Ajusta el cliente a la sección :obj:`cliente_api` de la configuración global.
+
+        Args:
+            configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se
+                realicen.
+        """
+        configuracion = configuracion_global['cliente_api']
+        with self.bloqueo:
+            self.timeout_conexion = configuracion['timeout_conexion']
+            self.timeout_lectura = configuracion['timeout_lectura']
+            self.reintentos = configuracion['reintentos']
+            self.espera_base_reintento = configuracion['espera_base_reintento']
+            self.espera_maxima_reintento = configuracion['espera_maxima_reintento']
+            self.peticiones_por_segundo = configuracion['peticiones_por_segundo']
+            if configuracion['peticiones_simultaneas'] != self.peticiones_simultaneas:
+                self.peticiones_simultaneas = configuracion['peticiones_simultaneas']
+                if self.turno_compartido is None:
+                    self.semaforo = threading.BoundedSemaphore(self.peticiones_simultaneas)
+                self.sesion = None
+
+    def compartir_limites(self, semaforo, turno):
+        """Sustituye los límites de peticiones simultáneas y de ritmo de peticiones del proceso por los límites
+        comunes a varios procesos creados con :func:`crear_limites_compartidos`.
+
+        Args:
+            semaforo (:class:`multiprocessing.BoundedSemaphore`): Semáforo de las peticiones simultáneas.
+            turno (:class:`multiprocessing.Value`): Instante, según :func:`time.monotonic`, a partir del cual se
+                puede iniciar la siguiente petición.
+        """
+        with self.bloqueo:
+            self.semaforo = semaforo
+            self.turno_compartido = turno
+
+    def obtener_sesion(self):
+        """Devuelve la sesión HTTP del proceso, creándola si no existe. Los procesos hijos crean la suya propia
+        en lugar de compartir las conexiones heredadas.
+
+        Returns:
+            sesion (:class:`requests.Session`): Sesión con un conjunto de conexiones persistentes.
+        """
+        with self.bloqueo:
+            if self.sesion is None or self.pid != os.getpid():
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=self.peticiones_simultaneas,
+                                        pool_maxsize=self.peticiones_simultaneas)
+                sesion.mount('http://', adaptador)
+                sesion.mount('https://', adaptador)
+                sesion.headers.update({'Accept-Encoding': 'gzip, deflate'})
+                self.sesion = sesion
+                self.pid = os.getpid()
+            return self.sesion
+
+    def esperar_turno(self):
+        """Espera hasta que el límite de :attr:`~.peticiones_por_segundo` permite iniciar otra petición.
+        """
+        if not self.peticiones_por_segundo:
+            return
+        compartido = self.turno_compartido
+        with self.bloqueo if compartido is None else compartido.get_lock():
+            ahora = time.monotonic()
+            turno = max(ahora, self.siguiente_peticion if compartido is None else compartido.value)
+            if compartido is None:
+                self.siguiente_peticion = turno + 1 / self.peticiones_por_segundo
+            else:
+                compartido.value = turno + 1 / self.peticiones_por_segundo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+    def espera_reintento(self, intento, respuesta=None):
+        """Calcula la espera antes de un reintento, respetando la cabecera **Retry-After** si la API la envía.
+
+        Args:
+            intento (:class:`Entero`): Número del reintento, empezando por 0.
+            respuesta (:class:`requests.Response`, opcional): Respuesta fallida.
+
+        Returns:
+            espera (:class:`Decimal`): Segundos de espera.
+        """
+        if respuesta is not None and respuesta.headers.get('Retry-After', '').isdigit():
+            return min(float(respuesta.headers['Retry-After']), self.espera_maxima_reintento)
+        return random.uniform(0, min(self.espera_maxima_reintento, self.espera_base_reintento * 2 ** intento))
+
+    def solicitar(self, url, procesar, cabeceras=None):
+        """Realiza una petición GET reintentando los fallos transitorios. La respuesta se procesa dentro del límite
+        de peticiones simultáneas, de forma que su descarga también cuenta para el límite.
+
+        Args:
+            url (:class:`Cadena de Texto`): URL de la petición.
+            procesar (:class:`Función`): Función que recibe la :class:`requests.Response` y devuelve el resultado.
+            cabeceras (:class:`Diccionario`, opcional): Cabeceras adicionales de la petición.
+
+        Returns:
+            resultado: Lo devuelto por `procesar`.
+        """
+        sesion = self.obtener_sesion()
+        with instrumentacion.medir('solicitud_api', url):
+            for intento in range(self.reintentos + 1):
+                respuesta = None
+                try:
+                    with self.semaforo:
+                        self.esperar_turno()
+                        with self.bloqueo:
+                            self.peticiones += 1
+                        with sesion.get(url, stream=True, headers=cabeceras,
+                                        timeout=(self.timeout_conexion, self.timeout_lectura)) as respuesta:
+                            if respuesta.status_code not in ESTADOS_REINTENTABLES:
+                                respuesta.raise_for_status()
+                                return procesar(respuesta)
+                            error = requests.HTTPError(f'{respuesta.status_code} para la url: {url}',
+                                                       response=respuesta)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    error = e
+
+                with self.bloqueo:
+                    self.fallos += 1
+                if intento == self.reintentos:
+                    self.logger.error('Petición fallida tras %s intentos: %s', intento + 1, url)
+                    raise error
+                espera = self.espera_reintento(intento, respuesta)
+                self.logger.warning('Petición fallida (%s), reintentando en %.1f s: %s', error, espera, url)
+                time.sleep(espera)
+            return None
+
+    def obtener_json(self, url):
+        """Solicita una URL y decodifica su respuesta JSON.
+
+        Args:
+            url (:class:`Cadena de Texto`): URL de la petición.
+
+        Returns:
+            respuesta (:class:`Diccionario`): La respuesta decodificada.
+        """
+        return self.solicitar(url, lambda respuesta: respuesta.json())
+
+    def descargar(self, url, fichero, cabeceras=None, sha256_actual=None):
+        """Solicita una URL y guarda su respuesta en un fichero a medida que se recibe, sin mantenerla completa en
+        memoria. Se escribe primero un fichero temporal, de forma que un fallo no deja el destino a medio escribir.
+
+        Para revalidar un fichero ya descargado se pueden enviar cabeceras condicionales (**If-None-Match**,
+        **If-Modified-Since**) y el resumen SHA-256 de su contenido: si la API responde que no ha cambiado o el
+        contenido recibido tiene el mismo resumen, el fichero no se reescribe.
+
+        Args:
+            url (:class:`Cadena de Texto`): URL de la petición.
+            fichero (:class:`Cadena de Texto`): Ruta del fichero destino.
+            cabeceras (:class:`Diccionario`, opcional): Cabeceras adicionales de la petición.
+            sha256_actual (:class:`Cadena de Texto`, opcional): Resumen del contenido ya descargado.
+
+        Returns:
+            resultado (:class:`Diccionario`): **modificado** indica si se ha reescrito el fichero, junto al resumen
+            **sha256** del contenido y las cabeceras **etag** y **last_modified** de la respuesta.
+        """
+        fichero_temporal = f'{fichero}.{os.getpid()}-{threading.get_ident()}.tmp'
+
+        def guardar(respuesta):
+            resultado = {'modificado': False, 'sha256': sha256_actual, 'etag': respuesta.headers.get('ETag'),
+                         'last_modified': respuesta.headers.get('Last-Modified')}
+            if respuesta.status_code == 304:
+                return resultado
+
+            resumen = hashlib.sha256()
+            with open(fichero_temporal, 'wb') as destino:
+                for fragmento in respuesta.iter_content(chunk_size=1024 ** 2):
+                    resumen.update(fragmento)
+                    destino.write(fragmento)
+            resultado['sha256'] = resumen.hexdigest()
+            if resultado['sha256'] != sha256_actual:
+                os.replace(fichero_temporal, fichero)
+                resultado['modificado'] = True
+            return resultado
+
+        try:
+            return self.solicitar(url, guardar, cabeceras)
+        finally:
+            if os.path.exists(fichero_temporal):
+                os.remove(fichero_temporal)
+
+    def estadisticas(self):
+        """Resumen del uso del cliente.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Peticiones realizadas y fallidas.
+        """
+        with self.bloqueo:
+            return {'peticiones': self.peticiones, 'fallos': self.fallos}
+
+
+def crear_limites_compartidos(configuracion_global):
+    """Crea los límites de la sección :obj:`cliente_api` de la configuración global comunes a varios procesos, que
+    cada proceso debe recibir con :meth:`ClienteAPI.compartir_limites`. El ritmo de peticiones se coordina con
+    :func:`time.monotonic`, que es común a todos los procesos de la máquina.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+
+    Returns:
+        limites (:class:`Tupla`): Semáforo de las peticiones simultáneas e instante de la siguiente petición.
+    """
+    configuracion = configuracion_global['cliente_api']
+    return multiprocessing.BoundedSemaphore(configuracion['peticiones_simultaneas']), multiprocessing.Value('d', 0.0)
+
+
+cliente_api = ClienteAPI()
@@ -0,0 +1,125 @@
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+class ConstructorColumnas:
+    """Construye el cuadro de datos de una consulta a partir de las observaciones del JSON de la API recorriéndolas
+    una única vez y por columnas, sin aplicar funciones celda a celda sobre un cuadro de datos de diccionarios.
+
+    Cada observación es una lista con una celda por jerarquia, de la forma ``{'cod': [..., padre, codigo]}``, seguida
+    de una celda por medida, de la forma ``{'val': valor, 'format': valor_formateado}``. Los códigos se guardan como
+    :class:`pandas:pandas.Categorical` y los valores como cadenas de texto, usando el valor formateado cuando el
+    valor está vacío.
+
+    Las observaciones pueden añadirse por bloques con :meth:`~.anadir`, de forma que cada bloque se compacta en
+    columnas antes de procesar el siguiente.
+
+    Args:
+        numero_jerarquias (:class:`Entero`): Número de celdas de jerarquia de cada observación.
+        numero_medidas (:class:`Entero`): Número de celdas de medida de cada observación.
+
+    Attributes:
+        filas (:class:`Entero`): Número de observaciones añadidas.
+    """
+
+    def __init__(self, numero_jerarquias, numero_medidas):
+        self.numero_jerarquias = numero_jerarquias
+        self.numero_medidas = numero_medidas
+        self.filas = 0
+
+        self.codigos = [[] for _ in range(numero_jerarquias)]
+        self.codigos_padre = [[] for _ in range(numero_jerarquias)]
+        self.valores = [[] for _ in range(numero_medidas)]
+
+    def anadir(self, observaciones):
+        """Compacta un bloque de observaciones en columnas.
+
+        Args:
+            observaciones (:obj:`Lista` de :obj:`Lista` de :class:`Diccionario`): Observaciones del JSON.
+        """
+        if not observaciones:
+            return
+        columnas = list(zip(*observaciones))
+
+        for i, columna in enumerate(columnas[:self.numero_jerarquias]):
+            codigos = list(map(itemgetter('cod'), columna))
+            self.codigos[i].append(categorica(list(map(itemgetter(-1), codigos))))
+            self.codigos_padre[i].append(categorica([codigo[-2] if len(codigo) > 1 else None for codigo in codigos]))
+
+        for i, columna in enumerate(columnas[self.numero_jerarquias:self.numero_jerarquias + self.numero_medidas]):
+            valores = np.array(list(map(itemgetter('val'), columna)), dtype=object)
+            vacios = np.flatnonzero(valores == "")
+            valores[vacios] = [columna[indice]['format'] for indice in vacios]
+            self.valores[i].append(valores)
+
+        self.filas += len(observaciones)
+
+    def construir(self, columnas_jerarquia, columnas_medida):
+        """Genera el cuadro de datos con las columnas de las jerarquias, las de las medidas y una columna
+        **<jerarquia>_aux** por jerarquia con el código del padre de cada observación.
+
+        Args:
+            columnas_jerarquia (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de las columnas de jerarquia.
+            columnas_medida (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de las columnas de medida.
+
+        Returns:
+            datos (:class:`pandas:pandas.DataFrame`): Las observaciones en un cuadro de datos.
+        """
+        columnas = {}
+        for columna, bloques in zip(columnas_jerarquia, self.codigos):
+            columnas[columna] = unir_categoricas(bloques)
+        for columna, bloques in zip(columnas_medida, self.valores):
+            columnas[columna] = np.concatenate(bloques) if bloques else np.array([], dtype=object)
+        for columna, bloques in zip(columnas_jerarquia, self.codigos_padre):
+            columnas[columna + '_aux'] = unir_categoricas(bloques)
+
+        return pd.DataFrame(columnas, columns=list(columnas.keys()))
+
+
+def construir_columnas(columnas_jerarquia, columnas_medida, bloques):
+    """Compacta en columnas los bloques de observaciones de una consulta con :class:`~.ConstructorColumnas`.
+
+    Args:
+        columnas_jerarquia (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de las columnas de jerarquia.
+        columnas_medida (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de las columnas de medida.
+        bloques (:class:`Iterador` de :obj:`Lista`): Bloques de observaciones del JSON.
+
+    Returns:
+        datos (:class:`pandas:pandas.DataFrame`): Las observaciones en un cuadro de datos.
+    """
+    constructor = ConstructorColumnas(len(columnas_jerarquia), len(columnas_medida))
+    for bloque in bloques:
+        constructor.anadir(bloque)
+    return constructor.construir(columnas_jerarquia, columnas_medida)
+
+
+def categorica(valores):
+    """Codifica una lista de códigos como columna categórica, en el orden en que aparecen.
+
+    Args:
+        valores (:obj:`Lista` de :class:`Cadena de Texto`): Códigos, pudiendo ser nulos.
+
+    Returns:
+        columna (:class:`pandas:pandas.Categorical`): Los códigos en una columna categórica.
+    """
+    codigos, categorias = pd.factorize(np.array(valores, dtype=object))
+    return pd.Categorical.from_codes(codigos, categorias)
+
+
+def unir_categoricas(bloques):
+    """Une los bloques de una columna categórica.
+
+    Args:
+        bloques (:obj:`Lista` de :class:`pandas:pandas.Categorical`): Bloques de la columna.
+
+    Returns:
+        columna (:class:`pandas:pandas.Categorical`): La columna completa.
+    """
+    if not bloques:
+        return categorica([])
+    if len(bloques) == 1:
+        return bloques[0]
+    return union_categoricals(bloques, sort_categories=True)
@@ -0,0 +1,44 @@
+import os
+import threading
+
+_bloqueo_mapas = threading.Lock()
+
+
+def establecer_bloqueo_mapas(bloqueo):
+    """Sustituye el bloqueo que protege los mapas de dimensiones. Los procesos que ejecutan actividades en
+    paralelo reciben así un bloqueo común entre procesos en lugar del bloqueo entre hilos por defecto.
+
+    Args:
+        bloqueo (:class:`multiprocessing.Lock`): Bloqueo compartido.
+     """
+    global _bloqueo_mapas
+    _bloqueo_mapas = bloqueo
+
+
+def bloqueo_mapas():
+    """Devuelve el bloqueo bajo el que se deben escribir los ficheros del directorio
+    :obj:`directorio_mapas_dimensiones`.
+
+    Returns:
+        bloqueo (:class:`threading.Lock` o :class:`multiprocessing.Lock`): Bloqueo de los mapas.
+     """
+    return _bloqueo_mapas
+
+
+def guardar_csv_atomico(df, fichero, **kwargs):
+    """Guarda un cuadro de datos en formato .CSV escribiendo primero un fichero temporal en el mismo directorio
+    y sustituyendo después el destino, de forma que ningún lector encuentre el fichero a medio escribir.
+
+    Args:
+        df (:class:`pandas:pandas.DataFrame`): Cuadro de datos a guardar.
+        fichero (:class:`Cadena de Texto`): Ruta del fichero destino.
+        **kwargs: Argumentos de :meth:`pandas.DataFrame.to_csv`.
+     """
+    fichero_temporal = f'{fichero}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        df.to_csv(fichero_temporal, **kwargs)
+        os.replace(fichero_temporal, fichero)
+    except BaseException:
+        if os.path.exists(fichero_temporal):
+            os.remove(fichero_temporal)
+        raise
@@ -1,13 +1,19 @@
+import contextlib
 import json
 import os
 import sys
 
-import requests
-
 import logging
 
 from src.ieca.jerarquia import Jerarquia
 from src.ieca.datos import Datos
+from src.ieca.instrumentacion import instrumentacion
+from src.ieca.cache_consultas import cache_vigente, cargar_cache_consulta, columnas_consulta, consulta_caducada, \
+    consulta_en_local, consulta_modificada, descargar_consulta_api, guardar_cache_consulta, ruta_cache_consulta
+from src.ieca.lector_json import leer_consulta_por_bloques
+
+URL_API_CONSULTA = "https://www.juntadeandalucia.es/institutodeestadisticaycartografia/intranet/admin/rest/v1.0/" \
+                   "consulta/"
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
@@ -42,6 +48,8 @@ class Consulta:
         jerarquias (:obj:`Lista` de :class:`src.jerarquia.Jerarquia`): Jerarquias utilizadas en los datos de
             la consulta
         datos (:class:`src.datos.Datos`): Datos proporcionados en la consulta.
+        payload_modificado (:class:`Booleano`): Verdadero si el contenido de la consulta se ha descargado o ha
+            cambiado durante esta ejecución.
     """
 
     def __init__(self, id_consulta, configuracion_global, configuracion_actividad, actividad):
@@ -51,22 +59,26 @@ class Consulta:
         self.configuracion_global = configuracion_global
         self.configuracion_actividad = configuracion_actividad
         self.actividad = actividad
+        self.payload_modificado = False
 
         self.logger = logging.getLogger(f'{self.__class__.__name__} [{self.id_consulta}]')
         self.logger.info('Inicializando consulta')
 
-        self.metadatos, \
-        jerarquias_sin_procesar, \
-        self.medidas, \
-        datos_sin_procesar = \
-            self.solicitar_informacion_api()
+        with instrumentacion.medir('solicitar_informacion_api', self.id_consulta):
+            self.metadatos, \
+            jerarquias_sin_procesar, \
+            self.medidas, \
+            datos_sin_procesar = \
+                self.solicitar_informacion_api()
 
         self.jerarquias = [Jerarquia(jerarquia, self.configuracion_global, self.actividad) for jerarquia in
                            jerarquias_sin_procesar]
-        self.datos = Datos(self.id_consulta, self.configuracion_global, self.actividad,
-                           self.metadatos['periodicity'],
-                           datos_sin_procesar,
-                           self.jerarquias, self.medidas)
+        with instrumentacion.medir('procesar_datos', self.id_consulta) as medicion:
+            self.datos = Datos(self.id_consulta, self.configuracion_global, self.actividad,
+                               self.metadatos['periodicity'],
+                               datos_sin_procesar,
+                               self.jerarquias, self.medidas)
+            medicion['filas_salida'] = len(self.datos.datos_por_observacion)
 
         self.logger.info('Consulta Finalizada')
 
@@ -76,76 +88,254 @@ class Consulta:
 
     @id_consulta.setter
     def id_consulta(self, value):
-        if not isinstance(value, str):
-            value = str(value)
-        if len(value) > 8:
-            value = value.split('?')[0]
-        self._id_consulta = value
+        self._id_consulta = normalizar_id_consulta(value)
 
-    def ejecutar(self):
+    def ejecutar(self, diferir_persistencia=False):
         """Aplica las funciones configuradas en el fichero de configuración **'actividades.yaml'** bajo
-        las claves **acciones_jerarquia** y **acciones_datos*.
+        las claves **acciones_jerarquia** y **acciones_datos*. Cada acción se mide con
+        :data:`src.ieca.instrumentacion.instrumentacion`.
+
+        Args:
+            diferir_persistencia (:class:`Booleano`, opcional): No aplica las acciones de
+                :meth:`~.acciones_persistencia`, que se aplicarán después con :meth:`~.persistir`.
         """
         for accion in self.configuracion_actividad['acciones_jerarquia'].keys():
             for jerarquia in self.jerarquias:
                 if self.configuracion_actividad['acciones_jerarquia'][accion]:
-                    getattr(jerarquia, accion)()
+                    with instrumentacion.medir(accion, jerarquia.id_jerarquia, len(jerarquia.datos)):
+                        getattr(jerarquia, accion)()
+
+        acciones = self.acciones_datos()
+        if diferir_persistencia:
+            acciones = acciones[:len(acciones) - len(self.acciones_persistencia())]
+        for accion, accion_params in acciones:
+            self.aplicar_accion_datos(accion, accion_params)
+
+    def acciones_datos(self):
+        """Acciones activas de la clave **acciones_datos** en el orden de la configuración.
+
+        Returns:
+            acciones (:obj:`Lista` de :class:`Tupla`): Nombre de cada acción, sin el sufijo **#n**, y sus
+            parámetros.
+        """
+        return [(accion.split('#')[0], accion_params)
+                for accion, accion_params in self.configuracion_actividad['acciones_datos'].items() if accion_params]
 
-        for accion in self.configuracion_actividad['acciones_datos'].keys():
-            accion_params = self.configuracion_actividad['acciones_datos'][accion]
-            if self.configuracion_actividad['acciones_datos'][accion]:
-                accion = accion.split('#')[0]
-                if not isinstance(accion_params, bool):
-                    getattr(self.datos, accion)(accion_params)
-                else:
-                    getattr(self.datos, accion)()
+    def acciones_persistencia(self):
+        """Acciones de guardado con las que terminan las acciones de datos. Solo escriben los datos ya
+        transformados, por lo que pueden aplicarse en otro hilo mientras se transforma la consulta siguiente.
+
+        Returns:
+            acciones (:obj:`Lista` de :class:`Tupla`): Nombre de cada acción y sus parámetros.
+        """
+        acciones = self.acciones_datos()
+        inicio = len(acciones)
+        while inicio > 0 and acciones[inicio - 1][0].startswith('guardar'):
+            inicio -= 1
+        return acciones[inicio:]
+
+    def persistir(self):
+        """Aplica las acciones de :meth:`~.acciones_persistencia` diferidas por :meth:`~.ejecutar`.
+        """
+        for accion, accion_params in self.acciones_persistencia():
+            self.aplicar_accion_datos(accion, accion_params)
+
+    def aplicar_accion_datos(self, accion, accion_params):
+        """Aplica una acción de datos midiéndola con :data:`src.ieca.instrumentacion.instrumentacion`.
+
+        Args:
+            accion (:class:`Cadena de Texto`): Nombre del método de :class:`src.datos.Datos`.
+            accion_params: Parámetros de la acción, o :obj:`True` si no tiene.
+        """
+        with instrumentacion.medir(accion, self.id_consulta, len(self.datos.datos_por_observacion)) as medicion:
+            if not isinstance(accion_params, bool):
+                getattr(self.datos, accion)(accion_params)
+            else:
+                getattr(self.datos, accion)()
+            medicion['filas_salida'] = len(self.datos.datos_por_observacion)
 
     def solicitar_informacion_api(self):
         """Utilizando :attr:`~.id_consulta` busca el JSON de la consulta en local, y si no, le manda
         la petición a la API del IECA. Si se ha alcanzado la API, se guarda el JSON para acelerar futuras consultas y
-        no sobrecargar el sistema. Hemos de tener esto en cuenta, en caso de que las consultas de la API no sean
-        inmutables.
+        no sobrecargar el sistema. Como las consultas de la API no son inmutables, el JSON en local se revalida con
+        la API cuando supera las horas de :obj:`caducidad_cache_horas` de la actividad o cuando se activa
+        :obj:`refrescar_cache_consultas`, y solo se reescribe si su contenido ha cambiado.
+
+        Si la configuración global activa :obj:`lectura_json_por_bloques`, las observaciones no se decodifican de
+        una vez sino que se leen del JSON en bloques de :obj:`tamano_bloque_observaciones` filas y se compactan en
+        columnas según se leen.
 
+        Si :obj:`formato_cache_consultas` es **pickle**, la consulta se lee de la caché binaria que acompaña al JSON,
+        con las observaciones ya compactadas en columnas, y si no existe o es anterior al JSON se genera.
 
         Returns:
             - metainfo (:class:`Diccionario`)
             - hierarchies (:class:`Diccionario`)
             - measures (:class:`Diccionario`)
-            - data (:class:`Diccionario`)
+            - data (:class:`pandas:pandas.DataFrame`): Observaciones en columnas.
 
          """
 
         # La maravillosa API del IECA colapsa con consultas grandes (20MB+ aprox)
-        directorio = os.path.join(self.configuracion_global['directorio_json'], self.actividad)
-        directorio_json = os.path.join(directorio, self.id_consulta + '.json')
-        if not os.path.exists(directorio):
-            os.makedirs(directorio)
+        directorio_json = ruta_json_consulta(self.id_consulta, self.configuracion_global, self.actividad)
+        fichero_cache = ruta_cache_consulta(directorio_json)
+        usar_cache = self.configuracion_global['formato_cache_consultas'] == 'pickle'
+
+        precargar_consulta(self.url_consulta, self.configuracion_global, self.actividad,
+                           self.configuracion_actividad['caducidad_cache_horas'])
+        self.payload_modificado = consulta_modificada(directorio_json)
+
         respuesta = False
+        if usar_cache and cache_vigente(fichero_cache, directorio_json):
+            try:
+                self.logger.info('Leyendo la caché binaria de la consulta')
+                cabecera, columnas = cargar_cache_consulta(fichero_cache)
+                respuesta = {**cabecera, 'data': columnas}
+            except Exception as e:
+                self.logger.warning('No se ha podido leer la caché %s', fichero_cache)
+                self.logger.warning('Excepción: %s', e)
+
+        if not respuesta:
+            respuesta = self.solicitar_json(directorio_json)
+            if usar_cache:
+                cabecera = {clave: valor for clave, valor in respuesta.items() if clave != 'data'}
+                guardar_cache_consulta(fichero_cache, cabecera, respuesta['data'])
+                self.logger.info('Caché binaria guardada')
+
+        if respuesta['data'] is not None:
+            self.logger.info('Datos alcanzados correctamente')
+        else:
+            self.logger.warning('No hay información disponible')
+        return respuesta['metainfo'], \
+               respuesta['hierarchies'], \
+               respuesta['measures'], \
+               respuesta['data']
+
+    def solicitar_json(self, directorio_json):
+        """Lee el JSON de la consulta, volviendo a descargarlo de la API del IECA si no puede leerse. El JSON se
+        lee completo, cabecera y observaciones, antes de devolverlo, de forma que un fichero truncado o corrupto
+        siempre provoca la descarga.
+
+        Args:
+            directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+        Returns:
+            respuesta (:class:`Diccionario`): El JSON de la consulta con las observaciones en columnas bajo la clave
+            **data**, :obj:`None` si no tiene observaciones.
+         """
         try:
-            self.logger.info('Buscando el JSON de la consulta en local')
-            with open(directorio_json, 'r', encoding='utf-8') as json_file:
-                respuesta = json.load(json_file)
+            self.logger.info('Leyendo el JSON de la consulta')
+            respuesta = self.leer_json(directorio_json)
             self.logger.info('JSON leido correctamente')
 
         except Exception as e:
-            self.logger.warning('No se ha encontrado el fichero %s', directorio_json)
+            self.logger.warning('No se ha podido leer el fichero %s', directorio_json)
             self.logger.warning('Excepción: %s', e)
-            self.logger.info('Iniciando peticion a la API del IECA')
-            respuesta = requests.get(
-                f"https://www.juntadeandalucia.es/institutodeestadisticaycartografia/intranet/admin/rest/v1.0/consulta/"
-                f"{self.url_consulta}").json()
-            self.logger.info('Petición Finalizada')
-            self.logger.info('Guardando JSON')
-            with open(directorio_json, 'w', encoding='utf-8') as json_file:
-                json.dump(respuesta, json_file)
-            self.logger.info('JSON Guardado')
-
-        finally:
-            if respuesta and respuesta['data']:
-                self.logger.info('Datos alcanzados correctamente')
-            else:
-                self.logger.warning('No hay información disponible')
-        return respuesta['metainfo'], \
-               respuesta['hierarchies'], \
-               respuesta['measures'], \
-               respuesta['data'] if respuesta else None
+            self.payload_modificado = descargar_consulta(self.url_consulta, directorio_json, self.logger)
+            respuesta = self.leer_json(directorio_json)
+        return respuesta
+
+    def leer_json(self, directorio_json):
+        """Lee el JSON de la consulta, por bloques o completo según :obj:`lectura_json_por_bloques`, y compacta sus
+        observaciones en columnas con :func:`src.ieca.cache_consultas.columnas_consulta`. Al leer por bloques, el
+        fichero se cierra aunque la lectura falle.
+
+        Args:
+            directorio_json (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+
+        Returns:
+            respuesta (:class:`Diccionario`): El JSON de la consulta con las observaciones en columnas bajo la clave
+            **data**, :obj:`None` si no tiene observaciones.
+         """
+        if self.configuracion_global['lectura_json_por_bloques']:
+            cabecera, bloques = leer_consulta_por_bloques(directorio_json,
+                                                          self.configuracion_global['tamano_bloque_observaciones'])
+            with contextlib.closing(bloques) if bloques is not None else contextlib.nullcontext():
+                cabecera['data'] = columnas_consulta(cabecera, bloques)
+            return cabecera
+
+        with open(directorio_json, 'r', encoding='utf-8') as json_file:
+            respuesta = json.load(json_file)
+        respuesta['data'] = columnas_consulta(respuesta, [respuesta['data']] if respuesta['data'] is not None
+                                              else None)
+        return respuesta
+
+
+def normalizar_id_consulta(id_consulta):
+    """Obtiene el ID de una consulta descartando los parámetros de la URL con la que se configura en
+    **'actividades.yaml'**.
+
+    Args:
+        id_consulta (:class:`Cadena de Texto`): ID de la consulta, con o sin parámetros.
+
+    Returns:
+        id_consulta (:class:`Cadena de Texto`): ID de la consulta sin parámetros.
+     """
+    if not isinstance(id_consulta, str):
+        id_consulta = str(id_consulta)
+    if len(id_consulta) > 8:
+        id_consulta = id_consulta.split('?')[0]
+    return id_consulta
+
+
+def ruta_json_consulta(id_consulta, configuracion_global, actividad):
+    """Devuelve la ruta del JSON de la consulta en local, creando su directorio si no existe.
+
+    Args:
+        id_consulta (:class:`Cadena de Texto`): ID de la consulta sin parámetros.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero JSON.
+     """
+    directorio = os.path.join(configuracion_global['directorio_json'], actividad)
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, id_consulta + '.json')
+
+
+def descargar_consulta(url_consulta, directorio_json, logger, revalidar=False):
+    """Solicita la consulta a la API del IECA y guarda el JSON de la respuesta en local a medida que se recibe,
+    sin decodificarlo, de forma que la respuesta nunca se mantiene completa en memoria.
+
+    Args:
+        url_consulta (:class:`Cadena de Texto`): ID de la consulta con sus parámetros.
+        directorio_json (:class:`Cadena de Texto`): Ruta en la que guardar el JSON.
+        logger (:class:`logging.Logger`): Logger de la consulta.
+        revalidar (:class:`Booleano`): Hace una petición condicional y solo reescribe el JSON si ha cambiado.
+
+    Returns:
+        modificada (:class:`Booleano`): Verdadero si el contenido de la consulta ha cambiado.
+     """
+    logger.info('Iniciando peticion a la API del IECA')
+    modificada = descargar_consulta_api(f"{URL_API_CONSULTA}{url_consulta}", directorio_json, revalidar)
+    if modificada:
+        logger.info('JSON Guardado')
+    else:
+        logger.info('La consulta no ha cambiado desde la última descarga')
+    return modificada
+
+
+def precargar_consulta(url_consulta, configuracion_global, actividad, caducidad_horas=None):
+    """Descarga el JSON de la consulta si no se encuentra en local o lo revalida con la API si ha caducado, de
+    forma que la inicialización posterior de :class:`Consulta` no tenga que esperar a la API del IECA.
+
+    Args:
+        url_consulta (:class:`Cadena de Texto`): ID de la consulta con sus parámetros.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+        caducidad_horas (:class:`Decimal`, opcional): Horas de validez de la consulta en local.
+
+    Returns:
+        modificada (:class:`Booleano`): Verdadero si se ha descargado un contenido nuevo.
+     """
+    id_consulta = normalizar_id_consulta(url_consulta)
+    directorio_json = ruta_json_consulta(id_consulta, configuracion_global, actividad)
+    logger = logging.getLogger(f'Consulta [{id_consulta}]')
+    if not consulta_en_local(directorio_json, configuracion_global):
+        logger.warning('No se ha encontrado el fichero %s', directorio_json)
+        return descargar_consulta(url_consulta, directorio_json, logger)
+    if consulta_caducada(directorio_json, configuracion_global, caducidad_horas):
+        logger.info('Revalidando la consulta con la API')
+        return descargar_consulta(url_consulta, directorio_json, logger, revalidar=True)
+    return False
@@ -6,6 +6,12 @@ import pandas as pd
 import logging
 import numpy as np
 
+from src.ieca.columnas import construir_columnas
+from src.ieca.formatos import guardar_tabla, muestra_tabla
+from src.ieca.instrumentacion import instrumentacion
+from src.ieca.jerarquia import COLUMNAS_JERARQUIA
+from src.ieca.repositorio_mapas import COLUMNAS_MAPA, repositorio_mapas
+
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
@@ -17,20 +23,27 @@ class Datos:
         - Convierte de JSON a DataFrame utilizando las medidas y jerarquias para generar las dimensiones/columnas.
         - Desacopla las observaciones en base a las medidas utilizando la dimension **INDICATOR**
         - Añade la dimension **FREQ** de SDMX en base a la periodicidad de la consulta.
+        - Aplica la :obj:`politica_tipos` de la configuración global para reducir la memoria de las observaciones.
 
     Args:
         id_consulta (:class:`Cadena de Texto`): ID de la consulta que se va a procesar.
         configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
         actividad (:class:`Cadena de Texto`): Nombre de la actividad.
         periodicidad (:class:`Cadena de Texto`): Periodicidad de las observaciones.
-        datos (:class:`Diccionario`): Datos de la consulta.
+        datos (:class:`Iterador` de :obj:`Lista` o :class:`pandas:pandas.DataFrame`): Observaciones de la consulta en
+            bloques, o ya compactadas en columnas si provienen de la caché binaria.
         jerarquias (:obj:`Lista` de :class:`src.jerarquia.Jerarquia`): Jerarquias de la consulta
         medidas (:class:`src.consulta.medidas`): Medidas de la consulta
     Attributes:
         datos (:class:`pandas:pandas.DataFrame`): Los datos en un cuadro de datos
         datos_por_observacion (:class:`pandas:pandas.DataFrame`): Los datos desacoplados por medidas en columnas
-        datos_por_observacion_extension_disjuntos (:class:`pandas:pandas.DataFrame`): Los datos desacoplados
-            pero con todas las columnas necesarias para crear un DSD para toda la actividad.
+        extension_disjuntos (:class:`Diccionario`): Columnas constantes que faltan a los datos desacoplados para
+            crear un DSD para toda la actividad, con su valor.
+        muestra (:class:`pandas:pandas.DataFrame`): Muestra de los datos desacoplados de
+            :func:`src.ieca.formatos.muestra_tabla`, guardada por :meth:`~.liberar`.
+        filas (:class:`Entero`): Filas de los datos desacoplados, guardadas por :meth:`~.liberar`.
+        valores_no_numericos (:class:`pandas:pandas.Series`): Valores originales de **OBS_VALUE** que la
+            :obj:`politica_tipos` **numerica** deja vacíos, por fila de los datos desacoplados.
 
     """
 
@@ -48,8 +61,14 @@ class Datos:
                          self.id_consulta, self.periodicidad)
         self.datos = self.convertir_datos_a_dataframe_sdmx(datos)
         self.datos_por_observacion = self.desacoplar_datos_por_medidas()
-        self.datos_por_observacion_extension_disjuntos = None
+        self.extension_disjuntos = {}
+        self.fichero_liberado = None
+        self.muestra = None
+        self.filas = None
+        self.valores_no_numericos = None
         insertar_freq(self.datos_por_observacion, self.periodicidad)
+        self.obs_status_marcadores = False
+        self.aplicar_politica_tipos()
 
         self.logger.info('Finalización procesamiento de las observaciones')
 
@@ -62,8 +81,12 @@ class Datos:
                 cruzamos la información pertinente para mapear COD -> ID.
             3. Rellenamos la dimension **FREQ** de SDMX en base a la periodicidad de la consulta.
 
+        Los bloques de observaciones se compactan en columnas según se leen, de forma que nunca se mantienen en
+        memoria todas las observaciones del JSON. Las observaciones de la caché binaria ya llegan en columnas.
+
         Args:
-            datos (:class:`Diccionario`): Datos de la consulta.
+            datos (:class:`Iterador` de :obj:`Lista` o :class:`pandas:pandas.DataFrame`): Observaciones de la consulta
+                en bloques o en columnas.
 
         Returns:
             datos (:class:`pandas:pandas.DataFrame`): Las observaciones en un cuadro de datos con la forma tabular
@@ -74,22 +97,13 @@ class Datos:
         columnas_jerarquia = [jerarquia.metadatos['alias'] for jerarquia in self.jerarquias]
         columnas_medida = [medida['des'] for medida in
                            self.medidas]
-        columnas = columnas_jerarquia + columnas_medida
 
-        try:
-            df = pd.DataFrame(datos, columns=columnas)
-        except Exception as e:
+        if datos is None:
             self.logger.error('Consulta sin datos - %s', self.id_consulta)
-            raise e
+            raise ValueError(f'Consulta sin datos - {self.id_consulta}')
 
-        df.columns = columnas
-        columnas_jerarquias_aux = [columna_jerarquia + '_aux' for columna_jerarquia in columnas_jerarquia]
-        df[columnas_jerarquias_aux] = df[columnas_jerarquia].applymap(
-            lambda x: x['cod'][-2] if len(x['cod']) > 1 else None)
-        df[columnas_jerarquia] = df[columnas_jerarquia].applymap(lambda x: x['cod'][-1])
-
-        df[columnas_medida] = df[columnas_medida].applymap(
-            lambda x: x['val'] if x['val'] != "" else x['format'])
+        df = datos if isinstance(datos, pd.DataFrame) else construir_columnas(columnas_jerarquia, columnas_medida,
+                                                                              datos)
 
         dimensiones_temporales = self.configuracion_global['dimensiones_temporales']
         for dimension_temporal in dimensiones_temporales:
@@ -97,16 +111,13 @@ class Datos:
                 df[dimension_temporal] = transformar_formato_tiempo_segun_periodicidad(df[dimension_temporal],
                                                                                        self.periodicidad)
 
-        # Parche IECA ya que están indexando por cod en lugar de id.
+        # Parche IECA ya que están indexando por cod en lugar de id. Si el código no se encuentra en la jerarquia
+        # se usa el del padre, ya que la indexación a través de cod puede quedar disconexa.
         for jerarquia in self.jerarquias:
             columna = jerarquia.metadatos['alias']
 
             if columna not in dimensiones_temporales:
-                df[columna] = df.merge(jerarquia.datos, how='left', left_on=columna, right_on='COD')['ID'].values
-
-                # Parche nº2 ya que la indexación a través de cod puede quedar disconexa.
-                df[columna][df[columna].isna()] = \
-                df.merge(jerarquia.datos, how='left', left_on=columna + '_aux', right_on='COD')['ID'].values
+                df[columna] = jerarquia.indice_codigos().traducir(df[columna], alternativa=df[columna + '_aux'])
 
         self.logger.info('Datos Transformados a DataFrame Correctamente')
         return df
@@ -116,7 +127,9 @@ class Datos:
         SDMX consistirá en crear una dimension **INDICATOR** cuyo valor será la medida en sí.
 
         Esto quiere decir que nuestro cuadro de datos tendrá menos columnas, pero mayor número de filas
-        (Numero de observaciones * Numero de medidas).
+        (Numero de observaciones * Numero de medidas). El cuadro se genera en una única pasada, conservando el tipo
+        de las columnas de las jerarquias, y las medidas configuradas en :obj:`medidas_reemplazando_obs_status` pasan
+        a ser la columna **OBS_STATUS**.
 
         Args:
             datos (:class:`pandas:pandas.DataFrame`): Datos de la consulta en un cuadro de datos.
@@ -127,34 +140,93 @@ class Datos:
         self.logger.info('Desacoplando las Observaciones del DataFrame')
 
         columnas_jerarquia = [jerarquia.metadatos['alias'] for jerarquia in self.jerarquias]
-        columnas = columnas_jerarquia + ['INDICATOR', 'OBS_VALUE']
-        df = pd.DataFrame(columns=columnas)
         medidas = [medida['des'] for medida in self.medidas]
-        for medida in medidas:
-            if medida in self.configuracion_global['medidas_reemplazando_obs_status']:
-                medidas.remove(medida)
+        medidas_obs_status = [medida for medida in medidas
+                              if medida in self.configuracion_global['medidas_reemplazando_obs_status']]
+        for posicion, medida in enumerate(medidas_obs_status):
+            if posicion == 0:
                 self.datos.rename(columns={medida: 'OBS_STATUS'}, inplace=True)
-                columnas_jerarquia = columnas_jerarquia + ['OBS_STATUS']
-
-        for medida in medidas:
-            if medida not in self.configuracion_global['indicadores_a_borrar']:
-                self.logger.info('Desacoplando para la medida: %s', medida)
-
-                columnas = columnas_jerarquia + ['OBS_VALUE', 'INDICATOR']
-                columnas_ordenadas = columnas_jerarquia + ['INDICATOR', 'OBS_VALUE']
-                valores_medida = self.datos[columnas_jerarquia + [medida]].copy()
-                valores_medida.loc[:, 'INDICATOR'] = medida
-                valores_medida.columns = columnas
-                valores_medida = valores_medida[columnas_ordenadas]
-                df = pd.concat([df, valores_medida])
-                self.logger.info('Medida Desacoplada: %s', medida)
+            else:
+                # Con varias medidas de estado cada observación toma el primer estado no vacío
+                estado = self.datos['OBS_STATUS'].astype(object)
+                self.datos['OBS_STATUS'] = estado.where(estado.notna() & (estado != ''),
+                                                        self.datos.pop(medida).astype(object))
+
+        medidas = [medida for medida in medidas if medida not in medidas_obs_status and
+                   medida not in self.configuracion_global['indicadores_a_borrar']]
+        self.logger.info('Desacoplando para las medidas: %s', medidas)
+
+        # Cada medida ocupa un bloque de filas consecutivo con todas las observaciones, en el orden de las medidas.
+        numero_observaciones = len(self.datos)
+        posiciones = np.tile(np.arange(numero_observaciones), len(medidas))
+        indicadores = list(dict.fromkeys(medidas))
+
+        columnas = {columna: self.datos[columna].array.take(posiciones) for columna in columnas_jerarquia}
+        columnas['INDICATOR'] = pd.Categorical.from_codes(
+            np.repeat([indicadores.index(medida) for medida in medidas], numero_observaciones).astype(np.int32),
+            categories=indicadores)
+        columnas['OBS_VALUE'] = np.concatenate([self.datos[medida].to_numpy(dtype=object) for medida in medidas]) \
+            if medidas else np.array([], dtype=object)
+        if medidas_obs_status:
+            columnas['OBS_STATUS'] = self.datos['OBS_STATUS'].array.take(posiciones)
+        df = pd.DataFrame(columnas, index=self.datos.index.take(posiciones))
 
         self.logger.info('DataFrame Desacoplado')
         return df
 
+    def aplicar_politica_tipos(self):
+        """Reduce la memoria de los datos desacoplados según la sección :obj:`politica_tipos` de la configuración
+        global. Las dimensiones ya son categóricas desde :func:`src.ieca.columnas.construir_columnas`, por lo que la
+        política se aplica a **OBS_VALUE**:
+
+            - **texto**: Se mantiene como texto.
+            - **categorica**: Se guarda como categórica, de forma que cada valor distinto se almacena una única vez \
+            sin modificar los ficheros generados. Solo reduce la memoria si los valores se repiten.
+            - **numerica**: Se guarda como entero o decimal, como en :meth:`~.sumar_datos_duplicados`, por lo que \
+            los ficheros generados pierden el formato original de los valores. Los valores no numéricos, como \
+            **-**, quedan vacíos y pasan a la columna **OBS_STATUS** en las filas que no tienen estado. Los \
+            valores originales se conservan en :attr:`~.valores_no_numericos` para :meth:`~.borrar_filas`.
+
+        Si :obj:`informe_memoria` está activo, se registra en :data:`src.ieca.instrumentacion.instrumentacion` la
+        memoria de los datos antes y después de aplicarla. Medir las columnas de texto supone recorrerlas, por lo que
+        está desactivado por defecto.
+         """
+        politica = self.configuracion_global['politica_tipos']['obs_value']
+        informe_memoria = self.configuracion_global['politica_tipos']['informe_memoria']
+        df = self.datos_por_observacion
+        with instrumentacion.medir('aplicar_politica_tipos', self.id_consulta, len(df)) as medicion:
+            if informe_memoria:
+                medicion['memoria_entrada_kb'] = memoria_kb(df)
+
+            if politica == 'categorica':
+                df['OBS_VALUE'] = df['OBS_VALUE'].astype('category')
+            elif politica == 'numerica':
+                valores = df['OBS_VALUE']
+                df['OBS_VALUE'] = pd.to_numeric(valores, errors='coerce')
+                # Cada fila se numera de forma única para identificar después sus valores originales
+                df.index = pd.RangeIndex(len(df))
+                valores = valores.set_axis(df.index)
+                self.valores_no_numericos = valores[df['OBS_VALUE'].isna()].astype('category')
+                marcadores = valores.where(df['OBS_VALUE'].isna() & valores.notna() & (valores != ''))
+                if marcadores.notna().any():
+                    estado = df['OBS_STATUS'].astype(object) if 'OBS_STATUS' in df.columns else \
+                        pd.Series(np.nan, index=df.index, dtype=object)
+                    sin_estado = estado.isna() | (estado == '')
+                    df['OBS_STATUS'] = estado.mask(sin_estado & marcadores.notna(), marcadores).astype('category')
+                    self.obs_status_marcadores = True
+            elif politica != 'texto':
+                raise ValueError(f'Política de tipos de OBS_VALUE no soportada: {politica}')
+
+            medicion['filas_salida'] = len(df)
+            if informe_memoria:
+                medicion['memoria_salida_kb'] = memoria_kb(df) if politica != 'texto' else \
+                    medicion['memoria_entrada_kb']
+                self.logger.info('Memoria de las observaciones: %s KB -> %s KB', medicion['memoria_entrada_kb'],
+                                 medicion['memoria_salida_kb'])
+
     def guardar_datos(self, clase):
-        """Accion que guarda la jerarquia en formato .CSV de dos formas bifurcando en directorios a traves del
-            argumento clase:
+        """Accion que guarda la jerarquia en el :obj:`formato_salida` de la configuración global de dos formas
+            bifurcando en directorios a traves del argumento clase:
 
             - Con el Còdigo de BADEA (No admitido por nuestro framework de SDMX)
             - Sin el código de BADEA (Admitido por nuestro framework de SDMX)
@@ -167,8 +239,8 @@ class Datos:
         if not os.path.exists(directorio):
             os.makedirs(directorio)
 
-        self.datos_por_observacion.to_csv(os.path.join(directorio, str(self.id_consulta) + '.csv'), sep=';',
-                                          index=False)
+        guardar_tabla(self.datos_por_observacion, os.path.join(directorio, str(self.id_consulta)),
+                      self.configuracion_global['formato_salida'])
 
     def mapear_valores(self):
         """Accion que realiza el mapeo de los valores del cuadro de datos configuradas bajo el parámetro
@@ -180,80 +252,98 @@ class Datos:
                                                   set(self.configuracion_global['dimensiones_a_mapear'])))
         for columna in columnas_a_mapear:
             self.logger.info('Mapeando: %s', columna)
-            directorio_mapa = os.path.join(self.configuracion_global['directorio_mapas_dimensiones'], columna)
-            mapa = pd.read_csv(directorio_mapa, dtype='string')
-            self.datos_por_observacion[columna] = \
-                self.datos_por_observacion.merge(mapa, how='left', left_on=columna, right_on='SOURCE')['TARGET'].values
+            indice = repositorio_mapas.indice(os.path.join(self.configuracion_global['directorio_mapas_dimensiones'],
+                                                           columna))
+            self.datos_por_observacion[columna] = indice.traducir(self.datos_por_observacion[columna])
 
     def extender_mapa_nuevos_terminos(self):
         """Accion que crea/extiende el mapa para las columnas configuradas facilitando al técnico realizar la
         conversión y su posterior reutilización en distintas actividades.
+
+        Los mapas se extienden en memoria a través de :data:`src.repositorio_mapas.repositorio_mapas` y se escriben
+        una única vez al terminar la actividad. Los códigos y nombres de los términos nuevos se toman de las
+        jerarquias ya cargadas de la consulta.
          """
         self.logger.info('Ampliando mapas de dimensiones con nuevas ocurrencias')
-        columnas_plantilla = ['SOURCE', 'COD', 'NAME', 'TARGET']
+        jerarquias = self.jerarquias + [None]
         columnas_jerarquia_alias = [jerarquia.id_jerarquia for jerarquia in self.jerarquias] + ['INDICATOR']
         columnas_jerarquia_id = [jerarquia.id_jerarquia.split('-')[0] for jerarquia in self.jerarquias] + ['INDICATOR']
         directorio_mapas = self.configuracion_global['directorio_mapas_dimensiones']
-        if not os.path.exists(directorio_mapas):
-            os.makedirs(directorio_mapas)
 
-        for columna_alias, columna_id in zip(columnas_jerarquia_alias, columnas_jerarquia_id):
+        for jerarquia, columna_alias, columna_id in zip(jerarquias, columnas_jerarquia_alias, columnas_jerarquia_id):
             self.logger.info('Dimension: %s', columna_alias)
             fichero_mapa_dimension = os.path.join(directorio_mapas, columna_id)
-            if columna_id in self.configuracion_global['dimensiones_a_mapear']:
-
-                if os.path.isfile(fichero_mapa_dimension):
-                    df_mapa = pd.read_csv(fichero_mapa_dimension, dtype='string')
+            if columna_id not in self.configuracion_global['dimensiones_a_mapear']:
+                continue
 
-                else:
-                    df_mapa = pd.DataFrame(columns=columnas_plantilla, dtype='string')
+            with repositorio_mapas.bloqueo:
+                df_mapa = repositorio_mapas.obtener(fichero_mapa_dimension)
+                df_original = df_mapa
 
-                uniques = np.full([len(self.datos_por_observacion[columna_id].unique()), len(columnas_plantilla)], None)
+                uniques = np.full([len(self.datos_por_observacion[columna_id].unique()), len(COLUMNAS_MAPA)], None)
                 uniques[:, 0] = self.datos_por_observacion[columna_id].unique()
 
-                df_auxiliar = pd.DataFrame(uniques, columns=columnas_plantilla, dtype='string')
+                df_auxiliar = pd.DataFrame(uniques, columns=COLUMNAS_MAPA, dtype='string')
 
                 df_mapa = pd.concat([df_mapa, df_auxiliar]).drop_duplicates('SOURCE', keep='first')
+                df_mapa.reset_index(drop=True, inplace=True)
 
                 if columna_id != 'INDICATOR':
-                    jerarquia_codigos = pd.read_csv(
-                        os.path.join(self.configuracion_global['directorio_jerarquias'], self.actividad, 'original',
-                                     columna_alias + '.csv'), sep=';',
-                        dtype='string')
-
-                    df_mapa['COD'][df_mapa['COD'].isna()] = \
-                        df_mapa[df_mapa['COD'].isna()].merge(jerarquia_codigos, how='left', left_on='SOURCE',
-                                                             right_on='ID')['COD_y']
-                    df_mapa['NAME'][df_mapa['NAME'].isna()] = \
-                        df_mapa[df_mapa['NAME'].isna()].merge(jerarquia_codigos, how='left', left_on='SOURCE',
-                                                              right_on='ID')['NAME_y']
-                df_mapa.reset_index(drop=True, inplace=True)
-                mapeos_incompletos_indices = df_mapa[df_mapa['TARGET'].isna()].index
+                    jerarquia_codigos = jerarquia.datos.set_axis(COLUMNAS_JERARQUIA, axis=1).drop_duplicates('ID')
+
+                    for columna in ('COD', 'NAME'):
+                        vacios = df_mapa[columna].isna()
+                        df_mapa.loc[vacios, columna] = df_mapa[vacios].merge(
+                            jerarquia_codigos, how='left', left_on='SOURCE', right_on='ID')[columna + '_y'].to_numpy()
+                mapeos_incompletos = df_mapa['TARGET'].isna()
 
-                if mapeos_incompletos_indices.any():
+                if mapeos_incompletos.any():
                     self.logger.warning("Nuevos términos añadidos al mapa: %s",
-                                        list(df_mapa['SOURCE'].values[mapeos_incompletos_indices]))
-                    for indice in mapeos_incompletos_indices:
-                        df_mapa['TARGET'][indice] = crear_mapeo_por_defecto(df_mapa['SOURCE'][indice])
+                                        list(df_mapa['SOURCE'][mapeos_incompletos]))
+                    df_mapa.loc[mapeos_incompletos, 'TARGET'] = \
+                        df_mapa['SOURCE'][mapeos_incompletos].map(crear_mapeo_por_defecto)
 
                 else:
                     self.logger.info("Todos los elementos son mapeables")
 
-                df_mapa.to_csv(fichero_mapa_dimension,
-                               index=False)
+                if not df_mapa.equals(df_original):
+                    repositorio_mapas.actualizar(fichero_mapa_dimension, df_mapa)
 
     def extender_con_disjuntos(self, dimensiones):
-        """Accion que añade las columnas al dataframe para que todas las dimensiones SDMX de la actividad sean
-        contempladas en un mismo DSD, añadiendo el valor **_Z** a estas nuevas columnas.
+        """Accion que calcula las columnas a añadir al dataframe para que todas las dimensiones SDMX de la actividad
+        sean contempladas en un mismo DSD, con el valor **_Z** en estas nuevas columnas. Los datos no se copian: las
+        columnas se añaden al escribirlos con :meth:`src.ieca.formatos.EscritorTabla.escribir`.
 
         Args:
             dimensiones (:obj:`Lista` de :class:`Cadena de Texto`): Lista de dimensiones únicas que se encuentran
                 en el conjunto de la actividad sobre la que estamos trabajando.
          """
-        self.datos_por_observacion_extension_disjuntos = self.datos_por_observacion.copy()
-        disyuncion_dimensiones = [dimension for dimension in dimensiones if
-                                  dimension not in self.datos_por_observacion.columns]
-        self.datos_por_observacion_extension_disjuntos[disyuncion_dimensiones] = '_Z'
+        columnas = self.muestra.columns if self.datos_por_observacion is None else self.datos_por_observacion.columns
+        self.extension_disjuntos = {dimension: '_Z' for dimension in dimensiones if dimension not in columnas}
+
+    def liberar(self, fichero):
+        """Guarda los datos desacoplados en un fichero temporal y libera de memoria tanto estos como los datos
+        originales, de forma que una actividad solo mantiene en memoria los datos de la consulta que está
+        procesando. Se conservan :attr:`~.muestra` y :attr:`~.filas`, que bastan para calcular el esquema de las
+        uniones de los datos, que se recuperan con :meth:`~.recuperar`.
+
+        Args:
+            fichero (:class:`Cadena de Texto`): Ruta del fichero temporal.
+         """
+        self.muestra = muestra_tabla(self.datos_por_observacion)
+        self.filas = len(self.datos_por_observacion)
+        self.datos_por_observacion.to_pickle(fichero)
+        self.fichero_liberado = fichero
+        self.datos = None
+        self.datos_por_observacion = None
+
+    def recuperar(self):
+        """Lee los datos desacoplados guardados por :meth:`~.liberar`, con los mismos tipos.
+
+        Returns:
+            datos (:class:`pandas:pandas.DataFrame`): Los datos desacoplados.
+         """
+        return pd.read_pickle(self.fichero_liberado)
 
     def borrar_datos_duplicados(self):
         """Accion que borra las filas duplicadas sin tener en cuenta **OBS_VALUE**.
@@ -267,8 +357,16 @@ class Datos:
          """
         columnas_sin_obs_value = [column for column in self.datos_por_observacion.columns if column != 'OBS_VALUE']
         self.datos_por_observacion['OBS_VALUE'] = pd.to_numeric(self.datos_por_observacion['OBS_VALUE'])
-        self.datos_por_observacion = self.datos_por_observacion.groupby(columnas_sin_obs_value, as_index=False)[
-            'OBS_VALUE'].sum()
+        for columna in columnas_sin_obs_value:
+            if isinstance(self.datos_por_observacion[columna].dtype, pd.CategoricalDtype):
+                categorias = self.datos_por_observacion[columna].cat.categories
+                self.datos_por_observacion[columna] = self.datos_por_observacion[columna].cat.reorder_categories(
+                    categorias.sort_values())
+        self.datos_por_observacion = self.datos_por_observacion.groupby(columnas_sin_obs_value, as_index=False,
+                                                                        observed=True)['OBS_VALUE'].sum()
+        self.datos_por_observacion = self.datos_por_observacion.sort_values(columnas_sin_obs_value,
+                                                                            ignore_index=True)
+        self.valores_no_numericos = None
         if self.datos_por_observacion.empty:
             self.logger.error('DataFrame vacio, comprueba el mapeo')
 
@@ -286,6 +384,10 @@ class Datos:
     def borrar_filas(self, dics_columna_valor_a_borrar):
         """Accion que elimina del cuadro de datos las filas que contengan los valores proporcionados.
 
+        Si **OBS_VALUE** es numérica por la :obj:`politica_tipos`, los valores no numéricos, como **''** o **-**, se
+        buscan entre los valores originales de :attr:`~.valores_no_numericos`, de forma que se eliminan las mismas
+        filas que con la política **texto** aunque **OBS_STATUS** ya tuviera un estado o se haya mapeado.
+
         Args:
             dics_columna_valor_a_borrar (:obj:`Lista` de :class:`Cadena de Texto`): Lista de diccionarios con cuyo par
                 clave-valor es la columna-valor deseado para la eliminación.
@@ -294,7 +396,18 @@ class Datos:
         for dic in dics_columna_valor_a_borrar:
             columna = list(dic.keys())[0]
             valor = dic[columna]
-            self.datos_por_observacion = self.datos_por_observacion[self.datos_por_observacion[columna] != valor]
+            serie = self.datos_por_observacion[columna]
+            if columna == 'OBS_VALUE' and self.valores_no_numericos is not None \
+                    and pd.isna(pd.to_numeric(valor, errors='coerce')):
+                filas_valor = self.valores_no_numericos.index[self.valores_no_numericos == valor]
+                self.datos_por_observacion = self.datos_por_observacion[
+                    ~self.datos_por_observacion.index.isin(filas_valor)]
+            else:
+                self.datos_por_observacion = self.datos_por_observacion[serie != valor]
+
+        if self.obs_status_marcadores and self.datos_por_observacion['OBS_STATUS'].isna().all():
+            self.datos_por_observacion = self.datos_por_observacion.drop(columns='OBS_STATUS')
+            self.obs_status_marcadores = False
 
 
 def transformar_formato_tiempo_segun_periodicidad(serie, periodicidad):
@@ -308,6 +421,8 @@ def transformar_formato_tiempo_segun_periodicidad(serie, periodicidad):
 
     dimension_a_transformar = ['Mensual', 'Trimestral', 'Mensual  Fuente: Instituto Nacional de Estadística']
     if periodicidad in dimension_a_transformar:
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie.cat.rename_categories(lambda x: x[:4] + '-' + x[4:])
         serie = serie.apply(lambda x: x[:4] + '-' + x[4:])
     return serie
 
@@ -322,10 +437,23 @@ def insertar_freq(df, periodicidad):
     diccionario_periodicidad_sdmx = {'Mensual': 'M', 'Anual': 'A',
                                      'Mensual  Fuente: Instituto Nacional de Estadística': 'M', '': 'M',
                                      'Anual. Datos a 31 de diciembre': 'A'}
-    df['FREQ'] = diccionario_periodicidad_sdmx[periodicidad]
+    df['FREQ'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8),
+                                           categories=[diccionario_periodicidad_sdmx[periodicidad]])
     return df
 
 
+def memoria_kb(df):
+    """Memoria que ocupa un cuadro de datos, incluido el contenido de sus columnas de texto.
+
+    Args:
+        df (:class:`pandas:pandas.DataFrame`): Cuadro de datos a medir.
+
+    Returns:
+        memoria (:class:`Entero`): Memoria en KB.
+    """
+    return int(df.memory_usage(deep=True).sum()) // 1024
+
+
 def crear_mapeo_por_defecto(descripcion):
     preposiciones = ['A', 'DE', 'POR', 'PARA', 'EN']
     if pd.isna(descripcion):
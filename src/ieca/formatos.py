@@ -0,0 +1,293 @@
+import glob
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Solo necesario para los formatos columnares
+    pyarrow = None
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+EXTENSIONES_FORMATO = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+FILAS_BLOQUE_ESCRITURA = 100000
+
+
+def comprobar_formato(formato):
+    """Comprueba que el formato de salida es conocido y que sus dependencias están instaladas.
+
+    Args:
+        formato (:class:`Cadena de Texto`): **csv**, **parquet** o **feather**.
+     """
+    if formato not in EXTENSIONES_FORMATO:
+        raise ValueError(f'Formato de salida no soportado: {formato}, se admiten {list(EXTENSIONES_FORMATO)}')
+    if formato != 'csv' and pyarrow is None:
+        raise ImportError(f'El formato de salida {formato} necesita el paquete pyarrow')
+
+
+def ruta_tabla(ruta, formato):
+    """Añade a una ruta sin extensión la extensión del formato.
+
+    Args:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero sin extensión.
+        formato (:class:`Cadena de Texto`): **csv**, **parquet** o **feather**.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero con extensión.
+     """
+    return ruta + EXTENSIONES_FORMATO[formato]
+
+
+def guardar_tabla(df, ruta, formato='csv'):
+    """Guarda un cuadro de datos en el formato de salida configurado. En .CSV se separan los campos con **;**,
+    mientras que en los formatos columnares las columnas de texto se guardan como categóricas, de forma que cada
+    código de una dimension se almacena una única vez.
+
+    Args:
+        df (:class:`pandas:pandas.DataFrame`): Cuadro de datos a guardar.
+        ruta (:class:`Cadena de Texto`): Ruta del fichero sin extensión.
+        formato (:class:`Cadena de Texto`): **csv**, **parquet** o **feather**.
+
+    Returns:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero guardado.
+     """
+    fichero = ruta_tabla(ruta, formato)
+    if formato == 'csv':
+        df.to_csv(fichero, sep=';', index=False)
+        return fichero
+
+    comprobar_formato(formato)
+    columnas_texto = [columna for columna in df.columns if columna != 'OBS_VALUE' and
+                      (df[columna].dtype == object or isinstance(df[columna].dtype, pd.StringDtype))]
+    df = df.astype({columna: 'category' for columna in columnas_texto}).reset_index(drop=True)
+    if formato == 'parquet':
+        df.to_parquet(fichero, index=False)
+    else:
+        df.to_feather(fichero)
+    return fichero
+
+
+def muestra_tabla(df):
+    """Reduce una tabla a una fila por columna que conserva su tipo y si está vacía o solo tiene valores nulos,
+    que es lo único que tiene en cuenta :func:`pandas:pandas.concat` para decidir el tipo de la unión.
+
+    Args:
+        df (:class:`pandas:pandas.DataFrame`): Tabla a reducir.
+
+    Returns:
+        muestra (:class:`pandas:pandas.DataFrame`): Tabla con una fila, o vacía si la tabla lo está.
+    """
+    if df.empty:
+        return df.iloc[:0]
+    posiciones = {columna: df[columna].notna().to_numpy().argmax() for columna in df.columns}
+    return pd.DataFrame({columna: df[columna].iloc[[posicion]].reset_index(drop=True)
+                         for columna, posicion in posiciones.items()}, columns=df.columns)
+
+
+def esquema_union(muestras):
+    """Calcula las columnas y los tipos que tendría la unión con :func:`pandas:pandas.concat` de varias tablas a
+    partir de sus muestras, sin necesidad de construirla.
+
+    Args:
+        muestras (:obj:`Lista` de :class:`pandas:pandas.DataFrame`): Muestras de :func:`muestra_tabla`.
+
+    Returns:
+        columnas (:obj:`Lista` de :class:`Cadena de Texto`): Columnas de la unión en orden de aparición.
+        tipos (:class:`Diccionario`): Tipo de cada columna de la unión.
+    """
+    union = pd.concat(muestras)
+    return list(union.columns), union.dtypes.to_dict()
+
+
+class EscritorTabla:
+    """Escribe una tabla por partes en el formato de salida, de forma que no es necesario tener en memoria más que
+    la parte que se está escribiendo. Las columnas y sus tipos se fijan al crear el escritor, normalmente con
+    :func:`esquema_union`, y cada parte se alinea con ellas por bloques de filas antes de escribirse, de forma que
+    la memoria adicional no depende del tamaño de la parte. El resultado es el mismo que guardar con
+    :func:`guardar_tabla` la unión de todas las partes.
+
+    En .CSV la cabecera se escribe al crear el escritor y cada parte se añade al final del fichero. En Parquet
+    cada parte es un grupo de filas y en Feather un lote; en este último las columnas de texto se guardan como
+    texto y no como categóricas, porque sus diccionarios no pueden cambiar entre lotes.
+
+    Args:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero sin extensión.
+        columnas (:obj:`Lista` de :class:`Cadena de Texto`): Columnas de la tabla.
+        tipos (:class:`Diccionario`): Tipo de cada columna.
+        formato (:class:`Cadena de Texto`): **csv**, **parquet** o **feather**.
+        filas_bloque (:class:`Entero`): Filas que se alinean y escriben cada vez.
+
+    Attributes:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero.
+        filas (:class:`Entero`): Filas escritas.
+    """
+
+    def __init__(self, ruta, columnas, tipos, formato='csv', filas_bloque=FILAS_BLOQUE_ESCRITURA):
+        comprobar_formato(formato)
+        self.fichero = ruta_tabla(ruta, formato)
+        self.columnas = list(columnas)
+        self.tipos = tipos
+        self.formato = formato
+        self.filas_bloque = filas_bloque
+        self.filas = 0
+
+        if formato == 'csv':
+            self.destino = open(self.fichero, 'w', encoding='utf-8', newline='')
+            pd.DataFrame(columns=self.columnas).to_csv(self.destino, sep=';', index=False)
+            return
+
+        # En los formatos columnares solo se conservan los tipos numéricos, el resto se guarda como texto
+        self.texto = [columna for columna in self.columnas
+                      if not (isinstance(tipos[columna], np.dtype) and tipos[columna].kind in 'iufb')]
+        texto = pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) if formato == 'parquet' else pyarrow.string()
+        self.esquema = pyarrow.schema([(columna, texto if columna in self.texto else
+                                        pyarrow.from_numpy_dtype(tipos[columna])) for columna in self.columnas])
+        if formato == 'parquet':
+            self.destino = pyarrow.parquet.ParquetWriter(self.fichero, self.esquema)
+        else:
+            self.destino = pyarrow.ipc.new_file(self.fichero, self.esquema)
+
+    def escribir(self, df, constantes=None):
+        """Añade una parte de la tabla, convirtiendo sus columnas a los tipos de la tabla.
+
+        Args:
+            df (:class:`pandas:pandas.DataFrame`): Filas a añadir, con todas o parte de las columnas.
+            constantes (:class:`Diccionario`, opcional): Columnas que no están en las filas y se añaden con un
+                valor constante, sin modificar ni copiar las filas completas.
+        """
+        for inicio in range(0, len(df), self.filas_bloque):
+            bloque = df.iloc[inicio:inicio + self.filas_bloque].reindex(columns=self.columnas)
+            for columna, valor in (constantes or {}).items():
+                bloque[columna] = valor
+            tipos = {columna: tipo for columna, tipo in self.tipos.items() if bloque[columna].dtype != tipo}
+            if tipos:
+                bloque = bloque.astype(tipos)
+
+            if self.formato == 'csv':
+                bloque.to_csv(self.destino, sep=';', index=False, header=False)
+            else:
+                bloque = bloque.astype({columna: 'string' for columna in self.texto})
+                if self.formato == 'parquet':
+                    bloque = bloque.astype({columna: 'category' for columna in self.texto})
+                self.destino.write_table(pyarrow.Table.from_pandas(bloque, schema=self.esquema,
+                                                                   preserve_index=False))
+            self.filas += len(bloque)
+
+    def cerrar(self):
+        """Cierra el fichero.
+
+        Returns:
+            fichero (:class:`Cadena de Texto`): Ruta del fichero escrito.
+        """
+        self.destino.close()
+        return self.fichero
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+def buscar_tabla(ruta):
+    """Busca el fichero de una tabla guardada en cualquiera de los formatos de salida.
+
+    Args:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero, con o sin extensión.
+
+    Returns:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero encontrado, :obj:`None` si no existe.
+     """
+    if os.path.splitext(ruta)[1] in EXTENSIONES_FORMATO.values():
+        if os.path.exists(ruta):
+            return ruta
+        ruta = os.path.splitext(ruta)[0]
+    for extension in EXTENSIONES_FORMATO.values():
+        if os.path.exists(ruta + extension):
+            return ruta + extension
+    return None
+
+
+def leer_tabla(ruta, dtype='string'):
+    """Lee una tabla guardada con :func:`guardar_tabla` en cualquiera de los formatos de salida. Si la ruta no
+    tiene extensión o el fichero no existe con la indicada, se busca en el resto de formatos.
+
+    Args:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero, con o sin extensión.
+        dtype (:class:`Cadena de Texto`, opcional): Tipo al que convertir las columnas, :obj:`None` para conservar
+            el tipo guardado.
+
+    Returns:
+        df (:class:`pandas:pandas.DataFrame`): La tabla en un cuadro de datos.
+     """
+    fichero = buscar_tabla(ruta)
+    if fichero is None:
+        raise FileNotFoundError(f'No existe la tabla {ruta}')
+
+    extension = os.path.splitext(fichero)[1]
+    if extension == '.csv':
+        return pd.read_csv(fichero, sep=';', dtype=dtype)
+    df = pd.read_parquet(fichero) if extension == '.parquet' else pd.read_feather(fichero)
+    return df.astype(dtype) if dtype is not None else df
+
+
+def leer_tabla_por_bloques(ruta, filas_bloque=FILAS_BLOQUE_ESCRITURA, dtype='string'):
+    """Lee por bloques de filas una tabla guardada en cualquiera de los formatos de salida, de forma que no es
+    necesario tenerla completa en memoria.
+
+    Args:
+        ruta (:class:`Cadena de Texto`): Ruta del fichero, con o sin extensión.
+        filas_bloque (:class:`Entero`): Filas de cada bloque. En Parquet y Feather los bloques no superan los
+            grupos de filas o lotes del fichero.
+        dtype (:class:`Cadena de Texto`, opcional): Tipo al que convertir las columnas, :obj:`None` para conservar
+            el tipo guardado.
+
+    Returns:
+        bloques (:class:`Iterador` de :class:`pandas:pandas.DataFrame`): Bloques de la tabla.
+     """
+    fichero = buscar_tabla(ruta)
+    if fichero is None:
+        raise FileNotFoundError(f'No existe la tabla {ruta}')
+
+    extension = os.path.splitext(fichero)[1]
+    if extension == '.csv':
+        with pd.read_csv(fichero, sep=';', dtype=dtype, chunksize=filas_bloque) as lector:
+            yield from lector
+        return
+
+    comprobar_formato('parquet' if extension == '.parquet' else 'feather')
+    if extension == '.parquet':
+        lotes = pyarrow.parquet.ParquetFile(fichero).iter_batches(batch_size=filas_bloque)
+    else:
+        lector = pyarrow.ipc.open_file(fichero)
+        lotes = (lector.get_batch(indice) for indice in range(lector.num_record_batches))
+    for lote in lotes:
+        bloque = lote.to_pandas()
+        yield bloque.astype(dtype) if dtype is not None else bloque
+
+
+def exportar_csv(directorio, borrar_origen=False):
+    """Convierte a .CSV separado por **;** todas las tablas en formato columnar de un directorio y sus
+    subdirectorios, para las herramientas que solo leen .CSV.
+
+    Args:
+        directorio (:class:`Cadena de Texto`): Directorio de las tablas.
+        borrar_origen (:class:`Booleano`): Borra cada tabla columnar tras exportarla.
+
+    Returns:
+        exportadas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los .CSV generados.
+     """
+    exportadas = []
+    for extension in ('.parquet', '.feather'):
+        for fichero in sorted(glob.glob(os.path.join(directorio, '**', '*' + extension), recursive=True)):
+            exportadas.append(guardar_tabla(leer_tabla(fichero, dtype=None), os.path.splitext(fichero)[0]))
+            if borrar_origen:
+                os.remove(fichero)
+    return exportadas
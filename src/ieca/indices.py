@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+class IndiceCodigos:
+    """Índice hash que traduce los códigos de la columna origen de un cuadro de datos a los de su columna destino,
+    como el **COD** -> **ID** de una jerarquia o el **SOURCE** -> **TARGET** de un mapa de dimension.
+
+    La traducción se hace sobre los valores distintos de la columna a traducir y no fila a fila, devolviendo una
+    columna categórica, por lo que sustituye a cruzar el cuadro de datos completo con la jerarquia o el mapa.
+    Si un código origen aparece repetido se usa su primera aparición y los códigos sin traducción quedan nulos.
+
+    Args:
+        df (:class:`pandas:pandas.DataFrame`): Cuadro de datos con las columnas origen y destino.
+        origen (:class:`Cadena de Texto`): Columna con los códigos a traducir.
+        destino (:class:`Cadena de Texto`): Columna con los códigos traducidos.
+
+    Attributes:
+        memoria (:class:`Entero`): Memoria aproximada en bytes ocupada por el índice.
+    """
+
+    def __init__(self, df, origen, destino):
+        pares = df[[origen, destino]].dropna(subset=[origen]).drop_duplicates(origen, keep='first')
+        self.indice = pd.Index(pares[origen].to_numpy(dtype=object, na_value=None))
+        self.destinos = pares[destino].to_numpy(dtype=object, na_value=None)
+        self.memoria = int(self.indice.memory_usage(deep=True) +
+                           pd.Series(self.destinos, dtype=object).memory_usage(index=False, deep=True))
+
+    def traducir(self, valores, alternativa=None):
+        """Traduce una columna de códigos. Cuando se proporciona una columna alternativa, las filas cuyo código no
+        tiene traducción toman la traducción del código de la alternativa en la misma fila.
+
+        Args:
+            valores (:class:`pandas:pandas.Series`): Códigos a traducir.
+            alternativa (:class:`pandas:pandas.Series`, opcional): Códigos a traducir cuando falla `valores`.
+
+        Returns:
+            traduccion (:class:`pandas:pandas.Categorical`): Los códigos traducidos, nulos si no se encuentran.
+        """
+        codigos, categorias = codificar(valores)
+        bloques_codigos, bloques_categorias = [codigos], [categorias]
+        if alternativa is not None:
+            codigos_alternativa, categorias_alternativa = codificar(alternativa)
+            bloques_codigos.append(codigos_alternativa)
+            bloques_categorias.append(categorias_alternativa)
+
+        # Solo se buscan en el índice los valores distintos, después se propagan a las filas a través de los
+        # códigos de la columna categórica.
+        traducidas = [self.buscar(categorias) for categorias in bloques_categorias]
+        codigos_traducidos, categorias_traducidas = pd.factorize(np.concatenate(traducidas))
+
+        resultado = None
+        desplazamiento = 0
+        for codigos, traduccion in zip(bloques_codigos, traducidas):
+            # El código -1 de los nulos toma el último elemento, que también es -1.
+            equivalencias = np.append(codigos_traducidos[desplazamiento:desplazamiento + len(traduccion)], -1)
+            codigos_bloque = equivalencias[codigos]
+            resultado = codigos_bloque if resultado is None else np.where(resultado >= 0, resultado, codigos_bloque)
+            desplazamiento += len(traduccion)
+
+        traduccion = pd.Categorical.from_codes(resultado, categorias_traducidas)
+        return traduccion.remove_unused_categories() if alternativa is not None else traduccion
+
+    def buscar(self, codigos):
+        """Busca en el índice una lista de códigos sin repetir.
+
+        Args:
+            codigos (:class:`numpy:numpy.ndarray`): Códigos a buscar.
+
+        Returns:
+            traducciones (:class:`numpy:numpy.ndarray`): Los códigos traducidos o :obj:`None` si no se encuentran.
+        """
+        posiciones = self.indice.get_indexer(codigos)
+        traducciones = np.full(len(codigos), None, dtype=object)
+        encontrados = posiciones >= 0
+        traducciones[encontrados] = self.destinos[posiciones[encontrados]]
+        return traducciones
+
+
+def codificar(valores):
+    """Separa una columna en los códigos de cada fila y sus valores distintos, aprovechando la codificación de
+    las columnas categóricas.
+
+    Args:
+        valores (:class:`pandas:pandas.Series`): Columna a codificar.
+
+    Returns:
+        codigos (:class:`numpy:numpy.ndarray`): Posición de cada fila en los valores distintos, -1 si es nula.
+        categorias (:class:`numpy:numpy.ndarray`): Valores distintos de la columna.
+    """
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        return valores.cat.codes.to_numpy(), valores.cat.categories.to_numpy(dtype=object)
+    codigos, categorias = pd.factorize(valores.to_numpy(dtype=object))
+    return codigos, np.asarray(categorias, dtype=object)
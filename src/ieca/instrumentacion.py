@@ -0,0 +1,193 @@
+import contextlib
+import cProfile
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+CAMPOS_INFORME = ['actividad', 'ambito', 'etapa', 'inicio', 'tiempo', 'tiempo_cpu', 'incremento_pico_memoria_kb',
+                  'filas_entrada', 'filas_salida', 'memoria_entrada_kb', 'memoria_salida_kb', 'error']
+
+
+def pico_memoria_kb():
+    """Devuelve el pico de memoria residente (RSS) del proceso hasta el momento.
+
+    Returns:
+        pico (:class:`Entero`): Pico de memoria en KB, :obj:`None` si el sistema no permite medirlo.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == 'darwin' else pico
+
+
+class Instrumentacion:
+    """Registro común a todo el proceso del coste de cada etapa de la ejecución: acciones de las consultas y de la
+    actividad, carga de jerarquias y peticiones a la API. De cada etapa se mide el tiempo real, el tiempo de CPU
+    del hilo que la ejecuta, el incremento del pico de memoria residente del proceso y, si se indican, las filas
+    de entrada y de salida.
+
+    Además, permite perfilar con :mod:`cProfile` o **pyinstrument** la generación completa de una consulta.
+
+    Args:
+        activa (:class:`Booleano`): Registra las mediciones.
+
+    Attributes:
+        registros (:obj:`Lista` de :class:`Diccionario`): Mediciones registradas, con los campos de
+            :data:`CAMPOS_INFORME`.
+    """
+
+    def __init__(self, activa=True):
+        self.activa = activa
+        self.actividad = None
+        self.directorio_informes = None
+        self.perfilar_consulta = None
+        self.perfilador = 'cProfile'
+
+        self.registros = []
+        self.bloqueo = threading.Lock()
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def configurar(self, configuracion_global, actividad):
+        """Ajusta la instrumentación a la sección :obj:`instrumentacion` de la configuración global y asocia las
+        siguientes mediciones a la actividad.
+
+        Args:
+            configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se
+                realicen.
+            actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+        """
+        configuracion = configuracion_global['instrumentacion']
+        with self.bloqueo:
+            self.activa = configuracion['activa']
+            self.directorio_informes = configuracion['directorio_informes']
+            self.perfilar_consulta = configuracion['perfilar_consulta']
+            self.perfilador = configuracion['perfilador']
+            self.actividad = actividad
+
+    def reiniciar(self):
+        """Descarta las mediciones registradas.
+
+        Returns:
+            registros (:obj:`Lista` de :class:`Diccionario`): Las mediciones descartadas.
+        """
+        with self.bloqueo:
+            registros, self.registros = self.registros, []
+        return registros
+
+    @contextlib.contextmanager
+    def medir(self, etapa, ambito, filas_entrada=None):
+        """Mide la etapa ejecutada dentro del bloque ``with``. La medición devuelta puede completarse con las
+        **filas_salida** de la etapa y con la memoria de sus datos de entrada y de salida, **memoria_entrada_kb** y
+        **memoria_salida_kb**. Si la etapa lanza una excepción, se registra su tipo y se propaga.
+
+        Args:
+            etapa (:class:`Cadena de Texto`): Nombre de la etapa, normalmente el de la acción.
+            ambito (:class:`Cadena de Texto`): Consulta, jerarquia, actividad o URL sobre la que actúa la etapa.
+            filas_entrada (:class:`Entero`, opcional): Filas que recibe la etapa.
+
+        Returns:
+            medicion (:class:`Diccionario`): Medición de la etapa.
+        """
+        medicion = {'actividad': self.actividad, 'ambito': ambito, 'etapa': etapa, 'filas_entrada': filas_entrada,
+                    'filas_salida': None, 'memoria_entrada_kb': None, 'memoria_salida_kb': None, 'error': None}
+        if not self.activa:
+            yield medicion
+            return
+
+        inicio = time.time()
+        inicio_reloj = time.perf_counter()
+        inicio_cpu = time.thread_time()
+        pico_inicial = pico_memoria_kb()
+        try:
+            yield medicion
+        except BaseException as e:
+            medicion['error'] = type(e).__name__
+            raise
+        finally:
+            pico_final = pico_memoria_kb()
+            medicion.update(inicio=inicio, tiempo=time.perf_counter() - inicio_reloj,
+                            tiempo_cpu=time.thread_time() - inicio_cpu,
+                            incremento_pico_memoria_kb=None if pico_final is None else pico_final - pico_inicial)
+            with self.bloqueo:
+                self.registros.append(medicion)
+
+    @contextlib.contextmanager
+    def perfilar(self, id_consulta):
+        """Perfila el bloque ``with`` si la consulta es la indicada en :obj:`perfilar_consulta`, guardando el
+        resultado en :obj:`directorio_informes`: un fichero **.prof** de :mod:`cProfile`, que puede abrirse con
+        :mod:`pstats` o snakeviz, o un **.html** si el perfilador es **pyinstrument** y está instalado.
+
+        Args:
+            id_consulta (:class:`Cadena de Texto`): ID de la consulta sin parámetros.
+        """
+        if not self.activa or self.perfilar_consulta is None or \
+                str(self.perfilar_consulta).split('?')[0] != id_consulta:
+            yield
+            return
+
+        os.makedirs(self.directorio_informes, exist_ok=True)
+        fichero = os.path.join(self.directorio_informes, f'perfil_{self.actividad}_{id_consulta}')
+        if self.perfilador == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                self.logger.warning('pyinstrument no está instalado, se utilizará cProfile')
+            else:
+                perfil = Profiler()
+                perfil.start()
+                try:
+                    yield
+                finally:
+                    perfil.stop()
+                    with open(fichero + '.html', 'w', encoding='utf-8') as destino:
+                        destino.write(perfil.output_html())
+                    self.logger.info('Perfil guardado: %s.html', fichero)
+                return
+
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            perfil.dump_stats(fichero + '.prof')
+            self.logger.info('Perfil guardado: %s.prof', fichero)
+
+
+def guardar_informe(registros, directorio_informes, nombre):
+    """Guarda las mediciones de una ejecución en **'<directorio_informes>/<nombre>.json'** y
+    **'<directorio_informes>/<nombre>.csv'**.
+
+    Args:
+        registros (:obj:`Lista` de :class:`Diccionario`): Mediciones de :class:`Instrumentacion`.
+        directorio_informes (:class:`Cadena de Texto`): Directorio de los informes.
+        nombre (:class:`Cadena de Texto`): Nombre de los ficheros sin extensión.
+
+    Returns:
+        ficheros (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los informes.
+    """
+    os.makedirs(directorio_informes, exist_ok=True)
+    fichero = os.path.join(directorio_informes, nombre)
+    with open(fichero + '.json', 'w', encoding='utf-8') as destino:
+        json.dump(registros, destino, indent=2, ensure_ascii=False)
+    with open(fichero + '.csv', 'w', encoding='utf-8', newline='') as destino:
+        escritor = csv.DictWriter(destino, fieldnames=CAMPOS_INFORME, delimiter=';')
+        escritor.writeheader()
+        escritor.writerows(registros)
+    return [fichero + '.json', fichero + '.csv']
+
+
+instrumentacion = Instrumentacion()
@@ -1,17 +1,24 @@
 import copy
 import os
 import sys
-import requests
 import pandas as pd
-import itertools
 import numpy as np
 import logging
 
+from src.ieca.cliente_api import cliente_api
+from src.ieca.concurrencia import guardar_csv_atomico
+from src.ieca.formatos import buscar_tabla, guardar_tabla, leer_tabla
+from src.ieca.instrumentacion import instrumentacion
+from src.ieca.registro_jerarquias import registro_jerarquias
+from src.ieca.repositorio_mapas import repositorio_mapas
+
 pd.set_option('mode.chained_assignment', None)
 
 fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
 logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
 
+COLUMNAS_JERARQUIA = ['ID', 'COD', 'NAME', 'DESCRIPTION', 'PARENTCODE', 'ORDER']
+
 
 class Jerarquia:
     """Estructura de datos para manejar las jerarquias encontradas dentro
@@ -34,7 +41,8 @@ class Jerarquia:
             - alias (Las jerarquias pueden tener distintos datos, usamos estos alias para concretizarlos)
             - levels (En desuso)
         datos (:class:`pandas:pandas.DataFrame`): La jerarquia en un cuadro de datos que posteriormente puede ser
-            exportada a .CSV para importarse en SDMX.
+            exportada a .CSV para importarse en SDMX. Se obtiene de :data:`src.registro_jerarquias.registro_jerarquias`
+            y es compartida con el resto de jerarquias iguales, por lo que no debe modificarse.
         """
 
     def __init__(self, jerarquia, configuracion_global, actividad):
@@ -44,35 +52,27 @@ class Jerarquia:
         self.id_jerarquia = self.metadatos["alias"] + '-' + self.metadatos['cod']
         self.logger = logging.getLogger(f'{self.__class__.__name__} [{self.id_jerarquia}]')
 
-        self.datos = self.solicitar_informacion_jerarquia()
+        self.clave = self.id_jerarquia if self.configuracion_global['compartir_jerarquias_entre_actividades'] else \
+            (self.actividad, self.id_jerarquia)
+        with instrumentacion.medir('cargar_jerarquia', self.id_jerarquia) as medicion:
+            self.datos = registro_jerarquias.obtener(self.clave, self.solicitar_informacion_jerarquia)
+            medicion['filas_salida'] = len(self.datos) if self.datos is not None else None
         self.datos_sdmx = []
         self.nombre = self.metadatos["alias"][2:-2]
         self.logger.info('Extrayendo lista de código')
 
     def convertir_jerarquia_a_dataframe(self, datos_jerarquia):
-        """Transforma el diccionario con los datos de la jerarquia a formato tabular, borrando los valores con Código
-        duplicado además de añadir el valor **_Z**.
+        """Transforma el diccionario con los datos de la jerarquia a formato tabular con :func:`aplanar_arbol`,
+        borrando los valores con Código duplicado además de añadir el valor **_Z**.
 
         Returns:
             datos (:class:`pandas:pandas.DataFrame`): La jerarquia en un cuadro de datos.
          """
         self.logger.info('Transformando Jerarquias')
-        data = [datos_jerarquia['data']]
         propiedades_jerarquia = self.configuracion_global['propiedades_jerarquias']
 
-        def recorrer_arbol_recursivamente(datos_jerarquia):
-            datos_nivel_actual = [[jerarquia[propiedad] for propiedad in propiedades_jerarquia]
-                                  for jerarquia in datos_jerarquia]
-
-            es_ultimo_nivel_rama = np.all(
-                [jerarquia['children'] == [] or jerarquia['isLastLevel'] for jerarquia in datos_jerarquia])
-            if es_ultimo_nivel_rama:
-                return datos_nivel_actual
-
-            return datos_nivel_actual + list(itertools.chain(
-                *[recorrer_arbol_recursivamente(jerarquia['children']) for jerarquia in datos_jerarquia]))
-
-        datos_jerarquia = recorrer_arbol_recursivamente(data)
+        datos_jerarquia, profundidades, _ = aplanar_arbol(datos_jerarquia['data'], propiedades_jerarquia)
+        self.logger.info('Nodos: %s, profundidad: %s', len(datos_jerarquia), max(profundidades, default=0))
         datos_jerarquia.append(['_Z', 'No aplica', 'No aplica', 'No aplica', 'null', 'null'])
 
         jerarquia_df = pd.DataFrame(datos_jerarquia, columns=[propiedad.upper() for propiedad in propiedades_jerarquia],
@@ -84,8 +84,16 @@ class Jerarquia:
 
         return jerarquia_df
 
+    def indice_codigos(self):
+        """Índice **COD** -> **ID** de la jerarquia, compartido por todas las consultas que la usan.
+
+        Returns:
+            indice (:class:`src.indices.IndiceCodigos`): Índice de la jerarquia.
+         """
+        return registro_jerarquias.obtener_indice(self.clave, self.datos)
+
     def guardar_datos(self):
-        """Accion que guarda la jerarquia en formato .CSV de dos formas:
+        """Accion que guarda la jerarquia en el :obj:`formato_salida` de la configuración global de dos formas:
 
                 - Con el Còdigo de BADEA (No admitido por nuestro framework de SDMX)
                 - Sin el código de BADEA (Admitido por nuestro framework de SDMX)
@@ -104,7 +112,7 @@ class Jerarquia:
         if not os.path.exists(directorio_sdmx):
             os.makedirs(directorio_sdmx)
         self.logger.info('Almacenando datos Jerarquia')
-        columnas = ['ID', 'COD', 'NAME', 'DESCRIPTION', 'PARENTCODE', 'ORDER']
+        columnas = COLUMNAS_JERARQUIA
         columnas_sdmx = ['ID', 'NAME', 'DESCRIPTION', 'PARENTCODE', 'ORDER']
 
         datos = copy.deepcopy(self.datos)
@@ -116,48 +124,112 @@ class Jerarquia:
                                                                                        'dimensiones_a_mapear'] else \
             datos[columnas_sdmx]
 
-        datos.to_csv(f'{os.path.join(directorio_original, self.id_jerarquia)}.csv', sep=';', index=False)
-        self.datos_sdmx.to_csv(f'{os.path.join(directorio_sdmx, self.id_jerarquia)}.csv', sep=';', index=False)
+        formato = self.configuracion_global['formato_salida']
+        guardar_tabla(datos, os.path.join(directorio_original, self.id_jerarquia), formato)
+        guardar_tabla(self.datos_sdmx, os.path.join(directorio_sdmx, self.id_jerarquia), formato)
         self.logger.info('Jerarquia Almacenada')
 
     def solicitar_informacion_jerarquia(self):
         """Realiza la petición HTTP a la API si la jerarquía no se encuentra en nuestro directorio local,
         automáticamente se convierte la jerarquia a dataframe haciendo uso de
-        :attr:`src.jerarquia.Jerarquia.convertir_jerarquia_a_dataframe`.
+        :attr:`src.jerarquia.Jerarquia.convertir_jerarquia_a_dataframe`. La jerarquia en local puede estar guardada
+        en cualquiera de los formatos de :mod:`src.formatos`.
+
+        Si la configuración global activa :obj:`compartir_jerarquias_entre_actividades`, antes de recurrir a la API
+        se busca la jerarquia en el directorio **'compartidas'**, donde se guardan las jerarquias descargadas para
+        que las reutilicen el resto de actividades.
 
         Returns:
             datos (:class:`pandas:pandas.DataFrame`): La jerarquia en un cuadro de datos.
          """
         directorio_csv = os.path.join(self.configuracion_global['directorio_jerarquias'], self.actividad, 'original',
                                       self.id_jerarquia + '.csv')
+        directorio_compartidas = os.path.join(self.configuracion_global['directorio_jerarquias'], 'compartidas')
+        compartir = self.configuracion_global['compartir_jerarquias_entre_actividades']
         datos = None
         try:
             self.logger.info('Buscando el CSV de la jerarquia en local')
-            with open(directorio_csv, 'r', encoding='utf-8') as csv_file:
-                datos = pd.read_csv(csv_file, sep=';', dtype='string')
-                self.logger.info('CSV leido correctamente')
+            if compartir and buscar_tabla(directorio_csv) is None:
+                directorio_csv = os.path.join(directorio_compartidas, self.id_jerarquia + '.csv')
+            datos = leer_tabla(directorio_csv)
+            self.logger.info('CSV leido correctamente')
         except Exception as e:
             self.logger.warning('No se ha encontrado el fichero %s', directorio_csv)
             self.logger.warning('Excepción: %s', e)
             self.logger.info('Iniciando peticion a la API del IECA')
-            datos = self.convertir_jerarquia_a_dataframe(requests.get(self.metadatos['url']).json())
+            datos = self.convertir_jerarquia_a_dataframe(cliente_api.obtener_json(self.metadatos['url']))
             self.logger.info('Petición API Finalizada')
+            if compartir:
+                os.makedirs(directorio_compartidas, exist_ok=True)
+                guardar_csv_atomico(datos, os.path.join(directorio_compartidas, self.id_jerarquia + '.csv'),
+                                    sep=';', index=False)
 
         finally:
             if datos is not None:
                 self.logger.info('Datos alcanzados correctamente')
             else:
                 self.logger.warning('No hay información disponible')
+        if datos is not None and self.configuracion_global['politica_tipos']['jerarquias_compactas']:
+            datos = compactar_jerarquia(datos)
         return datos
 
 
+def aplanar_arbol(raiz, propiedades):
+    """Aplana el árbol de una jerarquia de la API en una única pasada y sin recursión, de forma que el coste es
+    lineal en el número de nodos y no depende del límite de recursión de Python.
+
+    Los nodos se recorren por grupos de hermanos: primero el grupo completo y después, para cada uno de sus nodos
+    en orden, el grupo de sus hijos con todos sus descendientes. Los hijos de un grupo no se recorren si todos sus
+    nodos son hojas o están marcados como **isLastLevel**.
+
+    Args:
+        raiz (:class:`Diccionario`): Nodo raíz de la jerarquia, con sus hijos en **children**.
+        propiedades (:obj:`Lista` de :class:`Cadena de Texto`): Propiedades de cada nodo a extraer.
+
+    Returns:
+        filas (:obj:`Lista` de :obj:`Lista`): Las propiedades de cada nodo en orden de recorrido.
+        profundidades (:class:`numpy:numpy.ndarray`): Profundidad de cada nodo, 0 para la raíz.
+        padres (:class:`numpy:numpy.ndarray`): Fila del padre de cada nodo, -1 para la raíz. Siguiendo los padres
+            se obtiene la ruta de cada nodo. No sustituye a **parentId**, que la API deja vacío en los hijos de las
+            raíces de las jerarquias planas.
+    """
+    filas, profundidades, padres = [], [], []
+    pendientes = [([raiz], 0, -1)]
+    while pendientes:
+        grupo, profundidad, padre = pendientes.pop()
+        inicio = len(filas)
+        filas.extend([nodo[propiedad] for propiedad in propiedades] for nodo in grupo)
+        profundidades.extend([profundidad] * len(grupo))
+        padres.extend([padre] * len(grupo))
+
+        if all(nodo['children'] == [] or nodo['isLastLevel'] for nodo in grupo):
+            continue
+        # Se apilan en orden inverso para recorrer primero los descendientes del primer nodo del grupo
+        for posicion in range(len(grupo) - 1, -1, -1):
+            pendientes.append((grupo[posicion]['children'], profundidad + 1, inicio + posicion))
+
+    return filas, np.array(profundidades, dtype=np.int32), np.array(padres, dtype=np.int64)
+
+
 def mapear_jerarquia(df, dimension, directorio_mapas_dimensiones):
-    directorio_mapa = os.path.join(directorio_mapas_dimensiones, dimension)
-    df_mapa = pd.read_csv(directorio_mapa, sep=',', dtype='string')
+    indice = repositorio_mapas.indice(os.path.join(directorio_mapas_dimensiones, dimension))
+    return df.assign(ID=indice.traducir(df['ID']), PARENTCODE=indice.traducir(df['PARENTCODE']))
 
-    df.loc[:, 'ID'] = \
-        df.merge(df_mapa, how='left', left_on='ID', right_on='SOURCE')['TARGET'].copy(deep=True)
-    df.loc[:, 'PARENTCODE'] = \
-        df.merge(df_mapa, how='left', left_on='PARENTCODE', right_on='SOURCE')['TARGET'].copy(deep=True)
 
-    return df
+def compactar_jerarquia(datos):
+    """Reduce la memoria de una jerarquia guardando **PARENTCODE**, que repite los códigos de los padres, como
+    categórica y **ORDER** como entero, sin cambiar su contenido al escribirla. **ORDER** solo se convierte si todos
+    sus valores son enteros sin ceros a la izquierda.
+
+    Args:
+        datos (:class:`pandas:pandas.DataFrame`): La jerarquia en un cuadro de datos.
+
+    Returns:
+        datos (:class:`pandas:pandas.DataFrame`): La jerarquia con los tipos compactos.
+    """
+    datos = datos.astype({'PARENTCODE': 'category'}) if 'PARENTCODE' in datos.columns else datos.copy()
+    if 'ORDER' in datos.columns:
+        orden = datos['ORDER'].astype('string').replace('', pd.NA)
+        if orden.dropna().str.fullmatch(r'-?(0|[1-9][0-9]{0,8})').all():
+            datos['ORDER'] = orden.astype('Int32')
+    return datos
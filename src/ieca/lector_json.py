@@ -0,0 +1,196 @@
+import json
+
+ESPACIOS = ' \t\n\r'
+
+
+class LectorJSON:
+    """Lector incremental de un fichero JSON que mantiene en memoria solo el fragmento del fichero que se está
+    decodificando. Permite recorrer un objeto clave a clave y los elementos de una lista uno a uno, decodificando
+    cada valor con el decodificador estándar de :mod:`json`.
+
+    Args:
+        fichero (:class:`Fichero`): Fichero JSON abierto en modo texto.
+        tamano_lectura (:class:`Entero`): Número de caracteres que se leen del fichero cada vez.
+    """
+
+    def __init__(self, fichero, tamano_lectura=1024 ** 2):
+        self.fichero = fichero
+        self.tamano_lectura = tamano_lectura
+        self.decodificador = json.JSONDecoder()
+        self.buffer = ''
+        self.posicion = 0
+        self.fin = False
+
+    def leer(self):
+        """Añade al buffer el siguiente fragmento del fichero, descartando la parte ya decodificada.
+
+        Returns:
+            leido (:class:`Booleano`): Falso si se ha alcanzado el final del fichero.
+        """
+        if self.fin:
+            return False
+        fragmento = self.fichero.read(self.tamano_lectura)
+        self.buffer = self.buffer[self.posicion:] + fragmento
+        self.posicion = 0
+        self.fin = not fragmento
+        return bool(fragmento)
+
+    def caracter(self):
+        """Devuelve el siguiente carácter significativo sin consumirlo.
+
+        Returns:
+            caracter (:class:`Cadena de Texto`): El carácter, vacío si se ha alcanzado el final del fichero.
+        """
+        while True:
+            while self.posicion < len(self.buffer) and self.buffer[self.posicion] in ESPACIOS:
+                self.posicion += 1
+            if self.posicion < len(self.buffer) or not self.leer():
+                return self.buffer[self.posicion:self.posicion + 1]
+
+    def consumir(self, esperado):
+        """Consume el siguiente carácter significativo comprobando que es el esperado.
+
+        Args:
+            esperado (:class:`Cadena de Texto`): Carácter esperado.
+        """
+        caracter = self.caracter()
+        if caracter != esperado:
+            raise json.JSONDecodeError(f"Se esperaba '{esperado}'", self.buffer, self.posicion)
+        self.posicion += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor completo, leyendo del fichero hasta tenerlo entero en el buffer.
+
+        Returns:
+            valor: El valor decodificado.
+        """
+        self.caracter()
+        while True:
+            try:
+                valor, final = self.decodificador.raw_decode(self.buffer, self.posicion)
+            except json.JSONDecodeError:
+                if self.leer():
+                    continue
+                raise
+            # Un número que acaba justo al final del buffer puede continuar en el siguiente fragmento.
+            if final == len(self.buffer) and self.leer():
+                continue
+            self.posicion = final
+            return valor
+
+    def claves(self):
+        """Recorre un objeto devolviendo sus claves. Tras cada clave, el valor debe consumirse con :meth:`~.valor`
+        o :meth:`~.elementos` antes de pedir la siguiente.
+
+        Returns:
+            claves (:class:`Generador` de :class:`Cadena de Texto`): Claves del objeto.
+        """
+        self.consumir('{')
+        if self.caracter() == '}':
+            self.posicion += 1
+            return
+        while True:
+            clave = self.valor()
+            self.consumir(':')
+            yield clave
+            if self.caracter() == ',':
+                self.posicion += 1
+                continue
+            self.consumir('}')
+            return
+
+    def elementos(self):
+        """Recorre una lista decodificando sus elementos de uno en uno.
+
+        Returns:
+            elementos (:class:`Generador`): Elementos de la lista.
+        """
+        self.consumir('[')
+        if self.caracter() == ']':
+            self.posicion += 1
+            return
+        while True:
+            yield self.valor()
+            if self.caracter() == ',':
+                self.posicion += 1
+                continue
+            self.consumir(']')
+            return
+
+
+def leer_consulta_por_bloques(fichero, tamano_bloque, claves_cabecera=('metainfo', 'hierarchies', 'measures')):
+    """Lee el JSON de una consulta de la API del IECA devolviendo su cabecera y un iterador sobre las
+    observaciones de **data** en bloques de como mucho `tamano_bloque` filas, de forma que nunca se decodifica el
+    fichero completo.
+
+    La API devuelve **data** después del resto de claves. Si no fuera así, los bloques leídos antes de completar la
+    cabecera se mantienen en memoria hasta encontrarla.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del JSON de la consulta.
+        tamano_bloque (:class:`Entero`): Número máximo de observaciones de cada bloque.
+        claves_cabecera (:obj:`Tupla` de :class:`Cadena de Texto`): Claves que deben leerse antes de las
+            observaciones.
+
+    Los errores del JSON en las observaciones se producen al recorrer los bloques, por lo que el generador debe
+    recorrerse o cerrarse, por ejemplo con :func:`contextlib.closing`, para cerrar el fichero.
+
+    Returns:
+        - cabecera (:class:`Diccionario`): Todas las claves del JSON salvo **data**.
+        - bloques (:class:`Generador` de :obj:`Lista`): Bloques de observaciones, :obj:`None` si **data** es nulo o
+          no existe.
+    """
+    json_file = open(fichero, 'r', encoding='utf-8')
+    try:
+        eventos = recorrer_consulta(LectorJSON(json_file), tamano_bloque)
+        cabecera = {}
+        bloques = None
+        for clave, valor in eventos:
+            if clave != 'data':
+                cabecera[clave] = valor
+                continue
+            bloques = [] if bloques is None else bloques
+            bloques.append(valor)
+            if all(clave_cabecera in cabecera for clave_cabecera in claves_cabecera):
+                return cabecera, encadenar_bloques(json_file, bloques, eventos)
+    except BaseException:
+        json_file.close()
+        raise
+
+    json_file.close()
+    return cabecera, encadenar_bloques(json_file, bloques, ()) if bloques is not None else None
+
+
+def recorrer_consulta(lector, tamano_bloque):
+    """Recorre el objeto raíz de la consulta devolviendo pares (clave, valor), salvo para **data** que devuelve un
+    par ('data', bloque) por cada bloque de observaciones, con un único bloque vacío si no tiene observaciones y
+    ninguno si es nulo.
+    """
+    for clave in lector.claves():
+        if clave != 'data' or lector.caracter() != '[':
+            valor = lector.valor()
+            if clave != 'data':
+                yield clave, valor
+            continue
+
+        bloque = []
+        emitidos = 0
+        for observacion in lector.elementos():
+            bloque.append(observacion)
+            if len(bloque) >= tamano_bloque:
+                yield clave, bloque
+                emitidos += 1
+                bloque = []
+        if bloque or not emitidos:
+            yield clave, bloque
+
+
+def encadenar_bloques(json_file, bloques_iniciales, eventos):
+    """Devuelve los bloques ya leídos seguidos de los que quedan por leer, cerrando el fichero al terminar."""
+    try:
+        yield from bloques_iniciales
+        for clave, valor in eventos:
+            if clave == 'data':
+                yield valor
+    finally:
+        json_file.close()
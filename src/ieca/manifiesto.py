@@ -0,0 +1,176 @@
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+
+from src.ieca.cache_consultas import resumen_fichero
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+VERSION_MANIFIESTO = 1
+
+# Parámetros de la configuración global que no afectan al resultado de una actividad.
+CLAVES_GLOBALES_IGNORADAS = ('trabajadores_consultas', 'memoria_maxima_jerarquias_mb', 'cliente_api',
+                             'refrescar_cache_consultas', 'ejecucion_incremental', 'directorio_logs',
+                             'instrumentacion')
+
+
+class Manifiesto:
+    """Manifiesto de la última ejecución completa de una actividad, guardado en
+    **'<directorio_datos>/<actividad>/manifiesto.json'**. Registra el resumen SHA-256 de todas sus entradas: el JSON
+    (o la caché binaria) de cada consulta, los .CSV de las jerarquias de la actividad, los mapas de dimensiones que
+    utiliza, su configuración y el código de :mod:`src.ieca` que la procesa, junto a los ficheros generados en
+    :obj:`directorio_jerarquias`, :obj:`directorio_datos` y :obj:`directorio_datos_SDMX`.
+
+    Si ninguna entrada ha cambiado, tampoco el código, y siguen existiendo todos los ficheros generados, la
+    actividad puede omitirse.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        configuracion_actividad (:class:`Diccionario`): Configuración de la actividad.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+    """
+
+    def __init__(self, configuracion_global, configuracion_actividad, actividad):
+        self.configuracion_global = configuracion_global
+        self.configuracion_actividad = configuracion_actividad
+        self.actividad = actividad
+        self.fichero = os.path.join(configuracion_global['directorio_datos'], actividad, 'manifiesto.json')
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__} [{actividad}]')
+
+    def directorios_salida(self):
+        """Directorios en los que la actividad genera ficheros.
+
+        Returns:
+            directorios (:obj:`Lista` de :class:`Cadena de Texto`): Los directorios de la actividad.
+        """
+        return [os.path.join(self.configuracion_global[clave], self.actividad)
+                for clave in ('directorio_jerarquias', 'directorio_datos', 'directorio_datos_SDMX')]
+
+    def salidas(self):
+        """Ficheros generados por la actividad, sin incluir el propio manifiesto.
+
+        Returns:
+            salidas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los ficheros.
+        """
+        salidas = []
+        for directorio in self.directorios_salida():
+            for raiz, _, ficheros in os.walk(directorio):
+                salidas.extend(os.path.join(raiz, fichero) for fichero in ficheros)
+        return sorted(salida for salida in salidas if os.path.abspath(salida) != os.path.abspath(self.fichero))
+
+    def entradas(self, ficheros_consultas, mapas):
+        """Calcula el resumen de las entradas de la actividad.
+
+        Args:
+            ficheros_consultas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los JSON o cachés de las
+                consultas.
+            mapas (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de los mapas de dimensiones que utiliza.
+
+        Returns:
+            entradas (:class:`Diccionario`): Resumen de la configuración y de cada fichero de entrada, :obj:`None`
+            para los que no existen.
+        """
+        configuracion_global = {clave: valor for clave, valor in self.configuracion_global.items()
+                                if clave not in CLAVES_GLOBALES_IGNORADAS}
+        directorio_jerarquias = os.path.join(self.configuracion_global['directorio_jerarquias'], self.actividad,
+                                             'original')
+        jerarquias = sorted(os.listdir(directorio_jerarquias)) if os.path.isdir(directorio_jerarquias) else []
+
+        def resumen(fichero):
+            return resumen_fichero(fichero) if os.path.isfile(fichero) else None
+
+        return {
+            'version': VERSION_MANIFIESTO,
+            'codigo': resumen_codigo(),
+            'configuracion': json.dumps([configuracion_global, self.configuracion_actividad], sort_keys=True,
+                                        default=str),
+            'consultas': {fichero: resumen(fichero) for fichero in ficheros_consultas},
+            'jerarquias': {jerarquia: resumen(os.path.join(directorio_jerarquias, jerarquia))
+                           for jerarquia in jerarquias},
+            'mapas': {mapa: resumen(os.path.join(self.configuracion_global['directorio_mapas_dimensiones'], mapa))
+                      for mapa in sorted(mapas)}}
+
+    def leer(self):
+        """Lee el manifiesto guardado.
+
+        Returns:
+            manifiesto (:class:`Diccionario`): El manifiesto, vacío si no existe o no puede leerse.
+        """
+        try:
+            with open(self.fichero, 'r', encoding='utf-8') as fichero:
+                return json.load(fichero)
+        except (OSError, ValueError):
+            return {}
+
+    def vigente(self, ficheros_consultas):
+        """Comprueba si las entradas de la actividad coinciden con las del manifiesto y siguen existiendo todos los
+        ficheros que generó.
+
+        Args:
+            ficheros_consultas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los JSON o cachés de las
+                consultas.
+
+        Returns:
+            vigente (:class:`Booleano`): Verdadero si la actividad no necesita volver a ejecutarse.
+        """
+        manifiesto = self.leer()
+        if not manifiesto:
+            self.logger.info('Sin manifiesto de una ejecución anterior')
+            return False
+
+        entradas = self.entradas(ficheros_consultas, manifiesto['entradas'].get('mapas', {}).keys())
+        cambios = [clave for clave, valor in entradas.items() if manifiesto['entradas'].get(clave) != valor]
+        if cambios:
+            self.logger.info('Entradas modificadas desde la última ejecución: %s', cambios)
+            return False
+
+        faltantes = [salida for salida in manifiesto['salidas'] if not os.path.exists(salida)]
+        if faltantes:
+            self.logger.info('Faltan %s ficheros generados en la última ejecución', len(faltantes))
+            return False
+        return True
+
+    def guardar(self, ficheros_consultas, mapas):
+        """Guarda el manifiesto con las entradas y los ficheros generados por la ejecución que acaba de terminar.
+
+        Args:
+            ficheros_consultas (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los JSON o cachés de las
+                consultas.
+            mapas (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de los mapas de dimensiones que utiliza.
+        """
+        manifiesto = {'entradas': self.entradas(ficheros_consultas, mapas), 'salidas': self.salidas()}
+        os.makedirs(os.path.dirname(self.fichero), exist_ok=True)
+        fichero_temporal = f'{self.fichero}.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with open(fichero_temporal, 'w', encoding='utf-8') as fichero:
+                json.dump(manifiesto, fichero, indent=2, ensure_ascii=False)
+            os.replace(fichero_temporal, self.fichero)
+        finally:
+            if os.path.exists(fichero_temporal):
+                os.remove(fichero_temporal)
+        self.logger.info('Manifiesto guardado')
+
+
+@functools.lru_cache(maxsize=None)
+def resumen_codigo(directorio=os.path.dirname(os.path.abspath(__file__))):
+    """Calcula el resumen SHA-256 del código fuente de :mod:`src.ieca`, de forma que un cambio en el código que
+    genera las salidas invalida los manifiestos anteriores. Se calcula una única vez por proceso.
+
+    Args:
+        directorio (:class:`Cadena de Texto`): Directorio del código.
+
+    Returns:
+        resumen (:class:`Cadena de Texto`): El resumen en hexadecimal.
+    """
+    resumen = hashlib.sha256()
+    for fichero in sorted(glob.glob(os.path.join(directorio, '*.py'))):
+        resumen.update(os.path.basename(fichero).encode('utf-8'))
+        resumen.update(resumen_fichero(fichero).encode('ascii'))
+    return resumen.hexdigest()
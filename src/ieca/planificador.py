@@ -0,0 +1,168 @@
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.ieca.actividad import Actividad
+from src.ieca.cliente_api import cliente_api, crear_limites_compartidos
+from src.ieca.concurrencia import establecer_bloqueo_mapas
+from src.ieca.instrumentacion import guardar_informe, instrumentacion
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class Planificador:
+    """Ejecuta las actividades configuradas en el fichero **'ejecucion.yaml'**, repartiéndolas entre
+    :attr:`~.trabajos` procesos. Cada actividad deja su propio registro en el directorio :obj:`directorio_logs`
+    de la configuración global y al finalizar se muestra un resumen con los tiempos y fallos de cada una. Las
+    mediciones de :mod:`src.ieca.instrumentacion` de todas las actividades se guardan en un único informe de la
+    ejecución en :obj:`directorio_informes`.
+
+    Los mapas de dimensiones son compartidos por todas las actividades, por lo que los procesos se coordinan
+    con un bloqueo común para escribirlos. Del mismo modo, los límites de peticiones simultáneas y por segundo de
+    :data:`src.ieca.cliente_api.cliente_api` son comunes a todos los procesos y no se multiplican por
+    :attr:`~.trabajos`.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        configuracion_actividades (:class:`Diccionario`): Configuración de cada actividad.
+        plantilla_configuracion_actividad (:class:`Diccionario`): Configuración por defecto de las actividades.
+        trabajos (:class:`Entero`): Número de actividades a ejecutar en paralelo.
+
+    Attributes:
+        resultados (:obj:`Lista` de :class:`Diccionario`): Resumen de la ejecución de cada actividad.
+    """
+
+    def __init__(self, configuracion_global, configuracion_actividades, plantilla_configuracion_actividad,
+                 trabajos=1):
+        self.configuracion_global = configuracion_global
+        self.configuracion_actividades = configuracion_actividades
+        self.plantilla_configuracion_actividad = plantilla_configuracion_actividad
+        self.trabajos = trabajos
+
+        self.resultados = []
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def ejecutar(self, actividades):
+        """Ejecuta las actividades y muestra el resumen de la ejecución.
+
+        Args:
+            actividades (:obj:`Lista` de :class:`Cadena de Texto`): Nombres de las actividades a ejecutar.
+
+        Returns:
+            resultados (:obj:`Lista` de :class:`Diccionario`): Resumen de la ejecución de cada actividad, en el
+            mismo orden que `actividades`.
+        """
+        self.logger.info('Ejecutando %s actividades con %s trabajos', len(actividades), self.trabajos)
+        argumentos = [(actividad, self.configuracion_global, self.configuracion_actividades[actividad],
+                       self.plantilla_configuracion_actividad) for actividad in actividades]
+
+        if self.trabajos > 1:
+            bloqueo = multiprocessing.Lock()
+            with ProcessPoolExecutor(max_workers=self.trabajos, initializer=inicializar_proceso,
+                                     initargs=(bloqueo, *crear_limites_compartidos(self.configuracion_global))) \
+                    as executor:
+                futuros = [executor.submit(ejecutar_actividad, *argumento) for argumento in argumentos]
+                self.resultados = [futuro.result() for futuro in futuros]
+        else:
+            self.resultados = [ejecutar_actividad(*argumento) for argumento in argumentos]
+
+        self.mostrar_resumen()
+        self.guardar_informe()
+        return self.resultados
+
+    def guardar_informe(self):
+        """Guarda las mediciones de todas las actividades en los informes
+        **'<directorio_informes>/ejecucion_<fecha>.json'** y **'<directorio_informes>/ejecucion_<fecha>.csv'**.
+        """
+        configuracion = self.configuracion_global['instrumentacion']
+        if not configuracion['activa']:
+            return
+        registros = [registro for resultado in self.resultados for registro in resultado['instrumentacion']]
+        ficheros = guardar_informe(registros, configuracion['directorio_informes'],
+                                   time.strftime('ejecucion_%Y%m%d-%H%M%S'))
+        self.logger.info('Informe de la ejecución guardado: %s', ficheros)
+
+    def mostrar_resumen(self):
+        """Muestra por consola una tabla con el estado, el tiempo y las consultas fallidas de cada actividad.
+        """
+        cabecera = ['ACTIVIDAD', 'ESTADO', 'TIEMPO (s)', 'CONSULTAS', 'FALLIDAS']
+        filas = [[resultado['actividad'], resultado['estado'], f"{resultado['tiempo']:.2f}",
+                  str(resultado['consultas']), ', '.join(resultado['consultas_fallidas'])]
+                 for resultado in self.resultados]
+        anchos = [max(len(fila[i]) for fila in [cabecera] + filas) for i in range(len(cabecera))]
+
+        lineas = [' | '.join(celda.ljust(ancho) for celda, ancho in zip(fila, anchos)) for fila in [cabecera] + filas]
+        lineas.insert(1, '-+-'.join('-' * ancho for ancho in anchos))
+        self.logger.info('Resumen de la ejecución:\n%s', '\n'.join(lineas))
+
+        fallidas = [resultado['actividad'] for resultado in self.resultados
+                    if resultado['estado'] not in ('OK', 'SIN CAMBIOS')]
+        if fallidas:
+            self.logger.warning('Actividades con errores: %s', fallidas)
+
+
+def inicializar_proceso(bloqueo, semaforo_api, turno_api):
+    """Prepara un proceso del planificador con los recursos comunes a todos los procesos.
+
+    Args:
+        bloqueo (:class:`multiprocessing.Lock`): Bloqueo de los mapas de dimensiones.
+        semaforo_api (:class:`multiprocessing.BoundedSemaphore`): Semáforo de las peticiones simultáneas a la API.
+        turno_api (:class:`multiprocessing.Value`): Instante de la siguiente petición a la API.
+    """
+    establecer_bloqueo_mapas(bloqueo)
+    cliente_api.compartir_limites(semaforo_api, turno_api)
+
+
+def ejecutar_actividad(actividad, configuracion_global, configuracion_actividad, plantilla_configuracion_actividad):
+    """Genera y ejecuta una actividad completa registrando su salida en el fichero
+    **'<directorio_logs>/<actividad>.log'**.
+
+    Args:
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        configuracion_actividad (:class:`Diccionario`): Configuración de la actividad.
+        plantilla_configuracion_actividad (:class:`Diccionario`): Configuración por defecto de la actividad.
+
+    Returns:
+        resultado (:class:`Diccionario`): Estado (**OK**, **PARCIAL** si alguna consulta ha fallado y no se han
+        generado los ficheros de la actividad, **ERROR** o **SIN CAMBIOS** si la ejecución incremental la omite),
+        tiempo en segundos, número de consultas generadas, consultas fallidas y mediciones de la instrumentación de
+        la actividad.
+    """
+    os.makedirs(configuracion_global['directorio_logs'], exist_ok=True)
+    manejador = logging.FileHandler(os.path.join(configuracion_global['directorio_logs'], actividad + '.log'),
+                                    mode='w', encoding='utf-8')
+    manejador.setFormatter(logging.Formatter(fmt))
+    logging.getLogger().addHandler(manejador)
+
+    resultado = {'actividad': actividad, 'estado': 'OK', 'tiempo': 0.0, 'consultas': 0, 'consultas_fallidas': [],
+                 'instrumentacion': []}
+    instrumentacion.reiniciar()
+    inicio = time.perf_counter()
+    try:
+        ejecucion = Actividad(configuracion_global, configuracion_actividad, plantilla_configuracion_actividad,
+                              actividad)
+        if configuracion_global['ejecucion_incremental'] and ejecucion.sin_cambios():
+            resultado['estado'] = 'SIN CAMBIOS'
+        else:
+            ejecucion.generar_consultas()
+            ejecucion.ejecutar()
+            resultado['consultas'] = len(ejecucion.consultas)
+            resultado['consultas_fallidas'] = list(ejecucion.consultas_fallidas.keys())
+            if ejecucion.consultas_fallidas:
+                resultado['estado'] = 'PARCIAL'
+    except Exception as e:
+        logging.getLogger(f'Actividad [{actividad}]').exception('La actividad ha fallado: %s', e)
+        resultado['estado'] = 'ERROR'
+    finally:
+        resultado['tiempo'] = time.perf_counter() - inicio
+        resultado['instrumentacion'] = instrumentacion.reiniciar()
+        logging.getLogger().removeHandler(manejador)
+        manejador.close()
+
+    return resultado
@@ -0,0 +1,151 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+from src.ieca.indices import IndiceCodigos
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+
+class RegistroJerarquias:
+    """Registro común a todo el proceso con los cuadros de datos de las jerarquias ya cargadas, de forma que
+    cada jerarquia se lee o se solicita a la API una única vez y es compartida por todas las
+    :class:`src.jerarquia.Jerarquia` que la referencian.
+
+    Los cuadros de datos devueltos son compartidos y deben tratarse como de solo lectura. Junto a cada jerarquia se
+    guardan los índices de códigos construidos sobre ella con :meth:`~.obtener_indice`. Cuando la memoria
+    ocupada supera :attr:`~.memoria_maxima` se descartan las jerarquias usadas hace más tiempo junto a sus índices.
+
+    Args:
+        memoria_maxima_mb (:class:`Entero`): Memoria máxima en MB que pueden ocupar las jerarquias registradas.
+
+    Attributes:
+        aciertos (:class:`Entero`): Número de jerarquias servidas desde el registro.
+        fallos (:class:`Entero`): Número de jerarquias que han tenido que cargarse.
+        expulsiones (:class:`Entero`): Número de jerarquias descartadas por falta de memoria.
+    """
+
+    def __init__(self, memoria_maxima_mb=256):
+        self.memoria_maxima = memoria_maxima_mb * 1024 ** 2
+        self.memoria = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+        self.jerarquias = OrderedDict()
+        self.indices = {}
+        self.bloqueo = threading.Lock()
+        self.bloqueos_carga = {}
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def configurar(self, configuracion_global):
+        """Ajusta la memoria máxima del registro al parámetro :obj:`memoria_maxima_jerarquias_mb` de la
+        configuración global.
+
+        Args:
+            configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se
+                realicen.
+        """
+        with self.bloqueo:
+            self.memoria_maxima = configuracion_global['memoria_maxima_jerarquias_mb'] * 1024 ** 2
+            self.expulsar()
+
+    def obtener(self, clave, cargar):
+        """Devuelve la jerarquia registrada bajo la clave o la carga y la registra si no se encuentra. Si varios
+        hilos piden a la vez una jerarquia que no está registrada solo uno de ellos la carga.
+
+        Args:
+            clave (:class:`Cadena de Texto` o :class:`Tupla`): Identificador de la jerarquia.
+            cargar (:class:`Función`): Función sin argumentos que devuelve el cuadro de datos de la jerarquia.
+
+        Returns:
+            datos (:class:`pandas:pandas.DataFrame`): La jerarquia en un cuadro de datos compartido.
+        """
+        with self.bloqueo:
+            bloqueo_carga = self.bloqueos_carga.setdefault(clave, threading.Lock())
+
+        with bloqueo_carga:
+            with self.bloqueo:
+                if clave in self.jerarquias:
+                    self.aciertos += 1
+                    self.jerarquias.move_to_end(clave)
+                    return self.jerarquias[clave][0]
+                self.fallos += 1
+
+            datos = cargar()
+            if datos is None:
+                return datos
+
+            with self.bloqueo:
+                memoria = int(datos.memory_usage(index=True, deep=True).sum())
+                self.jerarquias[clave] = (datos, memoria)
+                self.memoria += memoria
+                self.expulsar()
+        return datos
+
+    def obtener_indice(self, clave, datos, origen='COD', destino='ID'):
+        """Devuelve el índice de códigos de una jerarquia, construyéndolo la primera vez que se pide mientras la
+        jerarquia siga registrada.
+
+        Args:
+            clave (:class:`Cadena de Texto` o :class:`Tupla`): Identificador de la jerarquia.
+            datos (:class:`pandas:pandas.DataFrame`): La jerarquia, usada si no está registrada.
+            origen (:class:`Cadena de Texto`): Columna con los códigos a traducir.
+            destino (:class:`Cadena de Texto`): Columna con los códigos traducidos.
+
+        Returns:
+            indice (:class:`src.indices.IndiceCodigos`): Índice de la jerarquia.
+        """
+        clave_indice = (clave, origen, destino)
+        with self.bloqueo:
+            if clave_indice in self.indices:
+                return self.indices[clave_indice]
+
+        indice = IndiceCodigos(datos, origen, destino)
+        with self.bloqueo:
+            if clave in self.jerarquias and self.jerarquias[clave][0] is datos:
+                self.indices[clave_indice] = indice
+                self.memoria += indice.memoria
+                self.expulsar()
+        return indice
+
+    def expulsar(self):
+        """Descarta las jerarquias usadas hace más tiempo hasta que la memoria ocupada no supera
+        :attr:`~.memoria_maxima`, conservando siempre la última registrada.
+        """
+        while self.memoria > self.memoria_maxima and len(self.jerarquias) > 1:
+            clave, (_, memoria) = self.jerarquias.popitem(last=False)
+            self.memoria -= memoria
+            for clave_indice in [clave_indice for clave_indice in self.indices if clave_indice[0] == clave]:
+                self.memoria -= self.indices.pop(clave_indice).memoria
+            self.expulsiones += 1
+            self.logger.info('Jerarquia descartada del registro: %s', clave)
+
+    def estadisticas(self):
+        """Resumen del uso del registro.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Aciertos, fallos, expulsiones, número de jerarquias y memoria
+            ocupada en MB.
+        """
+        with self.bloqueo:
+            return {'aciertos': self.aciertos, 'fallos': self.fallos, 'expulsiones': self.expulsiones,
+                    'jerarquias': len(self.jerarquias), 'memoria_mb': round(self.memoria / 1024 ** 2, 2)}
+
+    def vaciar(self):
+        """Descarta todas las jerarquias y reinicia los contadores.
+        """
+        with self.bloqueo:
+            self.jerarquias.clear()
+            self.indices.clear()
+            self.bloqueos_carga.clear()
+            self.memoria = 0
+            self.aciertos = 0
+            self.fallos = 0
+            self.expulsiones = 0
+
+
+registro_jerarquias = RegistroJerarquias()
@@ -0,0 +1,194 @@
+import io
+import logging
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from src.ieca.concurrencia import bloqueo_mapas, guardar_csv_atomico
+from src.ieca.indices import IndiceCodigos
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+COLUMNAS_MAPA = ['SOURCE', 'COD', 'NAME', 'TARGET']
+
+
+def version_fichero(fichero):
+    """Identifica el contenido de un fichero por su fecha de modificación y su tamaño.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero.
+
+    Returns:
+        version (:class:`Tupla`): Fecha de modificación en nanosegundos y tamaño, :obj:`None` si no existe.
+     """
+    try:
+        estado = os.stat(fichero)
+    except FileNotFoundError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+class RepositorioMapas:
+    """Repositorio común a todo el proceso con los mapas de dimensiones del directorio
+    :obj:`directorio_mapas_dimensiones` ya cargados, de forma que cada mapa se lee una única vez y todas las
+    consultas comparten sus índices **SOURCE** -> **TARGET**.
+
+    Las extensiones de los mapas se acumulan en memoria y se escriben con :meth:`~.guardar` al terminar la
+    actividad. Los mapas sin extensiones pendientes se vuelven a leer si su fichero cambia. Si al guardar un mapa
+    su fichero ha cambiado desde que se leyó, porque otra actividad en paralelo lo ha extendido, se conservan sus
+    filas y se añaden a continuación los términos nuevos, en lugar de sobrescribirlas.
+
+    Los cuadros de datos devueltos son compartidos y deben tratarse como de solo lectura. Las extensiones deben
+    hacerse bajo :attr:`~.bloqueo` para que ningún otro hilo extienda el mismo mapa a la vez.
+
+    Attributes:
+        bloqueo (:class:`threading.RLock`): Bloqueo del repositorio.
+        lecturas (:class:`Entero`): Número de mapas leídos de disco.
+        escrituras (:class:`Entero`): Número de mapas escritos en disco.
+    """
+
+    def __init__(self):
+        self.mapas = {}
+        self.lecturas = 0
+        self.escrituras = 0
+        self.bloqueo = threading.RLock()
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def cargar(self, fichero):
+        """Devuelve el mapa registrado para el fichero, leyéndolo si no está registrado o si ha cambiado en disco
+        y no tiene extensiones pendientes.
+
+        Args:
+            fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension.
+
+        Returns:
+            mapa (:class:`Diccionario`): Datos, versión del fichero leído, extensiones pendientes e índices.
+        """
+        clave = os.path.abspath(fichero)
+        version = version_fichero(clave)
+        mapa = self.mapas.get(clave)
+        if mapa is None or (not mapa['modificado'] and mapa['version'] != version):
+            if version is None:
+                datos = pd.DataFrame(columns=COLUMNAS_MAPA, dtype='string')
+            else:
+                datos = pd.read_csv(clave, dtype='string')
+                self.lecturas += 1
+            mapa = {'datos': datos, 'version': version, 'modificado': False, 'indices': {}}
+            self.mapas[clave] = mapa
+        return mapa
+
+    def obtener(self, fichero):
+        """Devuelve el contenido de un mapa de dimension, vacío si todavía no existe.
+
+        Args:
+            fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension.
+
+        Returns:
+            datos (:class:`pandas:pandas.DataFrame`): El mapa en un cuadro de datos compartido.
+        """
+        with self.bloqueo:
+            return self.cargar(fichero)['datos']
+
+    def indice(self, fichero, origen='SOURCE', destino='TARGET'):
+        """Devuelve el índice de un mapa de dimension, construyéndolo la primera vez que se pide.
+
+        Args:
+            fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension.
+            origen (:class:`Cadena de Texto`): Columna con los códigos a traducir.
+            destino (:class:`Cadena de Texto`): Columna con los códigos traducidos.
+
+        Returns:
+            indice (:class:`src.indices.IndiceCodigos`): Índice del mapa.
+        """
+        with self.bloqueo:
+            mapa = self.cargar(fichero)
+            if mapa['version'] is None and not mapa['modificado']:
+                raise FileNotFoundError(f'No existe el mapa de dimension {fichero}')
+            if (origen, destino) not in mapa['indices']:
+                mapa['indices'][(origen, destino)] = IndiceCodigos(mapa['datos'], origen, destino)
+            return mapa['indices'][(origen, destino)]
+
+    def actualizar(self, fichero, datos):
+        """Sustituye en memoria el contenido de un mapa de dimension, que se escribirá con :meth:`~.guardar`.
+        El contenido se normaliza como si se hubiera escrito y leído del .CSV, de forma que las consultas
+        siguientes lo ven igual que si se leyera del fichero.
+
+        Args:
+            fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension.
+            datos (:class:`pandas:pandas.DataFrame`): Nuevo contenido del mapa.
+        """
+        datos = pd.read_csv(io.StringIO(datos.to_csv(index=False)), dtype='string')
+        with self.bloqueo:
+            mapa = self.cargar(fichero)
+            mapa.update(datos=datos, modificado=True, indices={})
+
+    def guardar(self):
+        """Escribe en disco los mapas con extensiones pendientes bajo el bloqueo de los mapas de dimensiones,
+        común a todos los procesos de la ejecución. Si otro proceso ha cambiado el mapa en disco desde que se leyó,
+        se combinan ambos con :func:`combinar_mapas`.
+
+        Returns:
+            guardados (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los mapas escritos.
+        """
+        guardados = []
+        with bloqueo_mapas(), self.bloqueo:
+            for clave, mapa in self.mapas.items():
+                if not mapa['modificado']:
+                    continue
+                datos = mapa['datos']
+                if version_fichero(clave) not in (mapa['version'], None):
+                    datos = combinar_mapas(pd.read_csv(clave, dtype='string'), datos)
+                    self.logger.warning('El mapa %s ha cambiado en disco, se combina con las extensiones en memoria',
+                                        clave)
+
+                os.makedirs(os.path.dirname(clave), exist_ok=True)
+                guardar_csv_atomico(datos, clave, index=False)
+                mapa.update(datos=datos, version=version_fichero(clave), modificado=False, indices={})
+                self.escrituras += 1
+                guardados.append(clave)
+        return guardados
+
+    def estadisticas(self):
+        """Resumen del uso del repositorio.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Mapas registrados, leídos de disco y escritos en disco.
+        """
+        with self.bloqueo:
+            return {'mapas': len(self.mapas), 'lecturas': self.lecturas, 'escrituras': self.escrituras}
+
+    def vaciar(self):
+        """Descarta todos los mapas registrados, incluidas sus extensiones pendientes, y reinicia los contadores.
+        """
+        with self.bloqueo:
+            self.mapas.clear()
+            self.lecturas = 0
+            self.escrituras = 0
+
+
+def combinar_mapas(disco, memoria):
+    """Combina por **SOURCE** un mapa de dimension cambiado en disco con su versión extendida en memoria. Se
+    conservan las filas y el **TARGET** del disco, con los **COD** y **NAME** no vacíos de memoria, y se añaden
+    al final los términos que solo están en memoria.
+
+    Args:
+        disco (:class:`pandas:pandas.DataFrame`): Mapa leído del disco.
+        memoria (:class:`pandas:pandas.DataFrame`): Mapa en memoria.
+
+    Returns:
+        datos (:class:`pandas:pandas.DataFrame`): El mapa combinado.
+    """
+    por_source = memoria.drop_duplicates('SOURCE').set_index('SOURCE')
+    disco = disco.copy()
+    for columna in ('COD', 'NAME'):
+        valores = disco['SOURCE'].map(por_source[columna])
+        disco[columna] = valores.where(valores.notna() & (valores != ''), disco[columna])
+    nuevos = memoria[~memoria['SOURCE'].isin(disco['SOURCE'])]
+    return pd.concat([disco, nuevos], ignore_index=True)
+
+
+repositorio_mapas = RepositorioMapas()
@@ -0,0 +1,426 @@
+import contextlib
+import csv
+import datetime
+import logging
+import os
+import re
+import sys
+from xml.sax.saxutils import XMLGenerator
+
+import numpy as np
+import pandas as pd
+
+from src.ieca.almacen_metadatos import almacen_metadatos
+from src.ieca.formatos import FILAS_BLOQUE_ESCRITURA, leer_tabla_por_bloques
+from src.ieca.repositorio_mapas import repositorio_mapas
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+ESPACIOS_NOMBRES = {'xmlns:mes': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/message',
+                    'xmlns:str': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure',
+                    'xmlns:com': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common'}
+PATRON_URN = re.compile(r'urn:sdmx:org\.sdmx\.infomodel\.(?P<paquete>\w+)\.(?P<clase>\w+)='
+                        r'(?P<agencia>[^:]+):(?P<id>[^(]+)\((?P<version>[^)]+)\)(?:\.(?P<elemento>.+))?')
+
+# Roles de los componentes según el tipo de conceptos_codelist.yaml
+ROLES = {'time': 'TimeDimension', 'primary': 'PrimaryMeasure', 'atributo': 'Attribute'}
+CODIGO_NO_APLICABLE = ('_Z', 'No aplicable', None)
+
+
+def referencia_urn(urn):
+    """Descompone una URN de SDMX en los atributos de un elemento **Ref**.
+
+    Args:
+        urn (:class:`Cadena de Texto`): URN de un artefacto o de un elemento de un esquema.
+
+    Returns:
+        referencia (:class:`Diccionario`): Atributos de la referencia.
+    """
+    partes = PATRON_URN.fullmatch(urn)
+    if partes is None:
+        raise ValueError(f'URN no válida: {urn}')
+    if partes['elemento'] is None:
+        return {'id': partes['id'], 'version': partes['version'], 'agencyID': partes['agencia'],
+                'package': partes['paquete'], 'class': partes['clase']}
+    return {'id': partes['elemento'], 'maintainableParentID': partes['id'],
+            'maintainableParentVersion': partes['version'], 'agencyID': partes['agencia'],
+            'package': partes['paquete'], 'class': partes['clase']}
+
+
+def componentes_estructura(variables, actividad, agencia, version):
+    """Define los componentes de la estructura de datos (DSD) de una actividad a partir de sus variables y de
+    :data:`src.ieca.almacen_metadatos.almacen_metadatos`.
+
+    Cada componente se identifica por su concepto si está definido y, si no, por el nombre de la variable, cuyo
+    concepto se añade al esquema de conceptos propio de la actividad. Las variables sin definir en
+    **conceptos_codelist.yaml** son dimensiones con la lista de códigos **CL_<variable>** de la agencia.
+
+    Args:
+        variables (:obj:`Lista` de :class:`Cadena de Texto`): Variables de la actividad.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+        agencia (:class:`Cadena de Texto`): Agencia de los artefactos propios.
+        version (:class:`Cadena de Texto`): Versión de los artefactos propios.
+
+    Returns:
+        componentes (:obj:`Lista` de :class:`Diccionario`): Variable, ID, rol, nombre, referencia del concepto y
+        referencia de la lista de códigos de cada componente, con las dimensiones primero y la temporal al final.
+    """
+    componentes, ids = [], set()
+    for variable in variables:
+        concepto = almacen_metadatos.concepto(variable) or {}
+        rol = ROLES.get((concepto.get('tipo') or '').lower(), 'Dimension')
+        id_componente = concepto.get('concepto') or variable
+        if id_componente in ids:
+            id_componente = variable
+        ids.add(id_componente)
+
+        if concepto.get('urn_concepto'):
+            referencia_concepto = referencia_urn(concepto['urn_concepto'])
+        else:
+            referencia_concepto = {'id': id_componente, 'maintainableParentID': f'CS_{actividad}',
+                                   'maintainableParentVersion': version, 'agencyID': agencia,
+                                   'package': 'conceptscheme', 'class': 'Concept'}
+        if concepto.get('urn_codelist'):
+            referencia_codelist = referencia_urn(concepto['urn_codelist'])
+        elif rol == 'Dimension' and not concepto:
+            referencia_codelist = {'id': f'CL_{variable}', 'version': version, 'agencyID': agencia,
+                                   'package': 'codelist', 'class': 'Codelist'}
+        else:
+            referencia_codelist = None
+        componentes.append({'variable': variable, 'id': id_componente, 'rol': rol,
+                            'nombre': concepto.get('descripcion') or variable, 'concepto': referencia_concepto,
+                            'codelist': referencia_codelist})
+    orden = {'Dimension': 0, 'TimeDimension': 1, 'PrimaryMeasure': 2, 'Attribute': 3}
+    return sorted(componentes, key=lambda componente: orden[componente['rol']])
+
+
+def codigos_jerarquias(ficheros, indice=None, filas_bloque=FILAS_BLOQUE_ESCRITURA):
+    """Recorre por bloques las listas de códigos de las jerarquias de una dimension, sin repetir códigos.
+
+    Si la dimension se mapea, los IDs y los padres se traducen con el índice de su mapa de dimension, de forma que
+    la lista de códigos usa los mismos códigos que los datos. Los IDs sin traducción se omiten.
+
+    Args:
+        ficheros (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de las jerarquias, con o sin extensión.
+        indice (:class:`src.ieca.indices.IndiceCodigos`, opcional): Índice **SOURCE** -> **TARGET** del mapa de
+            dimension.
+        filas_bloque (:class:`Entero`): Filas que se leen cada vez.
+
+    Returns:
+        codigos (:class:`Iterador` de :class:`Tupla`): ID, nombre y padre de cada código. El padre solo se indica si
+        es un código anterior de la lista.
+    """
+    vistos = set()
+    for fichero in ficheros:
+        for bloque in leer_tabla_por_bloques(fichero, filas_bloque):
+            nombres = bloque['DESCRIPTION'].fillna(bloque['NAME'])
+            ids, padres = bloque['ID'], bloque['PARENTCODE']
+            if indice is not None:
+                ids = indice.traducir(ids.astype(object))
+                padres = indice.traducir(padres.astype(object))
+            for id_codigo, nombre, padre in zip(ids, nombres, padres):
+                if pd.isna(id_codigo) or id_codigo == '' or id_codigo in vistos:
+                    continue
+                vistos.add(id_codigo)
+                yield id_codigo, '' if pd.isna(nombre) else nombre, padre if padre in vistos else None
+
+
+def mapa_dimension(variable, configuracion_global):
+    """Mapa de dimension con el que :meth:`src.ieca.datos.Datos.mapear_valores` traduce los datos de una variable.
+    Los datos se mapean antes de que :meth:`src.ieca.datos.Datos.mapear_columnas` quite los prefijos y sufijos de
+    las jerarquias, por lo que primero se busca el mapa **D_<variable>_0** y después el de la propia variable.
+
+    Args:
+        variable (:class:`Cadena de Texto`): Variable de la actividad.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+
+    Returns:
+        fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension, :obj:`None` si la variable no se mapea.
+    """
+    for dimension in ('D_' + variable + '_0', variable):
+        if dimension not in configuracion_global['dimensiones_a_mapear']:
+            continue
+        fichero = os.path.join(configuracion_global['directorio_mapas_dimensiones'], dimension)
+        if not repositorio_mapas.obtener(fichero).empty:
+            return fichero
+    return None
+
+
+def codigos_mapa(fichero):
+    """Recorre los códigos SDMX de un mapa de dimension, nombrando cada uno con el primer término que lo usa.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del mapa de dimension.
+
+    Returns:
+        codigos (:class:`Iterador` de :class:`Tupla`): ID, nombre y padre, siempre :obj:`None`, de cada código.
+    """
+    datos = repositorio_mapas.obtener(fichero).dropna(subset=['TARGET']).drop_duplicates('TARGET')
+    for id_codigo, nombre in zip(datos['TARGET'], datos['SOURCE']):
+        yield id_codigo, '' if pd.isna(nombre) else nombre, None
+
+
+def con_codigo_no_aplicable(codigos):
+    """Añade al final de una lista de códigos el código **_Z**, con el que se rellenan las dimensiones que no
+    tiene un grupo de consultas en los datos con extensión de disjuntos, si no lo incluye ya."""
+    vistos = set()
+    for codigo in codigos:
+        vistos.add(codigo[0])
+        yield codigo
+    if CODIGO_NO_APLICABLE[0] not in vistos:
+        yield CODIGO_NO_APLICABLE
+
+
+class EscritorEstructuras:
+    """Escribe un mensaje de estructuras SDMX-ML 2.1 elemento a elemento, de forma que las listas de códigos se
+    vuelcan al fichero a medida que se leen, sin construir el documento en memoria.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero XML.
+        id_mensaje (:class:`Cadena de Texto`): ID del mensaje.
+        agencia (:class:`Cadena de Texto`): Agencia que envía el mensaje.
+    """
+
+    def __init__(self, fichero, id_mensaje, agencia):
+        self.destino = open(fichero, 'w', encoding='utf-8')
+        self.xml = XMLGenerator(self.destino, encoding='utf-8', short_empty_elements=True)
+        self.xml.startDocument()
+        self.xml.startElement('mes:Structure', ESPACIOS_NOMBRES)
+        with self.elemento('mes:Header'):
+            self.texto('mes:ID', id_mensaje)
+            self.texto('mes:Test', 'false')
+            self.texto('mes:Prepared', datetime.datetime.now().replace(microsecond=0).isoformat())
+            self.vacio('mes:Sender', {'id': agencia})
+        self.xml.startElement('mes:Structures', {})
+
+    @contextlib.contextmanager
+    def elemento(self, nombre, atributos=None):
+        self.xml.startElement(nombre, atributos or {})
+        yield
+        self.xml.endElement(nombre)
+
+    def vacio(self, nombre, atributos=None):
+        self.xml.startElement(nombre, atributos or {})
+        self.xml.endElement(nombre)
+
+    def texto(self, nombre, texto, atributos=None):
+        self.xml.startElement(nombre, atributos or {})
+        self.xml.characters(str(texto))
+        self.xml.endElement(nombre)
+
+    def nombres(self, nombre, nombre_en=None):
+        """Escribe el nombre de un artefacto en español y, si se conoce, en inglés."""
+        self.texto('com:Name', nombre, {'xml:lang': 'es'})
+        if nombre_en:
+            self.texto('com:Name', nombre_en, {'xml:lang': 'en'})
+
+    def referencia(self, nombre, referencia):
+        with self.elemento(nombre):
+            self.vacio('Ref', referencia)
+
+    def lista_codigos(self, referencia, nombre, codigos):
+        """Escribe una lista de códigos.
+
+        Args:
+            referencia (:class:`Diccionario`): Referencia de la lista de códigos.
+            nombre (:class:`Cadena de Texto`): Nombre de la lista de códigos.
+            codigos (:class:`Iterador` de :class:`Tupla`): ID, nombre y padre de cada código.
+
+        Returns:
+            codigos (:class:`Entero`): Número de códigos escritos.
+        """
+        escritos = 0
+        with self.elemento('str:Codelist', {'id': referencia['id'], 'agencyID': referencia['agencyID'],
+                                            'version': referencia['version'], 'isFinal': 'false'}):
+            self.nombres(nombre, almacen_metadatos.traducir(nombre))
+            for id_codigo, nombre_codigo, padre in codigos:
+                with self.elemento('str:Code', {'id': id_codigo}):
+                    self.nombres(nombre_codigo or id_codigo, almacen_metadatos.traducir(nombre_codigo))
+                    if padre is not None:
+                        self.referencia('str:Parent', {'id': padre})
+                escritos += 1
+        return escritos
+
+    def cerrar(self):
+        self.xml.endElement('mes:Structures')
+        self.xml.endElement('mes:Structure')
+        self.xml.endDocument()
+        self.destino.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+def generar_estructuras(fichero, configuracion_sdmx, componentes, jerarquias, configuracion_global, actividad):
+    """Genera el mensaje SDMX-ML 2.1 con las estructuras de una actividad: un flujo de datos por grupo de
+    consultas, las listas de códigos propias de sus dimensiones, el esquema de conceptos de la actividad y su
+    estructura de datos común.
+
+    Las listas de códigos se construyen con las jerarquias originales de la dimension o, si no tiene, con su mapa
+    de dimension, y terminan con el código **_Z**. Si la dimension se mapea, los códigos de las jerarquias se
+    traducen con su mapa, igual que los datos. Las listas de códigos de otras agencias solo se referencian.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del fichero XML.
+        configuracion_sdmx (:class:`Diccionario`): Configuración de la actividad generada por
+            :meth:`src.ieca.actividad.Actividad.agrupar_consultas_SDMX`.
+        componentes (:obj:`Lista` de :class:`Diccionario`): Componentes de :func:`componentes_estructura`.
+        jerarquias (:class:`Diccionario`): Rutas de las jerarquias originales de cada variable.
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        actividad (:class:`Cadena de Texto`): Nombre de la actividad.
+
+    Returns:
+        codigos (:class:`Diccionario`): Número de códigos de cada lista de códigos generada.
+    """
+    logger = logging.getLogger(f'SDMX [{actividad}]')
+    agencia = configuracion_global['sdmx']['agencia']
+    version = configuracion_global['sdmx']['version']
+    referencia_dsd = {'id': configuracion_sdmx['NOMBRE_DSD'], 'version': version, 'agencyID': agencia,
+                      'package': 'datastructure', 'class': 'DataStructure'}
+    propios = [componente for componente in componentes if componente['concepto']['agencyID'] == agencia and
+               componente['concepto']['maintainableParentID'] == f'CS_{actividad}']
+    codigos = {}
+
+    with EscritorEstructuras(fichero, f'{agencia}_{actividad}', agencia) as escritor:
+        with escritor.elemento('str:Dataflows'):
+            for grupo, informacion_grupo in configuracion_sdmx['grupos_consultas'].items():
+                with escritor.elemento('str:Dataflow', {'id': f"DF_{actividad}_{informacion_grupo['id']}",
+                                                        'agencyID': agencia, 'version': version,
+                                                        'isFinal': 'false'}):
+                    escritor.nombres(grupo, informacion_grupo.get('nombre_en'))
+                    escritor.referencia('str:Structure', referencia_dsd)
+
+        generadas = [componente for componente in componentes if componente['codelist'] is not None and
+                     componente['codelist']['agencyID'] == agencia]
+        if generadas:
+            with escritor.elemento('str:Codelists'):
+                for componente in generadas:
+                    referencia = componente['codelist']
+                    if referencia['id'] in codigos:
+                        continue
+                    fichero_mapa = mapa_dimension(componente['variable'], configuracion_global)
+                    if jerarquias.get(componente['variable']):
+                        indice = repositorio_mapas.indice(fichero_mapa) if fichero_mapa else None
+                        fuente = codigos_jerarquias(jerarquias[componente['variable']], indice)
+                    elif fichero_mapa:
+                        fuente = codigos_mapa(fichero_mapa)
+                    else:
+                        logger.warning('No hay jerarquias ni mapa para la lista de códigos %s', referencia['id'])
+                        fuente = iter(())
+                    codigos[referencia['id']] = escritor.lista_codigos(referencia, componente['nombre'],
+                                                                       con_codigo_no_aplicable(fuente))
+
+        if propios:
+            with escritor.elemento('str:Concepts'), \
+                    escritor.elemento('str:ConceptScheme', {'id': f'CS_{actividad}', 'agencyID': agencia,
+                                                            'version': version, 'isFinal': 'false'}):
+                escritor.nombres(f'Conceptos {actividad}')
+                for componente in propios:
+                    with escritor.elemento('str:Concept', {'id': componente['id']}):
+                        escritor.nombres(componente['nombre'], almacen_metadatos.traducir(componente['nombre']))
+
+        with escritor.elemento('str:DataStructures'), \
+                escritor.elemento('str:DataStructure', {'id': referencia_dsd['id'], 'agencyID': agencia,
+                                                        'version': version, 'isFinal': 'false'}):
+            escritor.nombres(referencia_dsd['id'])
+            with escritor.elemento('str:DataStructureComponents'):
+                escribir_componentes(escritor, componentes)
+
+    logger.info('Estructuras SDMX-ML generadas: %s', fichero)
+    return codigos
+
+
+def escribir_componentes(escritor, componentes):
+    """Escribe las listas de dimensiones, atributos y medidas de una estructura de datos."""
+    def representacion(componente):
+        if componente['codelist'] is not None:
+            with escritor.elemento('str:LocalRepresentation'):
+                escritor.referencia('str:Enumeration', componente['codelist'])
+        elif componente['rol'] == 'TimeDimension':
+            with escritor.elemento('str:LocalRepresentation'):
+                escritor.vacio('str:TextFormat', {'textType': 'ObservationalTimePeriod'})
+
+    roles = [componente['rol'] for componente in componentes]
+    with escritor.elemento('str:DimensionList', {'id': 'DimensionDescriptor'}):
+        for posicion, componente in enumerate(componentes, start=1):
+            if componente['rol'] not in ('Dimension', 'TimeDimension'):
+                continue
+            nombre = 'str:TimeDimension' if componente['rol'] == 'TimeDimension' else 'str:Dimension'
+            with escritor.elemento(nombre, {'id': componente['id'], 'position': str(posicion)}):
+                escritor.referencia('str:ConceptIdentity', componente['concepto'])
+                representacion(componente)
+
+    medida = next((componente for componente in componentes if componente['rol'] == 'PrimaryMeasure'), None)
+    if 'Attribute' in roles:
+        with escritor.elemento('str:AttributeList', {'id': 'AttributeDescriptor'}):
+            for componente in componentes:
+                if componente['rol'] != 'Attribute':
+                    continue
+                with escritor.elemento('str:Attribute', {'id': componente['id'], 'assignmentStatus': 'Conditional'}):
+                    escritor.referencia('str:ConceptIdentity', componente['concepto'])
+                    representacion(componente)
+                    with escritor.elemento('str:AttributeRelationship'):
+                        if medida is not None:
+                            escritor.referencia('str:PrimaryMeasure', {'id': medida['id']})
+                        else:
+                            escritor.vacio('str:None')
+    if medida is not None:
+        with escritor.elemento('str:MeasureList', {'id': 'MeasureDescriptor'}), \
+                escritor.elemento('str:PrimaryMeasure', {'id': medida['id']}):
+            escritor.referencia('str:ConceptIdentity', medida['concepto'])
+
+
+def escribir_sdmx_csv(origen, fichero, dataflow, componentes, filas_bloque=FILAS_BLOQUE_ESCRITURA):
+    """Convierte por bloques una tabla de datos agrupados a SDMX-CSV: separado por comas, con el flujo de datos en
+    la primera columna y las columnas renombradas a los IDs de los componentes. Los códigos vacíos de las
+    dimensiones, que no han podido traducirse, se sustituyen por **_Z**, con el que terminan las listas de códigos
+    generadas. Como los códigos sin traducir de los datos toman el de su padre, varias observaciones pueden acabar
+    con la misma clave de serie y periodo, de las que solo se escribe la primera.
+
+    Args:
+        origen (:class:`Cadena de Texto`): Ruta de la tabla, con o sin extensión.
+        fichero (:class:`Cadena de Texto`): Ruta del fichero SDMX-CSV.
+        dataflow (:class:`Cadena de Texto`): Flujo de datos como **AGENCIA:ID(VERSION)**.
+        componentes (:obj:`Lista` de :class:`Diccionario`): Componentes de :func:`componentes_estructura`.
+        filas_bloque (:class:`Entero`): Filas que se leen y escriben cada vez.
+
+    Returns:
+        filas (:class:`Entero`): Filas escritas.
+    """
+    columnas = {componente['variable']: componente['id'] for componente in componentes}
+    dimensiones = [componente['id'] for componente in componentes if componente['rol'] == 'Dimension']
+    claves = [componente['id'] for componente in componentes if componente['rol'] in ('Dimension', 'TimeDimension')]
+    filas = duplicadas = 0
+    sin_codigo = dict.fromkeys(dimensiones, 0)
+    # Resumen de las claves ya escritas, de forma que los duplicados se detectan entre bloques
+    escritas = np.empty(0, dtype=np.uint64)
+    with open(fichero, 'w', encoding='utf-8', newline='') as destino:
+        escritor = csv.writer(destino)
+        escritor.writerow(['DATAFLOW'] + list(columnas.values()))
+        for bloque in leer_tabla_por_bloques(origen, filas_bloque):
+            bloque = bloque.reindex(columns=list(columnas)).rename(columns=columnas)
+            for dimension in dimensiones:
+                vacios = bloque[dimension].isna() | (bloque[dimension] == '')
+                if vacios.any():
+                    sin_codigo[dimension] += int(vacios.sum())
+                    bloque[dimension] = bloque[dimension].mask(vacios, '_Z')
+            resumenes = pd.util.hash_pandas_object(bloque[claves], index=False).to_numpy()
+            repetidas = pd.Series(resumenes).duplicated().to_numpy() | np.isin(resumenes, escritas)
+            if repetidas.any():
+                duplicadas += int(repetidas.sum())
+                bloque, resumenes = bloque[~repetidas], resumenes[~repetidas]
+            escritas = np.union1d(escritas, resumenes)
+            bloque.insert(0, 'DATAFLOW', dataflow)
+            bloque.to_csv(destino, index=False, header=False)
+            filas += len(bloque)
+    logger = logging.getLogger('SDMX')
+    sin_codigo = {dimension: numero for dimension, numero in sin_codigo.items() if numero}
+    if sin_codigo:
+        logger.warning('%s: códigos sin traducir sustituidos por _Z: %s', dataflow, sin_codigo)
+    if duplicadas:
+        logger.warning('%s: %s observaciones con la clave de otra ya escrita descartadas', dataflow, duplicadas)
+    return filas
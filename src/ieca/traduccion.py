@@ -0,0 +1,256 @@
+import collections.abc
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from src.ieca.almacen_metadatos import leer_yaml_compilado
+
+try:
+    import deepl
+except ImportError:  # Solo necesario para traducir con DeepL
+    deepl = None
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+IDIOMA_BASE = 'es'
+CLAVES_TRADUCIBLES = ['label', 'title']
+
+
+class TraductorDeepL:
+    """Traductor que envía los textos a la API de DeepL en una única petición por lote.
+
+    Args:
+        clave (:class:`Cadena de Texto`): Clave de autenticación de la API de DeepL.
+    """
+
+    def __init__(self, clave):
+        if deepl is None:
+            raise ImportError('El traductor deepl necesita el paquete deepl')
+        self.traductor = deepl.Translator(clave)
+
+    def traducir(self, textos, origen, destino):
+        """Traduce una lista de textos.
+
+        Args:
+            textos (:obj:`Lista` de :class:`Cadena de Texto`): Textos a traducir.
+            origen (:class:`Cadena de Texto`): Idioma de los textos.
+            destino (:class:`Cadena de Texto`): Idioma de la traducción.
+
+        Returns:
+            traducciones (:obj:`Lista` de :class:`Cadena de Texto`): Traducción de cada texto, en el mismo orden.
+        """
+        # DeepL distingue variantes del inglés solo en el idioma destino
+        destino = 'EN-GB' if destino.upper() == 'EN' else destino.upper()
+        resultados = self.traductor.translate_text(textos, source_lang=origen.upper(), target_lang=destino)
+        return [resultado.text for resultado in resultados]
+
+
+TRADUCTORES = {'deepl': TraductorDeepL}
+
+
+def crear_traductor(configuracion_global):
+    """Crea el traductor indicado en :obj:`traductor` de la sección :obj:`traduccion` de la configuración global.
+    Su clave se lee de la variable de entorno :obj:`variable_clave`, nunca de la configuración.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+
+    Returns:
+        traductor: Objeto con el método ``traducir(textos, origen, destino)``.
+    """
+    configuracion = configuracion_global['traduccion']
+    if configuracion['traductor'] not in TRADUCTORES:
+        raise ValueError(f"Traductor no soportado: {configuracion['traductor']}, se admiten {list(TRADUCTORES)}")
+    clave = os.environ.get(configuracion['variable_clave'])
+    if not clave:
+        raise KeyError(f"La variable de entorno {configuracion['variable_clave']} no tiene la clave del traductor")
+    return TRADUCTORES[configuracion['traductor']](clave)
+
+
+class ServicioTraduccion:
+    """Traduce textos consultando primero las traducciones ya conocidas del fichero :obj:`fichero` de la sección
+    :obj:`traduccion` de la configuración global, de forma que solo se envían al traductor los textos que no
+    están en él. Los textos se deduplican y los pendientes se envían en lotes de :obj:`tamano_lote` textos
+    repartidos entre :obj:`trabajadores` hilos.
+
+    El fichero guarda cada texto bajo su versión en :data:`IDIOMA_BASE` con sus traducciones por idioma, por lo
+    que sirve para traducir en ambos sentidos. Se lee con :func:`src.ieca.almacen_metadatos.leer_yaml_compilado`
+    y las traducciones nuevas se añaden en memoria y se escriben con :meth:`~.guardar`.
+
+    Args:
+        configuracion_global (:class:`Diccionario`): Configuración común a todas las ejecuciones que se realicen.
+        traductor (opcional): Objeto con el método ``traducir(textos, origen, destino)``. Por defecto el de
+            :func:`crear_traductor`, que solo se crea si hay textos que no están en el fichero.
+
+    Attributes:
+        traducciones (:class:`Diccionario`): Traducciones por idioma de cada texto en :data:`IDIOMA_BASE`.
+        aciertos (:class:`Entero`): Textos encontrados en el fichero.
+        fallos (:class:`Entero`): Textos enviados al traductor.
+        lotes (:class:`Entero`): Peticiones realizadas al traductor.
+    """
+
+    def __init__(self, configuracion_global, traductor=None):
+        configuracion = configuracion_global['traduccion']
+        self.configuracion_global = configuracion_global
+        self.fichero = configuracion['fichero']
+        self.tamano_lote = configuracion['tamano_lote']
+        self.trabajadores = configuracion['trabajadores']
+        self.traductor = traductor
+
+        self.traducciones = leer_yaml_compilado(self.fichero)[0] or {}
+        self.modificado = False
+        self.aciertos = 0
+        self.fallos = 0
+        self.lotes = 0
+        self.bloqueo = threading.Lock()
+
+        self.logger = logging.getLogger(f'{self.__class__.__name__}')
+
+    def indice(self, origen, destino):
+        """Traducciones conocidas de un idioma a otro.
+
+        Returns:
+            indice (:class:`Diccionario`): Traducción de cada texto en el idioma de origen.
+        """
+        return {par[origen]: par[destino] for par in self.traducciones.values() if origen in par and destino in par}
+
+    def traducir(self, textos, origen=IDIOMA_BASE, destino='en'):
+        """Traduce una colección de textos, repetidos o no.
+
+        Args:
+            textos (:class:`Iterable` de :class:`Cadena de Texto`): Textos a traducir.
+            origen (:class:`Cadena de Texto`): Idioma de los textos.
+            destino (:class:`Cadena de Texto`): Idioma de la traducción.
+
+        Returns:
+            traducciones (:class:`Diccionario`): Traducción de cada texto distinto.
+        """
+        unicos = list(dict.fromkeys(textos))
+        indice = self.indice(origen, destino)
+        pendientes = [texto for texto in unicos if texto not in indice]
+        self.aciertos += len(unicos) - len(pendientes)
+        self.fallos += len(pendientes)
+        if pendientes:
+            self.logger.info('Traduciendo %s textos de %s a %s, %s ya conocidos', len(pendientes), origen, destino,
+                             len(unicos) - len(pendientes))
+            if self.traductor is None:
+                self.traductor = crear_traductor(self.configuracion_global)
+            lotes = [pendientes[inicio:inicio + self.tamano_lote]
+                     for inicio in range(0, len(pendientes), self.tamano_lote)]
+            with ThreadPoolExecutor(max_workers=self.trabajadores) as executor:
+                for lote, traducciones in zip(lotes, executor.map(
+                        lambda lote: self.traductor.traducir(lote, origen, destino), lotes)):
+                    self.registrar(lote, traducciones, origen, destino)
+                    indice.update(zip(lote, traducciones))
+        return {texto: indice[texto] for texto in unicos}
+
+    def registrar(self, textos, traducciones, origen, destino):
+        """Añade al fichero en memoria las traducciones de un lote."""
+        with self.bloqueo:
+            self.lotes += 1
+            for texto, traduccion in zip(textos, traducciones):
+                par = {origen: texto, destino: traduccion}
+                self.traducciones.setdefault(par.get(IDIOMA_BASE, texto), {}).update(par)
+            self.modificado = True
+
+    def guardar(self):
+        """Escribe el fichero de traducciones si se han añadido traducciones nuevas, primero en un fichero temporal
+        que sustituye después al destino.
+
+        Returns:
+            guardado (:class:`Booleano`): Verdadero si se ha escrito el fichero.
+        """
+        with self.bloqueo:
+            if not self.modificado:
+                return False
+            fichero_temporal = f'{self.fichero}.{os.getpid()}.tmp'
+            with open(fichero_temporal, 'w', encoding='utf-8') as fichero:
+                yaml.safe_dump(self.traducciones, fichero)
+            os.replace(fichero_temporal, self.fichero)
+            self.modificado = False
+            return True
+
+    def estadisticas(self):
+        """Resumen del uso del servicio.
+
+        Returns:
+            estadisticas (:class:`Diccionario`): Textos conocidos, encontrados, enviados al traductor y lotes.
+        """
+        with self.bloqueo:
+            return {'textos': len(self.traducciones), 'aciertos': self.aciertos, 'fallos': self.fallos,
+                    'lotes': self.lotes}
+
+
+def textos_traducibles(datos, claves=CLAVES_TRADUCIBLES):
+    """Recorre un documento JSON sin recursión y devuelve los textos bajo alguna de las claves.
+
+    Args:
+        datos (:class:`Diccionario` o :class:`Lista`): Documento JSON.
+        claves (:obj:`Lista` de :class:`Cadena de Texto`): Claves cuyos valores se traducen.
+
+    Returns:
+        textos (:obj:`Lista` de :class:`Cadena de Texto`): Textos en orden de aparición, con repeticiones.
+    """
+    textos = []
+    pendientes = [datos]
+    while pendientes:
+        nodo = pendientes.pop()
+        hijos = nodo.items() if isinstance(nodo, collections.abc.Mapping) else enumerate(nodo)
+        for clave, valor in hijos:
+            if isinstance(valor, (collections.abc.Mapping, list)):
+                pendientes.append(valor)
+            elif clave in claves and isinstance(valor, str):
+                textos.append(valor)
+    return textos
+
+
+def aplicar_traducciones(datos, traducciones, claves=CLAVES_TRADUCIBLES):
+    """Copia un documento JSON sustituyendo los textos bajo alguna de las claves por su traducción.
+
+    Args:
+        datos (:class:`Diccionario` o :class:`Lista`): Documento JSON.
+        traducciones (:class:`Diccionario`): Traducción de cada texto.
+        claves (:obj:`Lista` de :class:`Cadena de Texto`): Claves cuyos valores se traducen.
+
+    Returns:
+        traducido (:class:`Diccionario` o :class:`Lista`): Copia traducida del documento.
+    """
+    def copiar(nodo):
+        return {} if isinstance(nodo, collections.abc.Mapping) else [None] * len(nodo)
+
+    traducido = copiar(datos)
+    pendientes = [(datos, traducido)]
+    while pendientes:
+        nodo, copia = pendientes.pop()
+        hijos = nodo.items() if isinstance(nodo, collections.abc.Mapping) else enumerate(nodo)
+        for clave, valor in hijos:
+            if isinstance(valor, (collections.abc.Mapping, list)):
+                copia[clave] = copiar(valor)
+                pendientes.append((valor, copia[clave]))
+            elif clave in claves and isinstance(valor, str):
+                copia[clave] = traducciones.get(valor, valor)
+            else:
+                copia[clave] = valor
+    return traducido
+
+
+def traducir_json(datos, servicio, origen, destino, claves=CLAVES_TRADUCIBLES):
+    """Traduce los textos de un documento JSON con una única llamada a :meth:`ServicioTraduccion.traducir`.
+
+    Args:
+        datos (:class:`Diccionario` o :class:`Lista`): Documento JSON.
+        servicio (:class:`ServicioTraduccion`): Servicio de traducción.
+        origen (:class:`Cadena de Texto`): Idioma de los textos.
+        destino (:class:`Cadena de Texto`): Idioma de la traducción.
+        claves (:obj:`Lista` de :class:`Cadena de Texto`): Claves cuyos valores se traducen.
+
+    Returns:
+        traducido (:class:`Diccionario` o :class:`Lista`): Copia traducida del documento.
+    """
+    traducciones = servicio.traducir(textos_traducibles(datos, claves), origen, destino)
+    return aplicar_traducciones(datos, traducciones, claves)
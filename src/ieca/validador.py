@@ -0,0 +1,232 @@
+import csv
+import functools
+import glob
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from src.ieca.repositorio_mapas import version_fichero
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+ESPACIO_ESTRUCTURAS = '{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure}'
+ROLES = {'Dimension', 'TimeDimension', 'Attribute', 'PrimaryMeasure'}
+RUTA_ENUMERACION = f'{ESPACIO_ESTRUCTURAS}LocalRepresentation/{ESPACIO_ESTRUCTURAS}Enumeration/Ref'
+RUTA_RELACION = f'{ESPACIO_ESTRUCTURAS}AttributeRelationship/{ESPACIO_ESTRUCTURAS}PrimaryMeasure'
+
+# Formato de TIME_PERIOD admitido para cada código de la lista de códigos de frecuencias
+FORMATOS_PERIODO = {'A': r'\d{4}(-A1)?', 'S': r'\d{4}-S[12]', 'Q': r'\d{4}-Q[1-4]',
+                    'M': r'\d{4}-(M?(0[1-9]|1[0-2]))', 'W': r'\d{4}-W(0[1-9]|[1-4][0-9]|5[0-3])',
+                    'D': r'\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])'}
+# Listas de códigos de otras agencias que no se incluyen en las estructuras generadas
+CODIGOS_EXTERNOS = {'CL_FREQ': frozenset(FORMATOS_PERIODO)}
+EJEMPLOS = 5
+
+CAMPOS_VALIDACION = ['actividad', 'dataflow', 'fichero', 'valido', 'filas', 'series', 'errores',
+                     'columnas_faltantes', 'codigos_invalidos', 'ejemplos_codigos', 'listas_no_verificadas',
+                     'claves_incompletas', 'claves_duplicadas', 'periodos_invalidos', 'valores_invalidos']
+
+
+def clave_referencia(referencia):
+    return referencia.get('agencyID'), referencia.get('id'), referencia.get('version')
+
+
+def leer_estructuras(fichero):
+    """Lee de un mensaje de estructuras SDMX-ML 2.1 los códigos de cada lista de códigos y los componentes de cada
+    estructura de datos. El XML se recorre elemento a elemento, liberando los códigos ya leídos. Cada proceso
+    guarda las últimas estructuras leídas junto a la :func:`src.ieca.repositorio_mapas.version_fichero` del XML, de
+    forma que los flujos de datos de una misma actividad no vuelven a leerlas, pero sí se leen de nuevo si el XML
+    se ha regenerado.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del XML, como el que genera
+            :meth:`src.ieca.actividad.Actividad.generar_SDMX`.
+
+    Returns:
+        estructuras (:class:`Diccionario`): Con las claves **codelists**, códigos de cada lista por agencia, ID y
+        versión, y **estructuras**, componentes de cada estructura de datos por su ID.
+    """
+    return leer_version_estructuras(fichero, version_fichero(fichero))
+
+
+@functools.lru_cache(maxsize=8)
+def leer_version_estructuras(fichero, version):
+    """Lee las estructuras de :func:`leer_estructuras` guardando el resultado por fichero y versión."""
+    codelists, estructuras = {}, {}
+    codelist = estructura = None
+    for evento, elemento in ElementTree.iterparse(fichero, events=('start', 'end')):
+        etiqueta = elemento.tag.replace(ESPACIO_ESTRUCTURAS, '')
+        if evento == 'start':
+            if etiqueta == 'Codelist':
+                codelist = codelists.setdefault(clave_referencia(elemento.attrib), set())
+            elif etiqueta == 'DataStructure':
+                estructura = estructuras.setdefault(elemento.get('id'), [])
+            continue
+
+        if etiqueta == 'Code' and codelist is not None:
+            codelist.add(elemento.get('id'))
+            elemento.clear()
+        elif etiqueta == 'Codelist':
+            codelist = None
+            elemento.clear()
+        elif etiqueta in ROLES and estructura is not None and elemento.get('id'):
+            # Las relaciones de los atributos también tienen elementos PrimaryMeasure, pero sin ID
+            enumeracion = elemento.find(RUTA_ENUMERACION)
+            estructura.append({'id': elemento.get('id'), 'rol': etiqueta,
+                               'observacion': elemento.find(RUTA_RELACION) is not None,
+                               'codelist': None if enumeracion is None else clave_referencia(enumeracion.attrib)})
+        elif etiqueta == 'DataStructure':
+            estructura = None
+    return {'codelists': {clave: frozenset(codigos) for clave, codigos in codelists.items()},
+            'estructuras': estructuras}
+
+
+def validar_dataflow(fichero_datos, fichero_estructuras, id_estructura, actividad=None):
+    """Valida un fichero SDMX-CSV con la estructura de datos de su flujo de datos:
+
+        - Todas las columnas de la estructura están en los datos.
+        - Los valores de las dimensiones y atributos codificados están en su lista de códigos.
+        - Las claves de las series y observaciones están completas y no se repiten.
+        - **TIME_PERIOD** tiene el formato que corresponde a **FREQ**.
+        - La medida es numérica o la observación tiene algún atributo, como **OBS_STATUS**, que lo explique.
+
+    Todas las comprobaciones se realizan sobre columnas completas.
+
+    Args:
+        fichero_datos (:class:`Cadena de Texto`): Ruta del SDMX-CSV.
+        fichero_estructuras (:class:`Cadena de Texto`): Ruta del XML con las estructuras.
+        id_estructura (:class:`Cadena de Texto`): ID de la estructura de datos del flujo.
+        actividad (:class:`Cadena de Texto`, opcional): Nombre de la actividad.
+
+    Returns:
+        informe (:class:`Diccionario`): Resultado de cada comprobación, con los campos de
+        :data:`CAMPOS_VALIDACION`.
+    """
+    estructuras = leer_estructuras(fichero_estructuras)
+    componentes = estructuras['estructuras'][id_estructura]
+    datos = pd.read_csv(fichero_datos, dtype=str, keep_default_na=False)
+    informe = {'actividad': actividad, 'dataflow': datos['DATAFLOW'].iloc[0] if len(datos) else None,
+               'fichero': fichero_datos, 'filas': len(datos), 'codigos_invalidos': {}, 'ejemplos_codigos': {},
+               'listas_no_verificadas': []}
+
+    informe['columnas_faltantes'] = [componente['id'] for componente in componentes
+                                     if componente['id'] not in datos.columns]
+    componentes = [componente for componente in componentes if componente['id'] in datos.columns]
+
+    for componente in componentes:
+        if componente['codelist'] is None:
+            continue
+        codigos = estructuras['codelists'].get(componente['codelist'], CODIGOS_EXTERNOS.get(componente['codelist'][1]))
+        if codigos is None:
+            informe['listas_no_verificadas'].append(componente['id'])
+            continue
+        valores = datos[componente['id']]
+        invalidos = ~valores.isin(codigos)
+        if componente['rol'] == 'Attribute':
+            invalidos &= valores != ''
+        if invalidos.any():
+            informe['codigos_invalidos'][componente['id']] = int(invalidos.sum())
+            informe['ejemplos_codigos'][componente['id']] = list(valores[invalidos].unique()[:EJEMPLOS])
+
+    dimensiones = [componente['id'] for componente in componentes if componente['rol'] == 'Dimension']
+    temporal = next((componente['id'] for componente in componentes if componente['rol'] == 'TimeDimension'), None)
+    clave = dimensiones + ([temporal] if temporal else [])
+    informe['series'] = int((~datos.duplicated(dimensiones)).sum()) if dimensiones else 0
+    informe['claves_incompletas'] = int((datos[clave] == '').any(axis=1).sum()) if clave else 0
+    informe['claves_duplicadas'] = int(datos.duplicated(clave).sum()) if clave else 0
+
+    informe['periodos_invalidos'] = 0
+    if temporal and 'FREQ' in datos.columns:
+        for frecuencia, periodos in datos.groupby('FREQ')[temporal]:
+            formato = FORMATOS_PERIODO.get(frecuencia)
+            informe['periodos_invalidos'] += len(periodos) if formato is None else \
+                int((~periodos.str.fullmatch(formato)).sum())
+
+    informe['valores_invalidos'] = 0
+    medida = next((componente['id'] for componente in componentes if componente['rol'] == 'PrimaryMeasure'), None)
+    if medida:
+        invalidos = pd.to_numeric(datos[medida].where(datos[medida] != ''), errors='coerce').isna()
+        for componente in componentes:
+            if componente['rol'] == 'Attribute' and componente['observacion']:
+                invalidos &= datos[componente['id']] == ''
+        informe['valores_invalidos'] = int(invalidos.sum())
+
+    informe['errores'] = len(informe['columnas_faltantes']) + sum(informe['codigos_invalidos'].values()) + \
+        informe['claves_incompletas'] + informe['claves_duplicadas'] + informe['periodos_invalidos'] + \
+        informe['valores_invalidos']
+    informe['valido'] = informe['errores'] == 0
+    return informe
+
+
+def dataflows_actividad(directorio):
+    """Flujos de datos generados de una actividad.
+
+    Args:
+        directorio (:class:`Cadena de Texto`): Directorio de la actividad en :obj:`directorio_datos_SDMX`.
+
+    Returns:
+        dataflows (:obj:`Lista` de :class:`Tupla`): Fichero SDMX-CSV, fichero de estructuras e ID de la estructura
+        de datos de cada flujo de datos.
+    """
+    fichero_estructuras = os.path.join(directorio, 'estructuras.xml')
+    fichero_configuracion = os.path.join(directorio, 'configuracion.yaml')
+    if not os.path.exists(fichero_estructuras):
+        return []
+    with open(fichero_configuracion, 'r', encoding='utf-8') as configuracion:
+        id_estructura = re.search(r'^NOMBRE_DSD: (\S+)$', configuracion.read(), re.MULTILINE).group(1)
+    return [(fichero, fichero_estructuras, id_estructura)
+            for fichero in sorted(glob.glob(os.path.join(directorio, 'sdmx_csv', '*.csv')))]
+
+
+def validar_actividades(directorio_datos_SDMX, actividades=None, trabajos=1):
+    """Valida los flujos de datos generados de varias actividades repartiéndolos entre :obj:`trabajos` procesos.
+
+    Args:
+        directorio_datos_SDMX (:class:`Cadena de Texto`): Directorio de los datos SDMX de las actividades.
+        actividades (:obj:`Lista` de :class:`Cadena de Texto`, opcional): Actividades a validar, por defecto todas.
+        trabajos (:class:`Entero`): Número de procesos.
+
+    Returns:
+        informes (:obj:`Lista` de :class:`Diccionario`): Informe de cada flujo de datos.
+    """
+    if actividades is None:
+        actividades = sorted(os.listdir(directorio_datos_SDMX))
+    tareas = [(fichero, fichero_estructuras, id_estructura, actividad) for actividad in actividades
+              for fichero, fichero_estructuras, id_estructura in
+              dataflows_actividad(os.path.join(directorio_datos_SDMX, actividad))]
+    # Las tareas de una misma actividad se reparten en orden para que cada proceso reutilice sus estructuras
+    if trabajos > 1:
+        with ProcessPoolExecutor(max_workers=trabajos) as executor:
+            return list(executor.map(validar_dataflow, *zip(*tareas), chunksize=1)) if tareas else []
+    return [validar_dataflow(*tarea) for tarea in tareas]
+
+
+def guardar_informe_validacion(informes, directorio_informes, nombre):
+    """Guarda los informes de validación en **'<directorio_informes>/<nombre>.json'** y
+    **'<directorio_informes>/<nombre>.csv'**.
+
+    Args:
+        informes (:obj:`Lista` de :class:`Diccionario`): Informes de :func:`validar_dataflow`.
+        directorio_informes (:class:`Cadena de Texto`): Directorio de los informes.
+        nombre (:class:`Cadena de Texto`): Nombre de los ficheros sin extensión.
+
+    Returns:
+        ficheros (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los informes.
+    """
+    os.makedirs(directorio_informes, exist_ok=True)
+    fichero = os.path.join(directorio_informes, nombre)
+    with open(fichero + '.json', 'w', encoding='utf-8') as destino:
+        json.dump(informes, destino, indent=2, ensure_ascii=False)
+    with open(fichero + '.csv', 'w', encoding='utf-8', newline='') as destino:
+        escritor = csv.DictWriter(destino, fieldnames=CAMPOS_VALIDACION, delimiter=';')
+        escritor.writeheader()
+        escritor.writerows({campo: json.dumps(valor, ensure_ascii=False) if isinstance(valor, (dict, list)) else valor
+                            for campo, valor in informe.items()} for informe in informes)
+    return [fichero + '.json', fichero + '.csv']
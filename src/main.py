@@ -1,30 +1,35 @@
-import os
+import argparse
 
 import yaml
 
-from src.ieca.actividad import Actividad
-import deepl
-
+from src.ieca.planificador import Planificador
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extracción de las actividades del IECA hacia SDMX')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Número de actividades que se ejecutan en paralelo')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalida con la API todas las consultas descargadas')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Regenera todas las actividades aunque sus entradas no hayan cambiado')
+    argumentos = parser.parse_args()
+
     with open("configuracion/global.yaml", 'r', encoding='utf-8') as configuracion_global, \
             open("configuracion/ejecucion.yaml", 'r', encoding='utf-8') as configuracion_ejecucion, \
             open("configuracion/actividades.yaml", 'r', encoding='utf-8') as configuracion_actividades, \
             open("configuracion/plantilla_actividad.yaml", 'r',
-                 encoding='utf-8') as plantilla_configuracion_actividad, \
-            open("sistema_informacion/mapas/conceptos_codelist.yaml", 'r',
-             encoding='utf-8') as mapa_conceptos_codelist, \
-            open("sistema_informacion/traducciones.yaml", 'r',
-             encoding='utf-8') as traducciones:
+                 encoding='utf-8') as plantilla_configuracion_actividad:
         configuracion_global = yaml.safe_load(configuracion_global)
         configuracion_ejecucion = yaml.safe_load(configuracion_ejecucion)
         configuracion_actividades = yaml.safe_load(configuracion_actividades)
         configuracion_plantilla_actividad = yaml.safe_load(plantilla_configuracion_actividad)
-        mapa_conceptos_codelist = yaml.safe_load(mapa_conceptos_codelist)
 
-    for nombre_actividad in configuracion_ejecucion['actividades']:
-        actividad = Actividad(configuracion_global, configuracion_actividades[nombre_actividad],
-                              configuracion_plantilla_actividad, nombre_actividad)
-        actividad.generar_consultas()
-        actividad.ejecutar()
+    if argumentos.refresh:
+        configuracion_global['refrescar_cache_consultas'] = True
+    if argumentos.rebuild:
+        configuracion_global['ejecucion_incremental'] = False
+
+    planificador = Planificador(configuracion_global, configuracion_actividades, configuracion_plantilla_actividad,
+                                argumentos.jobs)
+    planificador.ejecutar(configuracion_ejecucion['actividades'])
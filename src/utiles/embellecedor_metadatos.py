@@ -1,41 +1,145 @@
+"""Adapta a la imagen del IECA los informes de metadatos HTML generados con las herramientas SDMX: borra las filas
+de destino de pruebas y la sección multilenguaje, sustituye el logo de la cabecera y cambia el color corporativo.
+
+Uso::
+
+    python -m src.utiles.embellecedor_metadatos [--directorio src/utiles/metadatos] [--trabajos 4] [--forzar]
+"""
+import argparse
 import glob
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 from bs4 import BeautifulSoup
 
-directorio_metadatos_regex = 'utiles/metadatos/*/*.html'
-
-
-for file in glob.glob(directorio_metadatos_regex):
-    print(file)
-    with open(file,'r+') as fichero:
-        html = BeautifulSoup(fichero, 'html.parser')
-
-        # Borrar Target
-        for tr in html.find_all("tr"):
-            if 'FULL_TEST' in tr.text:
-                tr.decompose()
-        # Borrar seccion multilenguaje
-        for div in html.find_all("div",class_="col-1"):
-            if 'Italiano' in div.text:
-                div.decompose()
-        # Cambiar imagen
-        html.find('img', class_="Cl-Header-Img-Catalog")['src'] = '../../logo.png'
-
-        fichero.truncate(0)
-        fichero.write(str(html))
-
-    # Cambiar color de fondo de algunos elementos
-    fin = open(file, "rt")
-    # read file contents to string
-    data = fin.read()
-    # replace all occurrences of the required string
-    data = data.replace('da0d14','007932')
-    # close the input file
-    fin.close()
-    # open the input file in write mode
-    fin = open(file, "wt")
-    # overrite the input file with the resulting data
-    fin.write(data)
-    # close the file
-    fin.close()
+from src.ieca.cache_consultas import resumen_fichero
+
+try:
+    import lxml  # noqa: F401
+    ANALIZADOR = 'lxml'
+except ImportError:  # Sin lxml se usa el analizador de la librería estándar, más lento
+    ANALIZADOR = 'html.parser'
+
+fmt = '[%(asctime)-15s] [%(levelname)s] %(name)s: %(message)s'
+logging.basicConfig(format=fmt, level=logging.INFO, stream=sys.stdout)
+
+# Cambiar estos valores cambia el resultado, por lo que los informes ya embellecidos se vuelven a procesar
+VERSION_EMBELLECEDOR = 1
+PATRON_INFORMES = '*/*.html'
+FICHERO_RESUMENES = 'embellecidos.json'
+LOGO = '../../logo.png'
+COLORES = {'da0d14': '007932'}
+
+
+def embellecer(html, analizador=ANALIZADOR):
+    """Aplica todas las transformaciones a un informe en una única lectura y escritura del documento. Los colores
+    se sustituyen en el texto antes de analizarlo.
+
+    Args:
+        html (:class:`Cadena de Texto`): Contenido del informe.
+        analizador (:class:`Cadena de Texto`): Analizador de BeautifulSoup.
+
+    Returns:
+        html (:class:`Cadena de Texto`): Contenido embellecido.
+    """
+    # Las versiones anteriores de este script dejaban caracteres nulos al principio de los ficheros
+    html = html.replace('\0', '')
+    for original, nuevo in COLORES.items():
+        html = html.replace(original, nuevo)
+    documento = BeautifulSoup(html, analizador)
+
+    # Borrar las filas del destino de pruebas
+    for fila in documento.find_all('tr'):
+        if not fila.decomposed and 'FULL_TEST' in fila.get_text():
+            fila.decompose()
+    # Borrar la sección multilenguaje
+    for seccion in documento.find_all('div', class_='col-1'):
+        if not seccion.decomposed and 'Italiano' in seccion.get_text():
+            seccion.decompose()
+    # Cambiar el logo de la cabecera
+    logo = documento.find('img', class_='Cl-Header-Img-Catalog')
+    if logo is not None:
+        logo['src'] = LOGO
+    return str(documento)
+
+
+def embellecer_fichero(fichero, resumen_previo=None, analizador=ANALIZADOR):
+    """Embellece un informe si su resumen no coincide con el que tenía tras embellecerlo la última vez. El fichero
+    se sustituye solo si su contenido cambia, escribiendo primero un fichero temporal.
+
+    Args:
+        fichero (:class:`Cadena de Texto`): Ruta del informe.
+        resumen_previo (:class:`Cadena de Texto`, opcional): Resumen SHA-256 del informe ya embellecido.
+        analizador (:class:`Cadena de Texto`): Analizador de BeautifulSoup.
+
+    Returns:
+        resultado (:class:`Tupla`): Resumen SHA-256 del informe embellecido y si se ha procesado.
+    """
+    if resumen_previo is not None and resumen_fichero(fichero) == resumen_previo:
+        return resumen_previo, False
+    with open(fichero, 'r', encoding='utf-8') as origen:
+        html = origen.read()
+    embellecido = embellecer(html, analizador)
+    if embellecido != html:
+        fichero_temporal = f'{fichero}.{os.getpid()}.tmp'
+        with open(fichero_temporal, 'w', encoding='utf-8') as destino:
+            destino.write(embellecido)
+        os.replace(fichero_temporal, fichero)
+    return resumen_fichero(fichero), True
+
+
+def embellecer_directorio(directorio, trabajos=1, forzar=False, analizador=ANALIZADOR):
+    """Embellece los informes **<directorio>/<actividad>/<informe>.html** repartiéndolos entre :obj:`trabajos`
+    procesos. Los resúmenes de los informes embellecidos se guardan en **<directorio>/embellecidos.json**, de forma
+    que en la siguiente ejecución se omiten los que no han cambiado.
+
+    Args:
+        directorio (:class:`Cadena de Texto`): Directorio de los informes.
+        trabajos (:class:`Entero`): Número de procesos.
+        forzar (:class:`Booleano`): Procesa todos los informes aunque no hayan cambiado.
+        analizador (:class:`Cadena de Texto`): Analizador de BeautifulSoup.
+
+    Returns:
+        procesados (:obj:`Lista` de :class:`Cadena de Texto`): Rutas de los informes procesados.
+    """
+    logger = logging.getLogger('Embellecedor')
+    fichero_resumenes = os.path.join(directorio, FICHERO_RESUMENES)
+    resumenes = {}
+    if not forzar and os.path.exists(fichero_resumenes):
+        with open(fichero_resumenes, 'r', encoding='utf-8') as origen:
+            guardado = json.load(origen)
+        if guardado.get('version') == VERSION_EMBELLECEDOR:
+            resumenes = guardado['ficheros']
+
+    relativos = sorted(os.path.relpath(fichero, directorio)
+                       for fichero in glob.glob(os.path.join(glob.escape(directorio), PATRON_INFORMES)))
+    ficheros = [os.path.join(directorio, relativo) for relativo in relativos]
+    previos = [resumenes.get(relativo.replace(os.sep, '/')) for relativo in relativos]
+    if trabajos > 1:
+        with ProcessPoolExecutor(max_workers=trabajos) as executor:
+            resultados = list(executor.map(embellecer_fichero, ficheros, previos, [analizador] * len(ficheros)))
+    else:
+        resultados = [embellecer_fichero(fichero, previo, analizador) for fichero, previo in zip(ficheros, previos)]
+
+    resumenes = {relativo.replace(os.sep, '/'): resumen for relativo, (resumen, _) in zip(relativos, resultados)}
+    with open(fichero_resumenes, 'w', encoding='utf-8') as destino:
+        json.dump({'version': VERSION_EMBELLECEDOR, 'ficheros': resumenes}, destino, indent=2, sort_keys=True)
+
+    procesados = [fichero for fichero, (_, procesado) in zip(ficheros, resultados) if procesado]
+    logger.info('%s informes embellecidos con %s, %s sin cambios', len(procesados), analizador,
+                len(ficheros) - len(procesados))
+    return procesados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--directorio', default=os.path.join(os.path.dirname(__file__), 'metadatos'))
+    parser.add_argument('--trabajos', type=int, default=os.cpu_count() or 1,
+                        help='Procesos entre los que se reparten los informes')
+    parser.add_argument('--forzar', action='store_true', help='Procesa también los informes que no han cambiado')
+    argumentos = parser.parse_args()
 
+    embellecer_directorio(argumentos.directorio, argumentos.trabajos, argumentos.forzar)
@@ -0,0 +1,26 @@
+"""Genera la caché binaria de las consultas ya descargadas en JSON bajo el directorio :obj:`directorio_json` de la
+configuración global.
+
+Uso::
+
+    python -m src.utiles.migrar_cache_consultas [--configuracion configuracion/global.yaml] [--borrar-json]
+"""
+import argparse
+
+import yaml
+
+from src.ieca.cache_consultas import migrar_cache_consultas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--configuracion', default='configuracion/global.yaml')
+    parser.add_argument('--borrar-json', action='store_true',
+                        help='Borra cada JSON una vez generada su caché')
+    argumentos = parser.parse_args()
+
+    with open(argumentos.configuracion, 'r', encoding='utf-8') as configuracion_global:
+        configuracion_global = yaml.safe_load(configuracion_global)
+
+    migradas = migrar_cache_consultas(configuracion_global['directorio_json'],
+                                      configuracion_global['tamano_bloque_observaciones'], argumentos.borrar_json)
+    print(f'{len(migradas)} consultas migradas')
@@ -1,53 +1,39 @@
-# Python program to read
-# json file
-import os
+"""Traduce los textos bajo las claves **label** y **title** de un fichero JSON, como el de traducciones de la
+interfaz de SDMX, utilizando las traducciones ya conocidas y enviando al traductor solo los textos nuevos.
 
-import deepl
+La clave del traductor se lee de la variable de entorno :obj:`variable_clave` de la sección :obj:`traduccion` de
+la configuración global.
 
-traductor = deepl.Translator("9d607fdb-762b-fe7a-2e55-d8b23bbc18a4:fx")
+Uso::
+
+    python -m src.utiles.traducir entrada.json [--salida traducido.json] [--origen en] [--destino es]
+                                  [--configuracion configuracion/global.yaml]
+"""
+import argparse
 import json
 
-# Opening JSON file
-f = open('translation.json')
-
-# returns JSON object as
-# a dictionary
-data = json.load(f)
-
-
-# def recursive_items(dictionary):
-#     for key, value in dictionary.items():
-#         print(key,value)
-#         if type(value) is dict:
-#             yield from recursive_items(value)
-#         else:
-#             if key in ['label','title']:
-#                 # traduccion = traductor.translate_text(value,target_lang='ES').text
-#                 yield (key, 'hola')
-#
-#
-#             yield (key, value)
-
-import collections.abc
-
-def traducir(dic,inicial,lista):
-    for k,v in dic.items():
-        if isinstance(v, collections.abc.Mapping):
-            inicial[k] = traducir(dic.get(k, {}),v, lista)
-        else:
-            if k in ['label','title']:
-                traduccion = traductor.translate_text(v,target_lang='ES').text
-                print(traduccion)
-                inicial[k] = traduccion
-            else:
-                inicial[k] = v
-
-    return inicial
-
-datos = traducir(data,{},['title','label'])
-
-# datos = dict(recursive_items(data))
-print(data)
-
-with open("traducido.json", "w") as outfile:
-    json.dump(data,outfile)
+import yaml
+
+from src.ieca.traduccion import ServicioTraduccion, traducir_json
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('entrada')
+    parser.add_argument('--salida', default='traducido.json')
+    parser.add_argument('--origen', default='en')
+    parser.add_argument('--destino', default='es')
+    parser.add_argument('--configuracion', default='configuracion/global.yaml')
+    argumentos = parser.parse_args()
+
+    with open(argumentos.configuracion, 'r', encoding='utf-8') as configuracion_global:
+        configuracion_global = yaml.safe_load(configuracion_global)
+    with open(argumentos.entrada, 'r', encoding='utf-8') as entrada:
+        datos = json.load(entrada)
+
+    servicio = ServicioTraduccion(configuracion_global)
+    traducido = traducir_json(datos, servicio, argumentos.origen, argumentos.destino)
+    servicio.guardar()
+
+    with open(argumentos.salida, 'w', encoding='utf-8') as salida:
+        json.dump(traducido, salida, ensure_ascii=False, indent=2)
+    print(f'Traducciones: {servicio.estadisticas()}')
@@ -1,50 +1,38 @@
-import os
-import subprocess
-import sys
-import glob
-
-sys.stdout.reconfigure(encoding='utf-8')
-
-dsds_directorios = glob.glob("C:/Users/index/OneDrive/Documentos/DSD_s/*.xml")
-cubos_directorios = glob.glob("C:/Users/index/OneDrive/Documentos/DataFlows/*")
-
-destino_ficheros = "C:/Users/index/OneDrive/Documentos/RESULTADOS_STRUVAL/"
-
-if not os.path.exists(destino_ficheros):
-    os.makedirs(destino_ficheros)
-#
-for directorio_dsd,directorio_cubo in zip(dsds_directorios,cubos_directorios):
-
-
+"""Valida los flujos de datos SDMX-CSV generados por la acción :obj:`generar_SDMX` contra las estructuras de su
+actividad y guarda un informe por flujo de datos en el directorio de informes de la configuración global.
 
+Uso::
 
-    for cubo in glob.glob(os.path.join(directorio_cubo,'*.xml')):
-        print(directorio_dsd)
-        print(cubo)
-        dsd = directorio_dsd.replace('\\','/')
-        cubo = cubo.replace('\\','/')
-
-        result = []
-        win_cmd = f'cd C:/Users/index/OneDrive/Documentos/struval_v3_externalaccesstutorial/ExternalAccessTutorial/ & runClient.cmd {cubo} {dsd} SDMX_ML '
-        process = subprocess.Popen(win_cmd,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE )
-#
-        destino_ficheros_categoria = destino_ficheros + '/'+dsd.split('/')[-1].split('+')[0][4:]
-        destino_ficheros_categoria = destino_ficheros_categoria.replace('\\','/')
-        if not os.path.exists(destino_ficheros_categoria):
-            os.makedirs(destino_ficheros_categoria)
-
-        fichero_destino = destino_ficheros_categoria + '/' + cubo.split('/')[-1].split('+')[0]+'.txt'
-        fichero_destino = fichero_destino.replace('\\','/')
-        fichero_destino = fichero_destino.replace('//','/')
-
-
-
-        # if os.path.exists():
-        #     os.makedirs()
-        with open(fichero_destino,'w') as file:
-            for line in process.stdout:
-                file.write(line.decode("utf-8") )
+    python -m src.utiles.validador [--configuracion configuracion/global.yaml] [--actividades IPC DSN]
+        [--trabajos 4]
+"""
+import argparse
+import datetime
+import os
+import sys
 
+import yaml
+
+from src.ieca.validador import guardar_informe_validacion, validar_actividades
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--configuracion', default='configuracion/global.yaml')
+    parser.add_argument('--actividades', nargs='+', help='Actividades a validar, por defecto todas las generadas')
+    parser.add_argument('--trabajos', type=int, default=os.cpu_count() or 1,
+                        help='Procesos entre los que se reparten los flujos de datos')
+    argumentos = parser.parse_args()
+
+    with open(argumentos.configuracion, 'r', encoding='utf-8') as configuracion_global:
+        configuracion_global = yaml.safe_load(configuracion_global)
+
+    informes = validar_actividades(configuracion_global['directorio_datos_SDMX'], argumentos.actividades,
+                                   argumentos.trabajos)
+    ficheros = guardar_informe_validacion(informes, configuracion_global['instrumentacion']['directorio_informes'],
+                                          f"validacion_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    for informe in informes:
+        print(f"{'OK' if informe['valido'] else 'ERROR':5} {informe['dataflow']}: {informe['filas']} filas, "
+              f"{informe['errores']} errores")
+    invalidos = sum(not informe['valido'] for informe in informes)
+    print(f'{len(informes) - invalidos} de {len(informes)} flujos de datos válidos. Informe: {ficheros[0]}')
+    sys.exit(1 if invalidos else 0)
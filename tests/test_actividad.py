@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pandas as pd
+import yaml
+
+import src.ieca.actividad
+from src.ieca.actividad import Actividad
+from src.ieca.datos import Datos
+
+
+class JerarquiaPrueba:
+    """Sustituye a :class:`src.ieca.jerarquia.Jerarquia` conservando los códigos de las observaciones."""
+
+    def __init__(self, alias):
+        self.metadatos = {'alias': alias}
+
+    def indice_codigos(self):
+        return self
+
+    def traducir(self, codigos, alternativa=None):
+        return codigos
+
+
+def crear_actividad(consultas):
+    with open('tests/global.yaml', 'r', encoding='utf-8') as configuracion_global, \
+            open('configuracion/plantilla_actividad.yaml', 'r', encoding='utf-8') as plantilla:
+        configuracion_global = yaml.safe_load(configuracion_global)
+        plantilla = yaml.safe_load(plantilla)
+    return Actividad(configuracion_global, {'consultas': consultas}, plantilla, 'PRUEBA')
+
+
+class ConsultaPrueba:
+    """Sustituye a :class:`src.ieca.consulta.Consulta` sin leer ningún JSON. Las consultas pares tienen el mismo
+    titulo y una dimension de sexo que no tienen las impares."""
+
+    def __init__(self, id_consulta, configuracion_global, configuracion_actividad, actividad):
+        if id_consulta == '3':
+            raise ValueError('JSON corrupto')
+        self.id_consulta = id_consulta
+        self.metadatos = {'title': 'Pares' if int(id_consulta) % 2 == 0 else id_consulta}
+        observaciones = pd.DataFrame({'Valor': [f'{id_consulta}.5', '2']})
+        if int(id_consulta) % 2 == 0:
+            observaciones['D_SEXO_0'] = observaciones['D_SEXO_0_aux'] = pd.Categorical(['H', 'M'])
+        self.jerarquias = [JerarquiaPrueba('D_SEXO_0')] if 'D_SEXO_0' in observaciones else []
+        self.datos = Datos(id_consulta, configuracion_global, actividad, 'Anual', observaciones, self.jerarquias,
+                           [{'des': 'Valor'}])
+
+    def ejecutar(self):
+        pass
+
+
+def test_generar_consultas_conserva_el_orden_y_registra_fallos(monkeypatch):
+    terminadas = []
+    bloqueo = threading.Lock()
+
+    def precargar_consulta(consulta, *args):
+        # Las primeras consultas son las que más tardan en descargarse
+        time.sleep(0.02 * (5 - int(consulta)))
+        with bloqueo:
+            terminadas.append(consulta)
+        if consulta == '2':
+            raise ConnectionError('API caída')
+        return True
+
+    monkeypatch.setattr(src.ieca.actividad, 'precargar_consulta', precargar_consulta)
+    monkeypatch.setattr(src.ieca.actividad, 'Consulta', ConsultaPrueba)
+    actividad = crear_actividad(['1', '2', '3', '4', '5'])
+
+    actividad.generar_consultas()
+
+    assert terminadas[0] != '1'
+    assert list(actividad.consultas) == ['1', '4', '5']
+    assert {id_consulta: type(e) for id_consulta, e in actividad.consultas_fallidas.items()} == \
+        {'2': ConnectionError, '3': ValueError}
+
+
+def test_ejecutar_no_aplica_las_acciones_con_consultas_fallidas(monkeypatch):
+    aplicadas = []
+    monkeypatch.setattr(Actividad, 'agrupar_consultas_SDMX', lambda self: aplicadas.append('agrupar_consultas_SDMX'))
+    monkeypatch.setattr(Actividad, 'generar_SDMX', lambda self: aplicadas.append('generar_SDMX'))
+    actividad = crear_actividad(['1'])
+    actividad.consultas_fallidas['1'] = ConnectionError('API caída')
+
+    actividad.ejecutar()
+
+    assert aplicadas == []
+
+
+def test_agrupar_consultas_libera_los_datos_de_cada_consulta(monkeypatch, tmp_path):
+    monkeypatch.setattr(src.ieca.actividad, 'precargar_consulta', lambda *args: False)
+    monkeypatch.setattr(src.ieca.actividad, 'Consulta', ConsultaPrueba)
+    actividad = crear_actividad(['1', '2', '4'])
+    actividad.configuracion_global['directorio_datos_SDMX'] = str(tmp_path)
+    actividad.configuracion_actividad['categoria'] = None
+
+    actividad.generar_consultas()
+    assert all(consulta.datos.datos_por_observacion is None and consulta.datos.datos is None
+               for consulta in actividad.consultas.values())
+    assert [consulta.datos.filas for consulta in actividad.consultas.values()] == [2, 2, 2]
+    actividad.agrupar_consultas_SDMX()
+
+    directorio = tmp_path / 'PRUEBA'
+    assert actividad.configuracion['grupos_consultas'] == {'1': {'id': '1', 'consultas': ['1']},
+                                                           'Pares': {'id': '2', 'consultas': ['2', '4']}}
+    assert (directorio / 'original' / '2.csv').read_text(encoding='utf-8').splitlines() == [
+        'D_SEXO_0;INDICATOR;OBS_VALUE;FREQ', 'H;Valor;2.5;A', 'M;Valor;2;A', 'H;Valor;4.5;A', 'M;Valor;2;A']
+    assert (directorio / 'extension_disjuntos' / '1.csv').read_text(encoding='utf-8').splitlines() == [
+        'INDICATOR;OBS_VALUE;FREQ;D_SEXO_0', 'Valor;1.5;A;_Z', 'Valor;2;A;_Z']
+    assert (directorio / '4.csv').read_text(encoding='utf-8').splitlines() == [
+        'D_SEXO_0;INDICATOR;OBS_VALUE;FREQ', 'H;Valor;4.5;A', 'M;Valor;2;A']
+
+
+def test_generar_sdmx_sin_agrupar_usa_la_configuracion_guardada(monkeypatch, tmp_path):
+    monkeypatch.setattr(src.ieca.actividad, 'precargar_consulta', lambda *args: False)
+    monkeypatch.setattr(src.ieca.actividad, 'Consulta', ConsultaPrueba)
+    actividad = crear_actividad(['1'])
+    actividad.configuracion_global['directorio_datos_SDMX'] = str(tmp_path)
+    actividad.configuracion_actividad['categoria'] = None
+    actividad.generar_consultas()
+
+    try:
+        actividad.generar_SDMX()
+    except FileNotFoundError as error:
+        assert 'agrupar_consultas_SDMX' in str(error)
+    else:
+        raise AssertionError('generar_SDMX sin configuracion.yaml debe fallar')
+
+    actividad.agrupar_consultas_SDMX()
+    siguiente = crear_actividad(['1'])
+    siguiente.configuracion_global['directorio_datos_SDMX'] = str(tmp_path)
+    siguiente.generar_consultas()
+    siguiente.generar_SDMX()
+
+    assert siguiente.configuracion == actividad.configuracion
+    assert (tmp_path / 'PRUEBA' / 'sdmx_csv' / '1.csv').read_text(encoding='utf-8').splitlines()[1:] == [
+        'IECA:DF_PRUEBA_1(1.0),Valor,1.5,A', 'IECA:DF_PRUEBA_1(1.0),Valor,2,A']
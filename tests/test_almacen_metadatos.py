@@ -0,0 +1,75 @@
+import os
+
+import yaml
+
+from src.ieca.almacen_metadatos import AlmacenMetadatos, leer_yaml_compilado, ruta_indice
+
+CONCEPTOS = """
+TEMPORAL:
+  tipo: Time
+  concept_scheme: urn:sdmx:org.sdmx.infomodel.conceptscheme.ConceptScheme=SDMX:CROSS_DOMAIN_CONCEPTS(2.0)
+  concept: TIME_PERIOD
+  codelist: null
+
+TERRITORIO:
+  tipo: dimension
+  concept_scheme: CROSS_DOMAIN_CONCEPTS
+  concept: REF_AREA
+  codelist:
+    agency: IECA
+    id: CL_REF_AREA
+    version: 1.0
+
+EDAD :
+  tipo: dimension
+  concept_scheme: none
+  concept: None
+  codelist:
+    agency: IECA
+    id: CL_EDAD
+    version: 1.0
+"""
+
+
+def test_yaml_compilado_se_regenera_solo_si_cambia(tmp_path):
+    fichero = tmp_path / 'traducciones.yaml'
+    fichero.write_text(yaml.safe_dump({'Sexo': {'en': 'Sex', 'es': 'Sexo'}}), encoding='utf-8')
+
+    assert leer_yaml_compilado(str(fichero)) == ({'Sexo': {'en': 'Sex', 'es': 'Sexo'}}, True)
+    assert os.path.exists(ruta_indice(str(fichero)))
+    assert leer_yaml_compilado(str(fichero)) == ({'Sexo': {'en': 'Sex', 'es': 'Sexo'}}, False)
+
+    fichero.write_text(yaml.safe_dump({'Edad': {'en': 'Age', 'es': 'Edad'}}), encoding='utf-8')
+    assert leer_yaml_compilado(str(fichero)) == ({'Edad': {'en': 'Age', 'es': 'Edad'}}, True)
+    assert leer_yaml_compilado(str(tmp_path / 'no_existe.yaml')) == (None, False)
+
+
+def test_almacen_resuelve_traducciones_y_conceptos(tmp_path):
+    (tmp_path / 'traducciones.yaml').write_text(yaml.safe_dump({'Sexo': {'en': 'Sex', 'es': 'Sexo'}}),
+                                                encoding='utf-8')
+    (tmp_path / 'conceptos_codelist.yaml').write_text(CONCEPTOS, encoding='utf-8')
+    almacen = AlmacenMetadatos()
+    almacen.configurar({'traduccion': {'fichero': str(tmp_path / 'traducciones.yaml')},
+                        'fichero_conceptos_codelist': str(tmp_path / 'conceptos_codelist.yaml')})
+
+    assert almacen.traducir('Sexo') == 'Sex'
+    assert almacen.traducir('Sex', destino='es', origen='en') == 'Sexo'
+    assert almacen.traducir('Edad') is None
+
+    assert almacen.concepto('TEMPORAL')['urn_concepto'] == \
+        'urn:sdmx:org.sdmx.infomodel.conceptscheme.Concept=SDMX:CROSS_DOMAIN_CONCEPTS(2.0).TIME_PERIOD'
+    assert almacen.concepto('TEMPORAL')['urn_codelist'] is None
+    assert almacen.concepto('TERRITORIO') == {
+        'tipo': 'dimension', 'descripcion': None, 'concepto': 'REF_AREA',
+        'urn_concepto': 'urn:sdmx:org.sdmx.infomodel.conceptscheme.Concept=SDMX:CROSS_DOMAIN_CONCEPTS(2.0).REF_AREA',
+        'codelist': 'CL_REF_AREA',
+        'urn_codelist': 'urn:sdmx:org.sdmx.infomodel.codelist.Codelist=IECA:CL_REF_AREA(1.0)'}
+    assert almacen.concepto('EDAD')['concepto'] is None and almacen.concepto('EDAD')['codelist'] == 'CL_EDAD'
+    assert almacen.concepto('OBS_VALUE') is None
+    assert almacen.estadisticas() == {'ficheros': 2, 'compilaciones': 2}
+
+    almacen_nuevo = AlmacenMetadatos()
+    almacen_nuevo.configurar({'traduccion': {'fichero': str(tmp_path / 'traducciones.yaml')},
+                              'fichero_conceptos_codelist': str(tmp_path / 'conceptos_codelist.yaml')})
+    assert almacen_nuevo.concepto('TERRITORIO') == almacen.concepto('TERRITORIO')
+    assert almacen_nuevo.estadisticas() == {'ficheros': 1, 'compilaciones': 0}
@@ -0,0 +1,13 @@
+from benchmarks.suite import comparar_resultados
+
+
+def test_comparacion_detecta_regresiones():
+    base = {'resultados': [{'benchmark': 'macro/IPC', 'mediana_ms': 100.0},
+                           {'benchmark': 'macro/PADRON', 'mediana_ms': 100.0}]}
+    resultados = [{'benchmark': 'macro/IPC', 'mediana_ms': 110.0}, {'benchmark': 'macro/PADRON', 'mediana_ms': 150.0},
+                  {'benchmark': 'macro/DEFCAU', 'mediana_ms': 10.0}]
+
+    comparacion = comparar_resultados(resultados, base, 0.25)
+
+    assert list(comparacion['benchmark']) == ['macro/IPC', 'macro/PADRON']
+    assert list(comparacion['regresion']) == [False, True]
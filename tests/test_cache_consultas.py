@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.ieca.cache_consultas import cache_vigente, cargar_cache_consulta, consulta_caducada, consulta_modificada, \
+    descargar_consulta_api, leer_metadatos_consulta, migrar_cache_consultas, ruta_cache_consulta
+
+
+def test_migracion_genera_cache_equivalente_al_json(tmp_path):
+    consulta = {'metainfo': {'id': 1}, 'hierarchies': [{'alias': 'D_SEXO_0'}], 'measures': [{'des': 'Población'}],
+                'data': [[{'cod': ['1', str(i % 3)]}, {'val': '', 'format': str(i)}] for i in range(10)]}
+    directorio_actividad = tmp_path / 'PADRON'
+    directorio_actividad.mkdir()
+    fichero_json = directorio_actividad / '1.json'
+    fichero_json.write_text(json.dumps(consulta), encoding='utf-8')
+
+    assert migrar_cache_consultas(str(tmp_path), 4, borrar_json=True) == [ruta_cache_consulta(str(fichero_json))]
+    assert not os.path.exists(fichero_json)
+    assert cache_vigente(ruta_cache_consulta(str(fichero_json)), str(fichero_json))
+
+    cabecera, columnas = cargar_cache_consulta(ruta_cache_consulta(str(fichero_json)))
+    assert cabecera == {clave: valor for clave, valor in consulta.items() if clave != 'data'}
+    assert list(columnas['D_SEXO_0'].astype(str)) == [str(i % 3) for i in range(10)]
+    assert list(columnas['Población']) == [str(i) for i in range(10)]
+    assert list(columnas['D_SEXO_0_aux'].astype(str)) == ['1'] * 10
+
+
+class ServidorConsulta(BaseHTTPRequestHandler):
+    """Sirve ``cuerpo`` con la cabecera ``etag`` del servidor y responde 304 a las peticiones condicionales que
+    coinciden."""
+
+    def do_GET(self):
+        if self.server.etag and self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if self.server.etag:
+            self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Length', str(len(self.server.cuerpo)))
+        self.end_headers()
+        self.wfile.write(self.server.cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_revalidacion_solo_reescribe_las_consultas_modificadas(tmp_path):
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorConsulta)
+    servidor.cuerpo, servidor.etag = b'{"data": [1]}', '"v1"'
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/consulta/1'
+    fichero_json = str(tmp_path / '1.json')
+    configuracion_global = {'refrescar_cache_consultas': True, 'formato_cache_consultas': 'json'}
+
+    try:
+        assert descargar_consulta_api(url, fichero_json)
+        assert leer_metadatos_consulta(fichero_json)['etag'] == '"v1"'
+        assert consulta_modificada(fichero_json)
+        assert not consulta_caducada(fichero_json, configuracion_global, None)
+        modificacion = os.path.getmtime(fichero_json)
+
+        assert not descargar_consulta_api(url, fichero_json, revalidar=True)
+
+        servidor.etag = None
+        assert not descargar_consulta_api(url, fichero_json, revalidar=True)
+        assert os.path.getmtime(fichero_json) == modificacion
+
+        servidor.cuerpo = b'{"data": [2]}'
+        assert descargar_consulta_api(url, fichero_json, revalidar=True)
+        with open(fichero_json, 'rb') as fichero:
+            assert fichero.read() == b'{"data": [2]}'
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from src.ieca.canalizacion import Canalizacion
+
+CONFIGURACION = {'trabajadores_consultas': 4, 'canalizacion': {'activa': True, 'cola_descargas': 2,
+                                                               'cola_persistencia': 1}}
+
+
+def test_canalizacion_conserva_el_orden_y_registra_fallos():
+    elementos = {str(i): i for i in range(8)}
+    persistidos = []
+
+    def descargar(i):
+        time.sleep(0.01 * (8 - i))
+        if i == 3:
+            raise ConnectionError('API caída')
+
+    def transformar(i):
+        if i == 5:
+            raise ValueError('JSON corrupto')
+        return i * 10
+
+    def persistir(resultado):
+        if resultado == 60:
+            raise OSError('Disco lleno')
+        persistidos.append(resultado)
+
+    canalizacion = Canalizacion(CONFIGURACION, 'PRUEBA')
+    resultados, fallidos = canalizacion.ejecutar(elementos, descargar, transformar, persistir,
+                                                 contar_filas=lambda resultado: resultado)
+
+    assert resultados == {'0': 0, '1': 10, '2': 20, '4': 40, '7': 70}
+    assert persistidos == [0, 10, 20, 40, 70]
+    assert {id_elemento: type(e) for id_elemento, e in fallidos.items()} == \
+        {'3': ConnectionError, '5': ValueError, '6': OSError}
+
+    estadisticas = canalizacion.estadisticas()
+    assert estadisticas['descarga']['elementos'] == 8
+    assert estadisticas['transformacion']['elementos'] == 7
+    assert estadisticas['persistencia']['elementos'] == 6
+    assert estadisticas['persistencia']['filas'] == 200
+
+
+def test_canalizacion_limita_las_descargas_adelantadas():
+    elementos = {str(i): i for i in range(10)}
+    descargadas, transformadas = [], []
+    adelanto_maximo = [0]
+    bloqueo = threading.Lock()
+
+    def descargar(i):
+        with bloqueo:
+            descargadas.append(i)
+            adelanto_maximo[0] = max(adelanto_maximo[0], len(descargadas) - len(transformadas))
+
+    def transformar(i):
+        time.sleep(0.02)
+        with bloqueo:
+            transformadas.append(i)
+        return i
+
+    canalizacion = Canalizacion(CONFIGURACION, 'PRUEBA')
+    resultados, fallidos = canalizacion.ejecutar(elementos, descargar, transformar, lambda resultado: None)
+
+    assert list(resultados.values()) == list(range(10)) and not fallidos
+    # La cola admite 2 descargas, más la que espera para entrar y la que se está transformando
+    assert adelanto_maximo[0] <= 4
+    assert canalizacion.estadisticas()['descarga']['espera_salida'] > 0
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.ieca.cliente_api import ClienteAPI, cliente_api, crear_limites_compartidos
+
+
+class ServidorPrueba(BaseHTTPRequestHandler):
+    """Responde con los estados de la lista ``respuestas`` del servidor, uno por petición."""
+
+    def do_GET(self):
+        estado = self.server.respuestas.pop(0) if self.server.respuestas else 200
+        cuerpo = json.dumps({'ruta': self.path}).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorPrueba)
+    servidor.respuestas = []
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def url(servidor, ruta):
+    return f'http://127.0.0.1:{servidor.server_address[1]}{ruta}'
+
+
+def test_reintenta_los_fallos_transitorios(servidor):
+    servidor.respuestas = [503, 502]
+    cliente = ClienteAPI(reintentos=3, espera_base_reintento=0.01, peticiones_por_segundo=0)
+
+    assert cliente.obtener_json(url(servidor, '/consulta/1')) == {'ruta': '/consulta/1'}
+    assert cliente.estadisticas() == {'peticiones': 3, 'fallos': 2}
+
+
+def test_no_reintenta_los_errores_del_cliente(servidor, tmp_path):
+    servidor.respuestas = [404]
+    cliente = ClienteAPI(reintentos=3, espera_base_reintento=0.01, peticiones_por_segundo=0)
+    fichero = tmp_path / '1.json'
+
+    with pytest.raises(requests.HTTPError):
+        cliente.descargar(url(servidor, '/consulta/1'), str(fichero))
+    assert cliente.estadisticas()['peticiones'] == 1
+    assert list(tmp_path.iterdir()) == []
+
+    cliente.descargar(url(servidor, '/consulta/1'), str(fichero))
+    assert json.loads(fichero.read_text(encoding='utf-8')) == {'ruta': '/consulta/1'}
+
+
+def test_agota_los_reintentos(servidor):
+    servidor.respuestas = [500] * 3
+    cliente = ClienteAPI(reintentos=2, espera_base_reintento=0.01, peticiones_por_segundo=50)
+
+    with pytest.raises(requests.HTTPError):
+        cliente.obtener_json(url(servidor, '/jerarquia/1'))
+    assert cliente.estadisticas() == {'peticiones': 3, 'fallos': 3}
+
+
+def turnos(peticiones):
+    cliente_api.peticiones_por_segundo = 20
+    instantes = []
+    for _ in range(peticiones):
+        cliente_api.esperar_turno()
+        instantes.append(time.monotonic())
+    return instantes
+
+
+def test_los_limites_compartidos_son_comunes_a_los_procesos():
+    limites = crear_limites_compartidos({'cliente_api': {'peticiones_simultaneas': 2}})
+    with ProcessPoolExecutor(max_workers=2, initializer=cliente_api.compartir_limites, initargs=limites) as executor:
+        instantes = sorted(instante for resultado in executor.map(turnos, [5, 5]) for instante in resultado)
+
+    assert len(instantes) == 10
+    assert min(b - a for a, b in zip(instantes, instantes[1:])) >= 0.045
@@ -0,0 +1,106 @@
+import pandas as pd
+
+from src.ieca.datos import Datos
+from src.ieca.repositorio_mapas import repositorio_mapas
+
+ESTADO = 'estado Apoyo gubernamental IyD agricola'
+BORRAR = 'Variación en lo que va de año'
+
+
+class IndicePrueba:
+    def traducir(self, codigos, alternativa=None):
+        return codigos
+
+
+class JerarquiaPrueba:
+    """Sustituye a :class:`src.ieca.jerarquia.Jerarquia` conservando los códigos de las observaciones."""
+
+    def __init__(self, alias, datos=None):
+        self.metadatos = {'alias': alias}
+        self.id_jerarquia = alias + '-1'
+        self.datos = datos
+
+    def indice_codigos(self):
+        return IndicePrueba()
+
+
+def desacoplar_original(datos, jerarquias, medidas, configuracion_global):
+    """Desacoplado por medidas anterior a la pasada única, con una medida de estado que no va seguida de otra."""
+    columnas_jerarquia = list(jerarquias)
+    df = pd.DataFrame(columns=columnas_jerarquia + ['INDICATOR', 'OBS_VALUE'])
+    medidas = list(medidas)
+    for medida in medidas:
+        if medida in configuracion_global['medidas_reemplazando_obs_status']:
+            medidas.remove(medida)
+            datos = datos.rename(columns={medida: 'OBS_STATUS'})
+            columnas_jerarquia = columnas_jerarquia + ['OBS_STATUS']
+    for medida in medidas:
+        if medida not in configuracion_global['indicadores_a_borrar']:
+            valores_medida = datos[columnas_jerarquia + [medida]].copy()
+            valores_medida.loc[:, 'INDICATOR'] = medida
+            valores_medida.columns = columnas_jerarquia + ['OBS_VALUE', 'INDICATOR']
+            df = pd.concat([df, valores_medida[columnas_jerarquia + ['INDICATOR', 'OBS_VALUE']]])
+    return df
+
+
+def test_desacoplar_medidas_con_estado_e_indicadores_borrados():
+    configuracion_global = {'dimensiones_temporales': [], 'medidas_reemplazando_obs_status': [ESTADO],
+                            'indicadores_a_borrar': [BORRAR],
+                            'politica_tipos': {'obs_value': 'texto', 'informe_memoria': False}}
+    medidas = ['Valor', ESTADO, BORRAR, 'Tasa']
+    observaciones = pd.DataFrame({'D_SEXO_0': pd.Categorical(['H', 'M', 'T']),
+                                  'D_SEXO_0_aux': pd.Categorical(['1', '2', '3']),
+                                  'Valor': ['10', '20', '30'], ESTADO: ['P', '', 'A'], BORRAR: ['1', '2', '3'],
+                                  'Tasa': ['0.1', '0.2', '-']})
+    original = desacoplar_original(observaciones, ['D_SEXO_0'], medidas, configuracion_global)
+
+    datos = Datos('1', configuracion_global, 'PRUEBA', 'Anual', observaciones, [JerarquiaPrueba('D_SEXO_0')],
+                  [{'des': medida} for medida in medidas])
+    df = datos.datos_por_observacion
+
+    assert list(df.columns) == list(original.columns) + ['FREQ']
+    assert isinstance(df['INDICATOR'].dtype, pd.CategoricalDtype)
+    assert list(df['INDICATOR'].cat.categories) == ['Valor', 'Tasa']
+    assert df['INDICATOR'].tolist() == original['INDICATOR'].tolist() == ['Valor'] * 3 + ['Tasa'] * 3
+    assert df['OBS_STATUS'].tolist() == original['OBS_STATUS'].tolist() == ['P', '', 'A'] * 2
+    assert df[list(original.columns)].astype(str).equals(original.astype(str))
+    assert df.index.tolist() == original.index.tolist()
+
+
+def test_desacoplar_varias_medidas_de_estado_consecutivas():
+    configuracion_global = {'dimensiones_temporales': [], 'medidas_reemplazando_obs_status': [ESTADO, 'Estado 2'],
+                            'indicadores_a_borrar': [],
+                            'politica_tipos': {'obs_value': 'texto', 'informe_memoria': False}}
+    medidas = [ESTADO, 'Estado 2', 'Valor']
+    observaciones = pd.DataFrame({ESTADO: ['P', '', None], 'Estado 2': ['A', 'E', 'A'], 'Valor': ['1', '2', '3']})
+
+    datos = Datos('1', configuracion_global, 'PRUEBA', 'Anual', observaciones, [],
+                  [{'des': medida} for medida in medidas])
+    df = datos.datos_por_observacion
+
+    # Ninguna medida de estado se queda como indicador al borrar la anterior de la lista
+    assert df['INDICATOR'].tolist() == ['Valor'] * 3
+    assert df['OBS_STATUS'].tolist() == ['P', 'E', 'A']
+
+
+def test_extender_mapa_rellena_target_y_cod_de_los_terminos_nuevos(tmp_path):
+    (tmp_path / 'D_SEXO_0').write_text('SOURCE,COD,NAME,TARGET\nH,1,Hombres,M\n', encoding='utf-8')
+    configuracion_global = {'dimensiones_temporales': [], 'medidas_reemplazando_obs_status': [],
+                            'indicadores_a_borrar': [], 'dimensiones_a_mapear': ['D_SEXO_0'],
+                            'directorio_mapas_dimensiones': str(tmp_path),
+                            'politica_tipos': {'obs_value': 'texto', 'informe_memoria': False}}
+    jerarquia = JerarquiaPrueba('D_SEXO_0', pd.DataFrame(
+        {'ID': ['H', 'M'], 'COD': ['1', '6'], 'NAME': ['Hombres', 'Mujeres'], 'DESCRIPTION': ['', ''],
+         'PARENTCODE': ['', ''], 'ORDER': ['1', '2']}, dtype='string'))
+    observaciones = pd.DataFrame({'D_SEXO_0': pd.Categorical(['H', 'M']), 'D_SEXO_0_aux': pd.Categorical(['1', '6']),
+                                  'Valor': ['10', '20']})
+    datos = Datos('1', configuracion_global, 'PRUEBA', 'Anual', observaciones, [jerarquia], [{'des': 'Valor'}])
+
+    try:
+        datos.extender_mapa_nuevos_terminos()
+        mapa = repositorio_mapas.obtener(str(tmp_path / 'D_SEXO_0'))
+    finally:
+        repositorio_mapas.vaciar()
+
+    assert mapa.astype(object).where(mapa.notna(), None).values.tolist() == [['H', '1', 'Hombres', 'M'],
+                                                                              ['M', '6', 'Mujeres', 'M']]
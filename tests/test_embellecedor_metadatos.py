@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip('bs4')
+
+from src.utiles.embellecedor_metadatos import embellecer_directorio  # noqa: E402
+
+INFORME = """\0\0<html><head><style>.cabecera {background: #da0d14}</style></head><body>
+<img class="Cl-Header-Img-Catalog" src="istat.png"/>
+<table><tr><td>FULL_TEST</td></tr><tr><td>Datos</td></tr></table>
+<div class="col-1">Italiano</div><div class="col-1">Español</div>
+</body></html>"""
+
+
+def test_embellecer_directorio(tmp_path):
+    (tmp_path / 'ECTA').mkdir()
+    informe = tmp_path / 'ECTA' / 'REPORT_ECTA_1.html'
+    informe.write_text(INFORME, encoding='utf-8')
+
+    assert embellecer_directorio(str(tmp_path), trabajos=2) == [str(informe)]
+    html = informe.read_text(encoding='utf-8')
+    assert '\0' not in html and '#007932' in html and 'da0d14' not in html
+    assert 'FULL_TEST' not in html and 'Datos' in html
+    assert 'Italiano' not in html and 'Español' in html
+    assert 'src="../../logo.png"' in html
+
+    # Los informes sin cambios desde la última ejecución se omiten
+    assert embellecer_directorio(str(tmp_path)) == []
+    informe.write_text(INFORME, encoding='utf-8')
+    assert embellecer_directorio(str(tmp_path)) == [str(informe)]
+    assert informe.read_text(encoding='utf-8') == html
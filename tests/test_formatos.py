@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from src.ieca.formatos import EscritorTabla, comprobar_formato, esquema_union, exportar_csv, guardar_tabla, \
+    leer_tabla, muestra_tabla
+
+DATOS = pd.DataFrame({'TERRITORIO': ['ES', 'ES', 'AN'], 'FREQ': ['A', 'A', 'A'], 'OBS_VALUE': ['1.5', pd.NA, '3']},
+                     dtype='string')
+
+
+def test_csv_ida_y_vuelta(tmp_path):
+    fichero = guardar_tabla(DATOS, str(tmp_path / 'datos'))
+
+    assert fichero.endswith('datos.csv')
+    assert open(fichero, encoding='utf-8').readline().strip() == 'TERRITORIO;FREQ;OBS_VALUE'
+    pd.testing.assert_frame_equal(leer_tabla(str(tmp_path / 'datos')), DATOS)
+    with pytest.raises(ValueError):
+        comprobar_formato('xlsx')
+
+
+@pytest.mark.parametrize('formato', ['parquet', 'feather'])
+def test_formato_columnar_y_exportacion(tmp_path, formato):
+    pytest.importorskip('pyarrow')
+    (tmp_path / 'sdmx').mkdir()
+    fichero = guardar_tabla(DATOS, str(tmp_path / 'sdmx' / 'datos'), formato)
+
+    assert fichero.endswith('datos.' + formato)
+    assert leer_tabla(fichero, dtype=None)['TERRITORIO'].dtype == 'category'
+    pd.testing.assert_frame_equal(leer_tabla(str(tmp_path / 'sdmx' / 'datos')), DATOS)
+    assert exportar_csv(str(tmp_path)) == [str(tmp_path / 'sdmx' / 'datos.csv')]
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'sdmx' / 'datos.csv', sep=';', dtype='string'), DATOS)
+
+
+def test_escritor_por_partes_igual_que_la_union(tmp_path):
+    partes = [pd.DataFrame({'TERRITORIO': ['ES', 'AN'], 'OBS_VALUE': [1, 2]}),
+              pd.DataFrame({'SEXO': pd.Series(['H'], dtype='category'), 'OBS_VALUE': [0.5], 'TERRITORIO': ['SE']}),
+              pd.DataFrame({'TERRITORIO': pd.Series([], dtype='string'), 'OBS_VALUE': pd.Series([], dtype='int64')})]
+
+    with EscritorTabla(str(tmp_path / 'union'), *esquema_union([muestra_tabla(parte) for parte in partes])) \
+            as escritor:
+        for parte in partes:
+            escritor.escribir(parte)
+
+    assert escritor.filas == 3
+    with open(escritor.fichero, encoding='utf-8') as fichero:
+        assert fichero.read() == pd.concat(partes).to_csv(sep=';', index=False)
+
+
+def test_escritor_con_constantes_por_bloques(tmp_path):
+    extendidos = DATOS.copy()
+    extendidos[['SEXO', 'EDAD']] = '_Z'
+    constantes = {'SEXO': '_Z', 'EDAD': '_Z'}
+
+    with EscritorTabla(str(tmp_path / 'extendidos'), *esquema_union([muestra_tabla(DATOS).assign(**constantes)]),
+                       filas_bloque=2) as escritor:
+        escritor.escribir(DATOS, constantes)
+
+    assert list(DATOS.columns) == ['TERRITORIO', 'FREQ', 'OBS_VALUE']
+    with open(escritor.fichero, encoding='utf-8') as fichero:
+        assert fichero.read() == extendidos.to_csv(sep=';', index=False)
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from src.ieca.indices import IndiceCodigos
+
+
+def test_traduccion_usa_el_codigo_alternativo():
+    jerarquia = pd.DataFrame({'ID': ['ES', 'AN', 'SE'], 'COD': ['1', '2', '3']}, dtype='string')
+    indice = IndiceCodigos(jerarquia, 'COD', 'ID')
+
+    valores = pd.Series(pd.Categorical(['2', '9', '3', '9']))
+    alternativa = pd.Series(['1', '1', None, '8'])
+    traduccion = indice.traducir(valores, alternativa=alternativa)
+
+    assert list(traduccion[:3]) == ['AN', 'ES', 'SE']
+    assert pd.isna(traduccion[3])
+
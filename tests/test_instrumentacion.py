@@ -0,0 +1,35 @@
+import csv
+import json
+
+import pytest
+
+from src.ieca.instrumentacion import Instrumentacion, guardar_informe
+
+
+def test_mediciones_e_informe(tmp_path):
+    instrumentacion = Instrumentacion()
+    instrumentacion.configurar({'instrumentacion': {'activa': True, 'directorio_informes': str(tmp_path),
+                                                    'perfilar_consulta': '1', 'perfilador': 'cProfile'}}, 'IPC')
+
+    with instrumentacion.perfilar('1'):
+        with instrumentacion.medir('mapear_valores', '1', 10) as medicion:
+            medicion['filas_salida'] = 8
+    with pytest.raises(KeyError):
+        with instrumentacion.medir('extender_mapa_nuevos_terminos', '1', 8):
+            raise KeyError('TERRITORIO')
+
+    registros = instrumentacion.reiniciar()
+    assert [registro['etapa'] for registro in registros] == ['mapear_valores', 'extender_mapa_nuevos_terminos']
+    assert registros[0]['actividad'] == 'IPC'
+    assert (registros[0]['filas_entrada'], registros[0]['filas_salida']) == (10, 8)
+    assert registros[0]['tiempo'] >= 0 and registros[0]['tiempo_cpu'] >= 0
+    assert registros[1]['error'] == 'KeyError'
+    assert instrumentacion.registros == []
+    assert (tmp_path / 'perfil_IPC_1.prof').exists()
+
+    fichero_json, fichero_csv = guardar_informe(registros, str(tmp_path), 'ejecucion')
+    with open(fichero_json, encoding='utf-8') as fichero:
+        assert json.load(fichero) == registros
+    with open(fichero_csv, encoding='utf-8') as fichero:
+        assert [fila['etapa'] for fila in csv.DictReader(fichero, delimiter=';')] == \
+               ['mapear_valores', 'extender_mapa_nuevos_terminos']
@@ -0,0 +1,57 @@
+import itertools
+import sys
+
+from src.ieca.jerarquia import aplanar_arbol
+
+PROPIEDADES = ['id', 'cod', 'label', 'des', 'parentId', 'order']
+
+
+def aplanar_recursivamente(raiz, propiedades):
+    def recorrer_arbol_recursivamente(datos_jerarquia):
+        datos_nivel_actual = [[jerarquia[propiedad] for propiedad in propiedades] for jerarquia in datos_jerarquia]
+
+        if all(jerarquia['children'] == [] or jerarquia['isLastLevel'] for jerarquia in datos_jerarquia):
+            return datos_nivel_actual
+
+        return datos_nivel_actual + list(itertools.chain(
+            *[recorrer_arbol_recursivamente(jerarquia['children']) for jerarquia in datos_jerarquia]))
+
+    return recorrer_arbol_recursivamente([raiz])
+
+
+def nodo(id_nodo, hijos=(), ultimo_nivel=False):
+    return {'id': id_nodo, 'cod': id_nodo, 'label': id_nodo, 'des': id_nodo, 'parentId': None, 'order': '0',
+            'children': list(hijos), 'isLastLevel': ultimo_nivel}
+
+
+def arbol_sintetico(profundidad, hijos):
+    raiz = nodo('0')
+    actual = raiz
+    for nivel in range(1, profundidad + 1):
+        actual['children'] = [nodo(f'{nivel}.{hijo}') for hijo in range(hijos)]
+        actual = actual['children'][0]
+    return raiz
+
+
+def test_aplanar_arbol_igual_que_el_recorrido_recursivo():
+    raiz = nodo('R', [nodo('A', [nodo('A1'), nodo('A2', [nodo('A21')])]),
+                      nodo('B', [nodo('B1', [nodo('B11')], ultimo_nivel=True)]),
+                      nodo('C')])
+
+    filas, profundidades, padres = aplanar_arbol(raiz, PROPIEDADES)
+
+    assert filas == aplanar_recursivamente(raiz, PROPIEDADES)
+    ids = [fila[0] for fila in filas]
+    assert ids == ['R', 'A', 'B', 'C', 'A1', 'A2', 'A21', 'B1']
+    assert list(profundidades) == [0, 1, 1, 1, 2, 2, 3, 2]
+    assert [ids[padre] if padre >= 0 else None for padre in padres] == [None, 'R', 'R', 'R', 'A', 'A', 'A2', 'B']
+
+
+def test_aplanar_arbol_mas_profundo_que_el_limite_de_recursion():
+    profundidad = sys.getrecursionlimit() + 10
+    filas, profundidades, padres = aplanar_arbol(arbol_sintetico(profundidad, 2), PROPIEDADES)
+
+    assert len(filas) == 2 * profundidad + 1
+    assert profundidades.max() == profundidad
+    assert filas[padres[-1]][0] == f'{profundidad - 1}.0'
+    assert [fila[0] for fila in filas[-2:]] == [f'{profundidad}.0', f'{profundidad}.1']
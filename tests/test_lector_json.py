@@ -0,0 +1,65 @@
+import contextlib
+import json
+import logging
+
+import src.ieca.consulta as modulo_consulta
+from src.ieca.consulta import Consulta
+from src.ieca.lector_json import LectorJSON, leer_consulta_por_bloques
+
+
+def test_lectura_por_bloques_equivale_a_json_load(tmp_path):
+    consulta = {'metainfo': {'id': 1, 'title': 'Prueba "con" comillas'}, 'hierarchies': [{'alias': 'D_SEXO_0'}],
+                'measures': [{'des': 'Población'}],
+                'data': [[{'cod': ['1', str(i)]}, {'val': i * 1.5, 'format': ''}] for i in range(25)]}
+    fichero = tmp_path / 'consulta.json'
+    fichero.write_text(json.dumps(consulta, ensure_ascii=False), encoding='utf-8')
+
+    cabecera, bloques = leer_consulta_por_bloques(str(fichero), 10)
+    bloques = list(bloques)
+
+    assert [len(bloque) for bloque in bloques] == [10, 10, 5]
+    assert {**cabecera, 'data': [fila for bloque in bloques for fila in bloque]} == consulta
+
+
+def test_lector_decodifica_valores_partidos_entre_lecturas(tmp_path):
+    fichero = tmp_path / 'lista.json'
+    fichero.write_text('[123456, "a\\"b", {"x": [1, 2]}, 7.25e2]', encoding='utf-8')
+
+    with open(fichero, 'r', encoding='utf-8') as json_file:
+        assert list(LectorJSON(json_file, tamano_lectura=3).elementos()) == [123456, 'a"b', {'x': [1, 2]}, 725.0]
+
+
+def test_json_truncado_se_vuelve_a_descargar(tmp_path, monkeypatch):
+    consulta = {'metainfo': {'id': 1}, 'hierarchies': [{'alias': 'D_SEXO_0'}], 'measures': [{'des': 'Valor'}],
+                'data': [[{'cod': ['1', str(i)]}, {'val': i, 'format': str(i)}] for i in range(25)]}
+    fichero = tmp_path / 'consulta.json'
+    fichero.write_text(json.dumps(consulta)[:-40], encoding='utf-8')
+    descargas = []
+
+    def descargar_consulta(url_consulta, directorio_json, logger):
+        descargas.append(url_consulta)
+        fichero.write_text(json.dumps(consulta), encoding='utf-8')
+        return True
+
+    monkeypatch.setattr(modulo_consulta, 'descargar_consulta', descargar_consulta)
+    instancia = Consulta.__new__(Consulta)
+    instancia.url_consulta = '1'
+    instancia.logger = logging.getLogger('prueba')
+    instancia.configuracion_global = {'lectura_json_por_bloques': True, 'tamano_bloque_observaciones': 10}
+
+    respuesta = instancia.solicitar_json(str(fichero))
+
+    assert descargas == ['1'] and instancia.payload_modificado
+    assert list(respuesta['data']['Valor']) == list(range(25))
+
+
+def test_bloques_cerrados_cierran_el_fichero(tmp_path):
+    fichero = tmp_path / 'consulta.json'
+    fichero.write_text(json.dumps({'metainfo': {}, 'hierarchies': [], 'measures': [], 'data': [[1], [2], [3]]}),
+                       encoding='utf-8')
+
+    _, bloques = leer_consulta_por_bloques(str(fichero), 1)
+    with contextlib.closing(bloques):
+        assert next(bloques) == [[1]]
+
+    assert bloques.gi_frame is None
@@ -0,0 +1,52 @@
+import os
+
+from src.ieca import manifiesto as modulo_manifiesto
+from src.ieca.manifiesto import Manifiesto
+
+
+def test_manifiesto_detecta_entradas_y_salidas_modificadas(tmp_path):
+    configuracion_global = {clave: str(tmp_path / clave) for clave in
+                            ('directorio_jerarquias', 'directorio_datos', 'directorio_datos_SDMX',
+                             'directorio_mapas_dimensiones')}
+    configuracion_global['trabajadores_consultas'] = 4
+    for directorio in ('directorio_datos_SDMX', 'directorio_mapas_dimensiones'):
+        os.makedirs(os.path.join(configuracion_global[directorio], 'IPC'), exist_ok=True)
+    consulta = tmp_path / '1.json'
+    consulta.write_text('{"data": []}', encoding='utf-8')
+    mapa = tmp_path / 'directorio_mapas_dimensiones' / 'INDICATOR'
+    mapa.write_text('SOURCE,COD,NAME,TARGET\n', encoding='utf-8')
+    salida = tmp_path / 'directorio_datos_SDMX' / 'IPC' / 'configuracion.yaml'
+    salida.write_text('NOMBRE_DSD: DSD_IPC\n', encoding='utf-8')
+
+    manifiesto = Manifiesto(configuracion_global, {'categoria': 'IPC'}, 'IPC')
+    assert not manifiesto.vigente([str(consulta)])
+    manifiesto.guardar([str(consulta)], ['INDICATOR'])
+    assert manifiesto.leer()['salidas'] == [str(salida)]
+    assert manifiesto.vigente([str(consulta)])
+
+    configuracion_global['trabajadores_consultas'] = 1
+    assert Manifiesto(configuracion_global, {'categoria': 'IPC'}, 'IPC').vigente([str(consulta)])
+    assert not Manifiesto(configuracion_global, {'categoria': 'OTRA'}, 'IPC').vigente([str(consulta)])
+
+    mapa.write_text('SOURCE,COD,NAME,TARGET\nA,,,A\n', encoding='utf-8')
+    assert not manifiesto.vigente([str(consulta)])
+    manifiesto.guardar([str(consulta)], ['INDICATOR'])
+
+    os.remove(salida)
+    assert not manifiesto.vigente([str(consulta)])
+
+
+def test_manifiesto_caduca_al_cambiar_el_codigo(tmp_path, monkeypatch):
+    configuracion_global = {clave: str(tmp_path / clave) for clave in
+                            ('directorio_jerarquias', 'directorio_datos', 'directorio_datos_SDMX',
+                             'directorio_mapas_dimensiones')}
+    manifiesto = Manifiesto(configuracion_global, {'categoria': 'IPC'}, 'IPC')
+    manifiesto.guardar([], [])
+    assert manifiesto.vigente([])
+
+    codigo = tmp_path / 'codigo'
+    codigo.mkdir()
+    (codigo / 'datos.py').write_text('VERSION = 2\n', encoding='utf-8')
+    resumen = modulo_manifiesto.resumen_codigo(str(codigo))
+    monkeypatch.setattr(modulo_manifiesto, 'resumen_codigo', lambda: resumen)
+    assert not manifiesto.vigente([])
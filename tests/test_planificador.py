@@ -0,0 +1,60 @@
+import logging
+
+import src.ieca.planificador
+from src.ieca.planificador import Planificador
+
+
+class ActividadPrueba:
+    """Sustituye a :class:`src.ieca.actividad.Actividad` sin consultar la API. La actividad **FALLA** falla al
+    ejecutarse y la actividad **PARCIAL** tiene una consulta fallida."""
+
+    def __init__(self, configuracion_global, configuracion_actividad, plantilla_configuracion_actividad, actividad):
+        self.actividad = actividad
+        self.consultas = {}
+        self.consultas_fallidas = {}
+        self.logger = logging.getLogger(f'Actividad [{actividad}]')
+
+    def sin_cambios(self):
+        return False
+
+    def generar_consultas(self):
+        self.logger.info('Generando consultas de %s', self.actividad)
+        self.consultas = {'1': None, '2': None}
+        if self.actividad == 'PARCIAL':
+            self.consultas_fallidas = {'3': ValueError('JSON corrupto')}
+
+    def ejecutar(self):
+        if self.actividad == 'FALLA':
+            raise RuntimeError('Acción fallida')
+
+
+def test_planificador_resume_las_actividades_y_sus_registros(monkeypatch, tmp_path, caplog):
+    # Los procesos del planificador se crean con fork y heredan la actividad sustituida
+    monkeypatch.setattr(src.ieca.planificador, 'Actividad', ActividadPrueba)
+    configuracion_global = {'directorio_logs': str(tmp_path / 'logs'), 'ejecucion_incremental': False,
+                            'instrumentacion': {'activa': False},
+                            'cliente_api': {'peticiones_simultaneas': 4}}
+    actividades = ['OK', 'FALLA', 'PARCIAL']
+    planificador = Planificador(configuracion_global, {actividad: {} for actividad in actividades}, {}, trabajos=2)
+
+    with caplog.at_level(logging.INFO):
+        resultados = planificador.ejecutar(actividades)
+
+    assert [(resultado['actividad'], resultado['estado'], resultado['consultas'], resultado['consultas_fallidas'])
+            for resultado in resultados] == \
+        [('OK', 'OK', 2, []), ('FALLA', 'ERROR', 0, []), ('PARCIAL', 'PARCIAL', 2, ['3'])]
+
+    resumen = next(registro.getMessage() for registro in caplog.records
+                   if registro.getMessage().startswith('Resumen de la ejecución'))
+    tabla = [[celda.strip() for celda in linea.split(' | ')] for linea in resumen.split('\n')[1:]]
+    assert tabla[0] == ['ACTIVIDAD', 'ESTADO', 'TIEMPO (s)', 'CONSULTAS', 'FALLIDAS']
+    assert [(fila[0], fila[1], fila[3], fila[4]) for fila in tabla[2:]] == \
+        [('OK', 'OK', '2', ''), ('FALLA', 'ERROR', '0', ''), ('PARCIAL', 'PARCIAL', '2', '3')]
+    assert any("Actividades con errores: ['FALLA', 'PARCIAL']" in registro.getMessage()
+               for registro in caplog.records)
+
+    for actividad in actividades:
+        registro = (tmp_path / 'logs' / f'{actividad}.log').read_text(encoding='utf-8')
+        assert f'Generando consultas de {actividad}' in registro
+        assert all(f'Generando consultas de {otra}' not in registro for otra in actividades if otra != actividad)
+    assert 'Acción fallida' in (tmp_path / 'logs' / 'FALLA.log').read_text(encoding='utf-8')
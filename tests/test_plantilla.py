@@ -18,4 +18,5 @@ def test_consulta_positiva():
         actividad = Actividad(configuracion_global, configuracion_actividades[nombre_actividad],
                               configuracion_plantilla_actividad, nombre_actividad)
         actividad.generar_consultas()
+        assert not actividad.consultas_fallidas
         actividad.ejecutar()
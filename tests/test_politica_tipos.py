@@ -0,0 +1,65 @@
+import pandas as pd
+
+from src.ieca.datos import Datos
+from src.ieca.jerarquia import compactar_jerarquia
+
+
+def crear_datos(obs_value):
+    configuracion_global = {'dimensiones_temporales': [], 'medidas_reemplazando_obs_status': [],
+                            'indicadores_a_borrar': [],
+                            'politica_tipos': {'obs_value': obs_value, 'informe_memoria': True}}
+    observaciones = pd.DataFrame({'Valor': ['1.5', '-', '', '2', '1.5']})
+    return Datos('1', configuracion_global, 'IPC', 'Anual', observaciones, [], [{'des': 'Valor'}])
+
+
+def test_politica_obs_value():
+    texto = crear_datos('texto')
+    assert texto.datos_por_observacion['OBS_VALUE'].tolist() == ['1.5', '-', '', '2', '1.5']
+    assert isinstance(texto.datos_por_observacion['FREQ'].dtype, pd.CategoricalDtype)
+
+    categorica = crear_datos('categorica')
+    assert categorica.datos_por_observacion.astype(str).equals(texto.datos_por_observacion.astype(str))
+
+    numerica = crear_datos('numerica')
+    assert numerica.datos_por_observacion['OBS_VALUE'].dtype == 'float64'
+    assert numerica.datos_por_observacion['OBS_STATUS'].isna().tolist() == [True, False, True, True, True]
+    assert numerica.datos_por_observacion['OBS_STATUS'][1] == '-'
+
+    numerica.borrar_filas([{'OBS_VALUE': ''}, {'OBS_VALUE': '-'}])
+    texto.borrar_filas([{'OBS_VALUE': ''}, {'OBS_VALUE': '-'}])
+    assert numerica.datos_por_observacion['OBS_VALUE'].tolist() == [1.5, 2, 1.5]
+    assert 'OBS_STATUS' not in numerica.datos_por_observacion.columns
+    assert texto.datos_por_observacion['OBS_VALUE'].tolist() == ['1.5', '2', '1.5']
+
+
+def test_borrar_filas_igual_con_politica_texto_y_numerica():
+    filas = {}
+    for politica in ('texto', 'numerica'):
+        configuracion_global = {'dimensiones_temporales': [], 'medidas_reemplazando_obs_status': ['Estado'],
+                                'indicadores_a_borrar': [],
+                                'politica_tipos': {'obs_value': politica, 'informe_memoria': False}}
+        observaciones = pd.DataFrame({'Valor': ['1.5', '-', '', '', '-', '2', None],
+                                      'Estado': ['', '', 'P', '', 'P', 'P', '']})
+        datos = Datos('1', configuracion_global, 'IPC', 'Anual', observaciones, [],
+                      [{'des': 'Valor'}, {'des': 'Estado'}])
+        # Los estados mapeados dejan de coincidir con los valores originales
+        datos.datos_por_observacion['OBS_STATUS'] = datos.datos_por_observacion['OBS_STATUS'].astype(object) \
+            .replace({'-': 'M'})
+
+        datos.borrar_filas([{'OBS_VALUE': ''}, {'OBS_VALUE': '-'}])
+        filas[politica] = datos.datos_por_observacion
+
+    assert filas['numerica'].index.tolist() == filas['texto'].index.tolist() == [0, 5, 6]
+    assert filas['numerica']['OBS_VALUE'].tolist()[:2] == [1.5, 2]
+
+
+def test_compactar_jerarquia_sin_cambiar_el_csv():
+    jerarquia = pd.DataFrame({'ID': ['A', 'B', '_Z'], 'PARENTCODE': ['', 'A', ''], 'ORDER': ['1', '2', '']},
+                             dtype='string')
+
+    compacta = compactar_jerarquia(jerarquia)
+
+    assert isinstance(compacta['PARENTCODE'].dtype, pd.CategoricalDtype)
+    assert compacta['ORDER'].dtype == 'Int32'
+    assert compacta.to_csv(sep=';', index=False) == jerarquia.to_csv(sep=';', index=False)
+    assert compactar_jerarquia(jerarquia.assign(ORDER=['01', '2', '']))['ORDER'].dtype != 'Int32'
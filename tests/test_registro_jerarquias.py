@@ -0,0 +1,37 @@
+import pandas as pd
+
+from src.ieca.registro_jerarquias import RegistroJerarquias
+
+
+def jerarquia(filas):
+    return pd.DataFrame({'ID': [str(i) for i in range(filas)], 'COD': [str(i) for i in range(filas)]},
+                        dtype='string')
+
+
+def test_registro_carga_una_sola_vez():
+    registro = RegistroJerarquias()
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return jerarquia(10)
+
+    datos = registro.obtener(('IPC', 'D_TEMPORAL_0-d1_j5'), cargar)
+    assert registro.obtener(('IPC', 'D_TEMPORAL_0-d1_j5'), cargar) is datos
+    assert len(cargas) == 1
+    assert registro.estadisticas()['aciertos'] == 1
+    assert registro.estadisticas()['fallos'] == 1
+
+
+def test_registro_expulsa_la_jerarquia_menos_usada():
+    registro = RegistroJerarquias()
+    registro.configurar({'memoria_maxima_jerarquias_mb': 0.03})
+
+    registro.obtener('A', lambda: jerarquia(100))
+    registro.obtener('B', lambda: jerarquia(100))
+    registro.obtener('A', lambda: jerarquia(100))
+    registro.obtener('C', lambda: jerarquia(100))
+
+    assert 'B' not in registro.jerarquias
+    assert 'A' in registro.jerarquias
+    assert registro.estadisticas()['expulsiones'] >= 1
@@ -0,0 +1,52 @@
+import os
+
+import pandas as pd
+
+from src.ieca.repositorio_mapas import RepositorioMapas
+
+
+def test_mapa_se_extiende_en_memoria_y_se_guarda_una_vez(tmp_path):
+    fichero = tmp_path / 'INDICATOR'
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,X\n', encoding='utf-8')
+    repositorio = RepositorioMapas()
+
+    indice = repositorio.indice(str(fichero))
+    assert repositorio.indice(str(fichero)) is indice
+    assert pd.isna(indice.traducir(pd.Series(['A', 'B']))[1])
+
+    datos = repositorio.obtener(str(fichero))
+    repositorio.actualizar(str(fichero), pd.concat([datos, pd.DataFrame({'SOURCE': ['B'], 'TARGET': ['YY']})]))
+    assert list(repositorio.indice(str(fichero)).traducir(pd.Series(['A', 'B']))) == ['X', 'YY']
+    assert fichero.read_text(encoding='utf-8') == 'SOURCE,COD,NAME,TARGET\nA,,,X\n'
+
+    # Otra actividad extiende el mapa en disco antes de que se guarde.
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,X\nC,,,Z\n', encoding='utf-8')
+    assert repositorio.guardar() == [os.path.abspath(fichero)]
+    assert fichero.read_text(encoding='utf-8') == 'SOURCE,COD,NAME,TARGET\nA,,,X\nC,,,Z\nB,,,YY\n'
+    assert repositorio.guardar() == []
+    assert repositorio.estadisticas() == {'mapas': 1, 'lecturas': 1, 'escrituras': 1}
+
+
+def test_mapa_sin_extensiones_se_relee_al_cambiar_el_fichero(tmp_path):
+    fichero = tmp_path / 'INDICATOR'
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,X\n', encoding='utf-8')
+    repositorio = RepositorioMapas()
+    assert pd.isna(repositorio.indice(str(fichero)).traducir(pd.Series(['B']))[0])
+
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,X\nB,,,YY\n', encoding='utf-8')
+    assert list(repositorio.indice(str(fichero)).traducir(pd.Series(['A', 'B']))) == ['X', 'YY']
+
+
+def test_mapa_cambiado_en_disco_conserva_cod_y_name_de_memoria(tmp_path):
+    fichero = tmp_path / 'D_SEXO_0'
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,X\nB,b,Bruto,Y\n', encoding='utf-8')
+    repositorio = RepositorioMapas()
+    repositorio.actualizar(str(fichero), pd.DataFrame({'SOURCE': ['A', 'B', 'C'], 'COD': ['a', '', 'c'],
+                                                       'NAME': ['Alto', None, 'Corto'], 'TARGET': ['X', 'Y', 'Z']}))
+
+    # Otra actividad cambia el mapa en disco antes de que se guarde.
+    fichero.write_text('SOURCE,COD,NAME,TARGET\nA,,,XX\nB,b,Bruto,Y\nD,d,,W\n', encoding='utf-8')
+    repositorio.guardar()
+
+    assert fichero.read_text(encoding='utf-8') == \
+        'SOURCE,COD,NAME,TARGET\nA,a,Alto,XX\nB,b,Bruto,Y\nD,d,,W\nC,c,Corto,Z\n'
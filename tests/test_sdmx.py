@@ -0,0 +1,140 @@
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from src.ieca.almacen_metadatos import almacen_metadatos
+from src.ieca.sdmx import componentes_estructura, escribir_sdmx_csv, generar_estructuras
+from src.ieca.validador import validar_dataflow
+
+CONCEPTOS = """
+TEMPORAL:
+  tipo: Time
+  concept_scheme: urn:sdmx:org.sdmx.infomodel.conceptscheme.ConceptScheme=SDMX:CROSS_DOMAIN_CONCEPTS(2.0)
+  concept: TIME_PERIOD
+  codelist: null
+TERRITORIO:
+  tipo: dimension
+  concept_scheme: CROSS_DOMAIN_CONCEPTS
+  concept: REF_AREA
+  codelist:
+    agency: IECA
+    id: CL_REF_AREA
+    version: 1.0
+OBS_VALUE:
+  tipo: Primary
+  concept_scheme: none
+  concept: None
+  codelist: null
+"""
+ESPACIOS = {'str': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure',
+            'com': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common'}
+
+
+def test_estructuras_y_datos_sdmx(tmp_path):
+    (tmp_path / 'conceptos_codelist.yaml').write_text(CONCEPTOS, encoding='utf-8')
+    (tmp_path / 'mapas').mkdir()
+    configuracion_global = {'traduccion': {'fichero': str(tmp_path / 'traducciones.yaml')},
+                            'fichero_conceptos_codelist': str(tmp_path / 'conceptos_codelist.yaml'),
+                            'directorio_mapas_dimensiones': str(tmp_path / 'mapas'),
+                            'dimensiones_a_mapear': ['D_EDAD_0'], 'sdmx': {'agencia': 'IECA', 'version': '1.0'}}
+    almacen_metadatos.configurar(configuracion_global)
+    pd.DataFrame({'ID': ['AN', '04', '', '04'], 'NAME': ['(01) Andalucía', '(02) Almería', '(03) Otro', 'x'],
+                  'DESCRIPTION': ['Andalucía', 'Almería', 'Otro', 'x'], 'PARENTCODE': [None, 'AN', 'AN', 'AN'],
+                  'ORDER': ['1', '2', '3', '4']}).to_csv(tmp_path / 'D_TERRITORIO_0-1.csv', sep=';', index=False)
+    pd.DataFrame({'TEMPORAL': ['2020', '2021'], 'TERRITORIO': ['AN', '04'], 'SEXO': ['_Z', '_Z'],
+                  'OBS_VALUE': ['1.5', '2,5']}).to_csv(tmp_path / '1.csv', sep=';', index=False)
+
+    componentes = componentes_estructura(['TEMPORAL', 'TERRITORIO', 'SEXO', 'OBS_VALUE'], 'PRUEBA', 'IECA', '1.0')
+    assert [(componente['id'], componente['rol']) for componente in componentes] == \
+        [('REF_AREA', 'Dimension'), ('SEXO', 'Dimension'), ('TIME_PERIOD', 'TimeDimension'),
+         ('OBS_VALUE', 'PrimaryMeasure')]
+
+    configuracion_sdmx = {'NOMBRE_DSD': 'DSD_PRUEBA', 'grupos_consultas': {'Población': {'id': '1'}}}
+    codigos = generar_estructuras(str(tmp_path / 'estructuras.xml'), configuracion_sdmx, componentes,
+                                  {'TERRITORIO': [str(tmp_path / 'D_TERRITORIO_0-1')]}, configuracion_global,
+                                  'PRUEBA')
+    assert codigos == {'CL_REF_AREA': 3, 'CL_SEXO': 1}
+
+    raiz = ET.parse(tmp_path / 'estructuras.xml').getroot()
+    codigos_territorio = raiz.findall(".//str:Codelist[@id='CL_REF_AREA']/str:Code", ESPACIOS)
+    assert [codigo.get('id') for codigo in codigos_territorio] == ['AN', '04', '_Z']
+    assert codigos_territorio[1].find('str:Parent/Ref', ESPACIOS).get('id') == 'AN'
+    assert codigos_territorio[1].find('com:Name', ESPACIOS).text == 'Almería'
+    assert raiz.find('.//str:Dataflow', ESPACIOS).get('id') == 'DF_PRUEBA_1'
+    assert [concepto.get('id') for concepto in raiz.findall('.//str:Concept', ESPACIOS)] == ['SEXO', 'OBS_VALUE']
+    assert raiz.find('.//str:TimeDimension', ESPACIOS).get('position') == '3'
+
+    assert escribir_sdmx_csv(str(tmp_path / '1'), str(tmp_path / 'sdmx.csv'), 'IECA:DF_PRUEBA_1(1.0)',
+                             componentes, filas_bloque=1) == 2
+    assert (tmp_path / 'sdmx.csv').read_text(encoding='utf-8').splitlines() == [
+        'DATAFLOW,REF_AREA,SEXO,TIME_PERIOD,OBS_VALUE',
+        'IECA:DF_PRUEBA_1(1.0),AN,_Z,2020,1.5',
+        'IECA:DF_PRUEBA_1(1.0),04,_Z,2021,"2,5"']
+
+
+def test_sdmx_csv_sin_codigos_vacios_ni_claves_duplicadas(tmp_path):
+    componentes = [{'variable': 'TERRITORIO', 'id': 'REF_AREA', 'rol': 'Dimension'},
+                   {'variable': 'TEMPORAL', 'id': 'TIME_PERIOD', 'rol': 'TimeDimension'},
+                   {'variable': 'OBS_VALUE', 'id': 'OBS_VALUE', 'rol': 'PrimaryMeasure'}]
+    pd.DataFrame({'TEMPORAL': ['2020', '2020', '2021', '2020'], 'TERRITORIO': ['AN', None, 'AN', 'AN'],
+                  'OBS_VALUE': ['1', '2', '3', '4']}).to_csv(tmp_path / '1.csv', sep=';', index=False)
+
+    assert escribir_sdmx_csv(str(tmp_path / '1'), str(tmp_path / 'sdmx.csv'), 'IECA:DF_PRUEBA_1(1.0)',
+                             componentes, filas_bloque=2) == 3
+    assert (tmp_path / 'sdmx.csv').read_text(encoding='utf-8').splitlines() == [
+        'DATAFLOW,REF_AREA,TIME_PERIOD,OBS_VALUE', 'IECA:DF_PRUEBA_1(1.0),AN,2020,1',
+        'IECA:DF_PRUEBA_1(1.0),_Z,2020,2', 'IECA:DF_PRUEBA_1(1.0),AN,2021,3']
+
+
+def test_relacion_de_los_atributos_con_la_medida(tmp_path):
+    conceptos = CONCEPTOS + 'OBS_STATUS:\n  tipo: Atributo\n  concept_scheme: none\n  concept: None\n  codelist: null\n'
+    (tmp_path / 'conceptos_codelist.yaml').write_text(conceptos, encoding='utf-8')
+    configuracion_global = {'traduccion': {'fichero': str(tmp_path / 'traducciones.yaml')},
+                            'fichero_conceptos_codelist': str(tmp_path / 'conceptos_codelist.yaml'),
+                            'directorio_mapas_dimensiones': str(tmp_path / 'mapas'),
+                            'dimensiones_a_mapear': ['D_EDAD_0'], 'sdmx': {'agencia': 'IECA', 'version': '1.0'}}
+    almacen_metadatos.configurar(configuracion_global)
+
+    componentes = componentes_estructura(['TEMPORAL', 'OBS_VALUE', 'OBS_STATUS'], 'PRUEBA', 'IECA', '1.0')
+    configuracion_sdmx = {'NOMBRE_DSD': 'DSD_PRUEBA', 'grupos_consultas': {'Población': {'id': '1'}}}
+    generar_estructuras(str(tmp_path / 'estructuras.xml'), configuracion_sdmx, componentes, {},
+                        configuracion_global, 'PRUEBA')
+
+    raiz = ET.parse(tmp_path / 'estructuras.xml').getroot()
+    relacion = raiz.find(".//str:Attribute[@id='OBS_STATUS']/str:AttributeRelationship/str:PrimaryMeasure", ESPACIOS)
+    assert relacion.text is None
+    assert relacion.find('Ref').get('id') == 'OBS_VALUE'
+
+
+def test_listas_de_codigos_de_dimensiones_mapeadas_validan_los_datos(tmp_path):
+    (tmp_path / 'conceptos_codelist.yaml').write_text(CONCEPTOS, encoding='utf-8')
+    (tmp_path / 'mapas').mkdir()
+    configuracion_global = {'traduccion': {'fichero': str(tmp_path / 'traducciones.yaml')},
+                            'fichero_conceptos_codelist': str(tmp_path / 'conceptos_codelist.yaml'),
+                            'directorio_mapas_dimensiones': str(tmp_path / 'mapas'),
+                            'dimensiones_a_mapear': ['D_EDAD_0'], 'sdmx': {'agencia': 'IECA', 'version': '1.0'}}
+    almacen_metadatos.configurar(configuracion_global)
+    pd.DataFrame({'SOURCE': ['4306', '4172', '9999'], 'COD': ['00', '000014', '99'],
+                  'NAME': ['(00) TOTAL', '(000014) Menos de 15 años', '(99) Otra'],
+                  'TARGET': ['TOTAL', 'Y_LT15', 'Y_GE99']}).to_csv(tmp_path / 'mapas' / 'D_EDAD_0', index=False)
+    pd.DataFrame({'ID': ['4306', '4172'], 'COD': ['00', '000014'], 'NAME': ['(00) TOTAL', '(000014) Menos de 15'],
+                  'DESCRIPTION': ['TOTAL', 'Menos de 15 años'], 'PARENTCODE': [None, '4306'],
+                  'ORDER': ['1', '2']}).to_csv(tmp_path / 'D_EDAD_0-1.csv', sep=';', index=False)
+    pd.DataFrame({'TEMPORAL': ['2020', '2020'], 'EDAD': ['TOTAL', 'Y_LT15'],
+                  'OBS_VALUE': ['10', '4']}).to_csv(tmp_path / '1.csv', sep=';', index=False)
+
+    componentes = componentes_estructura(['TEMPORAL', 'EDAD', 'OBS_VALUE'], 'PRUEBA', 'IECA', '1.0')
+    configuracion_sdmx = {'NOMBRE_DSD': 'DSD_PRUEBA', 'grupos_consultas': {'Población': {'id': '1'}}}
+    codigos = generar_estructuras(str(tmp_path / 'estructuras.xml'), configuracion_sdmx, componentes,
+                                  {'EDAD': [str(tmp_path / 'D_EDAD_0-1')]}, configuracion_global, 'PRUEBA')
+    escribir_sdmx_csv(str(tmp_path / '1'), str(tmp_path / 'sdmx.csv'), 'IECA:DF_PRUEBA_1(1.0)', componentes)
+
+    assert codigos == {'CL_EDAD': 3}
+    raiz = ET.parse(tmp_path / 'estructuras.xml').getroot()
+    codigos_edad = raiz.findall(".//str:Codelist[@id='CL_EDAD']/str:Code", ESPACIOS)
+    assert [codigo.get('id') for codigo in codigos_edad] == ['TOTAL', 'Y_LT15', '_Z']
+    assert codigos_edad[1].find('str:Parent/Ref', ESPACIOS).get('id') == 'TOTAL'
+
+    informe = validar_dataflow(str(tmp_path / 'sdmx.csv'), str(tmp_path / 'estructuras.xml'), 'DSD_PRUEBA')
+    assert informe['codigos_invalidos'] == {}
+    assert informe['valido']
@@ -0,0 +1,59 @@
+import threading
+
+import yaml
+
+from src.ieca.traduccion import ServicioTraduccion, traducir_json
+
+
+class TraductorLocal:
+    """Traductor sin conexión que marca cada texto con el idioma destino y registra los lotes recibidos."""
+
+    def __init__(self):
+        self.lotes = []
+        self.bloqueo = threading.Lock()
+
+    def traducir(self, textos, origen, destino):
+        with self.bloqueo:
+            self.lotes.append(list(textos))
+        return [f'{destino}:{texto}' for texto in textos]
+
+
+def configuracion(fichero):
+    return {'traduccion': {'fichero': str(fichero), 'traductor': 'deepl', 'variable_clave': 'DEEPL_AUTH_KEY',
+                           'tamano_lote': 2, 'trabajadores': 2}}
+
+
+def test_solo_se_traducen_los_textos_desconocidos(tmp_path):
+    fichero = tmp_path / 'traducciones.yaml'
+    fichero.write_text(yaml.safe_dump({'Sexo': {'en': 'Sex', 'es': 'Sexo'}}), encoding='utf-8')
+    traductor = TraductorLocal()
+    servicio = ServicioTraduccion(configuracion(fichero), traductor)
+
+    traducciones = servicio.traducir(['Sexo', 'Edad', 'Año', 'Edad', 'Territorio'])
+    assert traducciones == {'Sexo': 'Sex', 'Edad': 'en:Edad', 'Año': 'en:Año', 'Territorio': 'en:Territorio'}
+    assert sorted(map(sorted, traductor.lotes)) == [['Año', 'Edad'], ['Territorio']]
+    assert servicio.estadisticas() == {'textos': 4, 'aciertos': 1, 'fallos': 3, 'lotes': 2}
+
+    assert servicio.guardar()
+    recargado = ServicioTraduccion(configuracion(fichero), TraductorLocal())
+    assert recargado.traducir(['Edad']) == {'Edad': 'en:Edad'}
+    # En sentido contrario se usan las mismas traducciones
+    assert recargado.traducir(['Sex'], origen='en', destino='es') == {'Sex': 'Sexo'}
+    assert recargado.estadisticas()['fallos'] == 0 and not recargado.guardar()
+
+
+def test_traducir_json_conserva_la_estructura(tmp_path):
+    datos = {'menu': {'codelists': {'label': 'Codelists'}, 'orden': 1},
+             'tablas': [{'title': 'Codelists', 'id': 'CL'}, {'label': 'Dataflows'}]}
+    traductor = TraductorLocal()
+    servicio = ServicioTraduccion(configuracion(tmp_path / 'traducciones.yaml'), traductor)
+
+    traducido = traducir_json(datos, servicio, 'en', 'es')
+    assert traducido == {'menu': {'codelists': {'label': 'es:Codelists'}, 'orden': 1},
+                         'tablas': [{'title': 'es:Codelists', 'id': 'CL'}, {'label': 'es:Dataflows'}]}
+    assert datos['menu']['codelists']['label'] == 'Codelists'
+    assert sum(map(len, traductor.lotes)) == 2
+    servicio.guardar()
+    assert yaml.safe_load((tmp_path / 'traducciones.yaml').read_text(encoding='utf-8')) == \
+        {'es:Codelists': {'en': 'Codelists', 'es': 'es:Codelists'},
+         'es:Dataflows': {'en': 'Dataflows', 'es': 'es:Dataflows'}}
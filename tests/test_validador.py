@@ -0,0 +1,80 @@
+import json
+
+from src.ieca.validador import guardar_informe_validacion, leer_estructuras, validar_actividades
+
+ESTRUCTURAS = """<?xml version="1.0" encoding="utf-8"?>
+<mes:Structure xmlns:mes="http://www.sdmx.org/resources/sdmxml/schemas/v2_1/message"
+ xmlns:str="http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure"
+ xmlns:com="http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common"><mes:Structures>
+<str:Codelists><str:Codelist id="CL_TERRITORIO" agencyID="IECA" version="1.0">
+<str:Code id="AN"/><str:Code id="04"/><str:Code id="_Z"/></str:Codelist></str:Codelists>
+<str:DataStructures><str:DataStructure id="DSD_PRUEBA" agencyID="IECA" version="1.0">
+<str:DataStructureComponents><str:DimensionList>
+<str:Dimension id="FREQ"><str:LocalRepresentation><str:Enumeration>
+<Ref id="CL_FREQ" version="5.0" agencyID="ESTAT"/></str:Enumeration></str:LocalRepresentation></str:Dimension>
+<str:Dimension id="TERRITORIO"><str:LocalRepresentation><str:Enumeration>
+<Ref id="CL_TERRITORIO" version="1.0" agencyID="IECA"/></str:Enumeration></str:LocalRepresentation></str:Dimension>
+<str:Dimension id="SEX"><str:LocalRepresentation><str:Enumeration>
+<Ref id="CL_SEX" version="1.0" agencyID="SDMX"/></str:Enumeration></str:LocalRepresentation></str:Dimension>
+<str:TimeDimension id="TIME_PERIOD"/></str:DimensionList>
+<str:AttributeList><str:Attribute id="OBS_STATUS"><str:AttributeRelationship>
+<str:PrimaryMeasure><Ref id="OBS_VALUE"/></str:PrimaryMeasure></str:AttributeRelationship></str:Attribute>
+</str:AttributeList>
+<str:MeasureList><str:PrimaryMeasure id="OBS_VALUE"/></str:MeasureList>
+</str:DataStructureComponents></str:DataStructure></str:DataStructures></mes:Structures></mes:Structure>
+"""
+CABECERA = 'DATAFLOW,FREQ,TERRITORIO,SEX,TIME_PERIOD,OBS_VALUE,OBS_STATUS\n'
+
+
+def crear_actividad(directorio, filas):
+    (directorio / 'sdmx_csv').mkdir(parents=True)
+    (directorio / 'estructuras.xml').write_text(ESTRUCTURAS, encoding='utf-8')
+    (directorio / 'configuracion.yaml').write_text('NOMBRE_DSD: DSD_PRUEBA\n', encoding='utf-8')
+    (directorio / 'sdmx_csv' / '1.csv').write_text(CABECERA + ''.join(f'IECA:DF_PRUEBA_1(1.0),{fila}\n'
+                                                                     for fila in filas), encoding='utf-8')
+
+
+def test_datos_validos(tmp_path):
+    crear_actividad(tmp_path / 'PRUEBA', ['M,AN,F,2021-01,1.5,', 'M,04,F,2021-01,,P', 'A,_Z,M,2020,7,'])
+
+    informe, = validar_actividades(str(tmp_path))
+
+    assert informe['valido']
+    assert informe['filas'] == 3
+    assert informe['series'] == 3
+    assert informe['listas_no_verificadas'] == ['SEX']
+
+
+def test_errores_por_comprobacion(tmp_path):
+    crear_actividad(tmp_path / 'PRUEBA', ['M,AN,F,2021-01,1.5,', 'M,AN,F,2021-01,2,', 'M,XX,F,2021-13,1,',
+                                          'A,04,F,2021-01,x,', 'Z,,F,2021,3,'])
+    crear_actividad(tmp_path / 'OTRA', ['A,AN,F,2021,1,'])
+
+    informes = validar_actividades(str(tmp_path), ['PRUEBA', 'OTRA'], trabajos=2)
+    informe = informes[0]
+
+    assert [informe['actividad'] for informe in informes] == ['PRUEBA', 'OTRA']
+    assert not informe['valido'] and informes[1]['valido']
+    assert informe['codigos_invalidos'] == {'FREQ': 1, 'TERRITORIO': 2}
+    assert informe['ejemplos_codigos']['TERRITORIO'] == ['XX', '']
+    assert informe['claves_incompletas'] == 1
+    assert informe['claves_duplicadas'] == 1
+    assert informe['periodos_invalidos'] == 3
+    assert informe['valores_invalidos'] == 1
+
+    json_informe, csv_informe = guardar_informe_validacion(informes, str(tmp_path / 'informes'), 'validacion')
+    with open(json_informe, encoding='utf-8') as fichero:
+        assert json.load(fichero) == informes
+    with open(csv_informe, encoding='utf-8') as fichero:
+        assert len(fichero.readlines()) == 3
+
+
+def test_estructuras_regeneradas_se_vuelven_a_leer(tmp_path):
+    crear_actividad(tmp_path / 'PRUEBA', ['M,04,F,2021-01,1,'])
+    fichero = tmp_path / 'PRUEBA' / 'estructuras.xml'
+    assert leer_estructuras(str(fichero))['codelists'][('IECA', 'CL_TERRITORIO', '1.0')] == {'AN', '04', '_Z'}
+
+    fichero.write_text(ESTRUCTURAS.replace('<str:Code id="04"/>', ''), encoding='utf-8')
+    informe, = validar_actividades(str(tmp_path))
+
+    assert informe['codigos_invalidos'] == {'TERRITORIO': 1}